@@ -1,4 +1,8 @@
+from evalcat.columnar import ColumnarResult
+from evalcat.profiling import Profiler
 from evalcat.result_list import ResultList
+from evalcat.schema import ItemSchema
+from evalcat.streaming import StreamingEvaluator
 
-__all__ = ['ResultList']
+__all__ = ['ColumnarResult', 'ItemSchema', 'Profiler', 'ResultList', 'StreamingEvaluator']
 __all__.extend(['fields'])
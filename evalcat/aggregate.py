@@ -0,0 +1,341 @@
+"""
+Mergeable partial aggregates of metrics.
+
+An aggregate summarizes the metrics of the ranked lists of one system for one field: the number of ranked lists,
+the sum and count of each metric, and a quantile sketch of each metric. Aggregates of disjoint sets of ranked lists,
+e.g. of different shards of queries, can be merged into the aggregate of their union, and serialized as dictionaries
+of python objects to be sent between processes or machines.
+"""
+
+import math
+from collections import Counter
+
+import numpy as np
+
+from evalcat.rbo import rbo
+from evalcat.sketch import KLLSketch
+
+
+class MetricAggregate:
+    """
+    MetricAggregate keeps the running sums, counts and quantile sketches of the metrics returned by `Field.at_k`.
+
+    Parameters
+    ----------
+    field : Field
+        The field whose metrics are aggregated.
+    k : int
+        Only use the top K results to calculate the metrics.
+    sketch_size : int, default=200
+        The size of the KLL sketch of each metric.
+
+    Notes
+    -----
+    Metrics that are None or NaN for a ranked list are not counted for that ranked list.
+    """
+
+    def __init__(self, field, k, sketch_size=200):
+        self.field = field
+        self.k = k
+        self.sketch_size = sketch_size
+        self.n_lists = 0
+        self.totals = {}
+        self.counts = {}
+        self.sketches = {}
+
+    def update(self, items, query=None):
+        """Adds the metrics of a ranked list.
+
+        Parameters
+        ----------
+        items : list
+            The ranked list of search items.
+        query : str, optional
+            The query of the ranked list. Only used by aggregates of fields whose metrics depend on the query.
+        """
+        self._update_metrics(self.field.at_k(items, self.k))
+
+    def _update_metrics(self, metrics):
+        self.n_lists += 1
+        for metric, value in metrics.items():
+            self._add_metric(metric)
+            if value is not None and value == value:
+                self._add_values(metric, np.array([value], dtype=float))
+
+    def update_summary(self, summary):
+        """Adds the metrics of several ranked lists at once.
+
+        Parameters
+        ----------
+        summary : pd.DataFrame
+            DataFrame with a row per ranked list and column metric, as returned by `Field.compute_metrics`.
+        """
+        self.n_lists += len(summary)
+        for metric in summary.columns:
+            self._add_metric(metric)
+            values = summary[metric].to_numpy(dtype=float)
+            self._add_values(metric, values[~np.isnan(values)])
+
+    def means(self):
+        """Returns the mean of each metric over the ranked lists where it is defined."""
+        return {metric: self.totals[metric] / count if count else math.nan for metric, count in self.counts.items()}
+
+    def merge(self, other):
+        """Adds the metrics of another aggregate of the same field and cutoff.
+
+        Parameters
+        ----------
+        other : MetricAggregate
+            The aggregate to merge. It is not modified.
+
+        Returns
+        -------
+        MetricAggregate
+            This aggregate.
+        """
+        if type(other) is not type(self) or other.k != self.k:
+            raise ValueError('Only aggregates of the same kind and cutoff can be merged.')
+        self.n_lists += other.n_lists
+        for metric in other.counts:
+            self._add_metric(metric)
+            self.totals[metric] += other.totals[metric]
+            self.counts[metric] += other.counts[metric]
+            self.sketches[metric].merge(other.sketches[metric])
+        return self
+
+    def copy(self):
+        """Returns a copy of the aggregate."""
+        return type(self).from_dict(self.to_dict(), self.field)
+
+    def to_dict(self):
+        """Returns the state of the aggregate as a dictionary of python objects, which can be serialized as JSON."""
+        return {'k': self.k, 'sketch_size': self.sketch_size, 'n_lists': self.n_lists,
+                'metrics': [[_python(metric), float(self.totals[metric]), int(self.counts[metric]),
+                             self.sketches[metric].to_dict()] for metric in self.counts]}
+
+    @classmethod
+    def from_dict(cls, state, field):
+        """Returns the aggregate of `field` whose state was returned by `to_dict`."""
+        aggregate = cls(field, state['k'], state['sketch_size'])
+        aggregate._set_state(state)
+        return aggregate
+
+    def _set_state(self, state):
+        self.n_lists = state['n_lists']
+        for metric, total, count, sketch in state['metrics']:
+            self.totals[metric] = total
+            self.counts[metric] = count
+            self.sketches[metric] = KLLSketch.from_dict(sketch)
+
+    def _add_metric(self, metric):
+        if metric not in self.counts:
+            self.totals[metric] = 0.0
+            self.counts[metric] = 0
+            self.sketches[metric] = KLLSketch(self.sketch_size)
+
+    def _add_values(self, metric, values):
+        self.totals[metric] += float(values.sum())
+        self.counts[metric] += len(values)
+        # Metrics often take few distinct values, which are added to the sketch once with their multiplicity.
+        for value, weight in zip(*np.unique(values, return_counts=True)):
+            self.sketches[metric].update(value, int(weight))
+
+
+class QueryAggregate(MetricAggregate):
+    """
+    QueryAggregate keeps the metrics of a field whose `at_k` requires the query of the ranked list, e.g. the qrels
+    of a RelevanceField.
+
+    Parameters
+    ----------
+    field : Field
+        The field whose metrics are aggregated. Its `at_k` accepts the keyword argument `query`.
+    k : int
+        Only use the top K results to calculate the metrics.
+    sketch_size : int, default=200
+        The size of the KLL sketch of each metric.
+    """
+
+    def update(self, items, query=None):
+        if query is None:
+            raise ValueError(f'The metrics of field {self.field.name!r} require the query of the ranked list.')
+        self._update_metrics(self.field.at_k(items, self.k, query=query))
+
+
+class LabelAggregate(MetricAggregate):
+    """
+    LabelAggregate keeps the running label fractions of a CategoricalField, discovering the labels as they arrive.
+
+    Parameters
+    ----------
+    field : CategoricalField
+        The field whose labels are aggregated.
+    k : int
+        Only use the top K results to calculate the metrics.
+    sketch_size : int, default=200
+        The size of the KLL sketch of each metric.
+    labels : list, optional
+        The labels of the field. If not provided, the labels are discovered from the ranked lists.
+
+    Notes
+    -----
+    Follows `CategoricalField.compute_metrics`: without explicit labels, every label that is not None or "" is
+    counted. Other labels are counted as None if `ignore_none` is False, and ignored otherwise. A label discovered
+    after some ranked lists counts as 0 in those ranked lists, so aggregates with different labels can be merged.
+    """
+
+    def __init__(self, field, k, sketch_size=200, labels=None):
+        super().__init__(field, k, sketch_size)
+        self.labels = list(labels) if labels else []
+        self._label_set = set(self.labels)
+        self._detect_labels = not labels
+        self._valid_lists = 0
+        for label in self.labels:
+            self._add_label(label)
+        self._add_metric('unique_count')
+
+    def update(self, items, query=None):
+        self.n_lists += 1
+        if not items:
+            return
+        top = items[:self.k] if self.k else items
+        label_counts = Counter(self._label(item[self.field.name]) for item in top)
+        label_counts.pop(_IGNORED, None)
+        total = sum(label_counts.values())
+        self._add_values('unique_count', np.array([len(label_counts)], dtype=float))
+        if not total:
+            return
+        self._valid_lists += 1
+        for label in self.labels:
+            self._add_values(label, np.array([label_counts.get(label, 0) / total]))
+
+    def update_summary(self, summary):
+        self.n_lists += len(summary)
+        unique_counts = summary['unique_count'].to_numpy(dtype=float)
+        self._add_values('unique_count', unique_counts[~np.isnan(unique_counts)])
+        # Fractions are NaN for empty ranked lists and for ranked lists whose labels are all ignored.
+        valid = unique_counts > 0
+        # The None label may be stored as a NaN column name.
+        columns = {None if column != column else column: column for column in summary.columns.drop('unique_count')}
+        for label in columns:
+            if label not in self._label_set:
+                self._new_label(label)
+        for label in self.labels:
+            if label in columns:
+                self._add_values(label, summary[columns[label]].to_numpy(dtype=float)[valid])
+            else:
+                self._add_values(label, np.zeros(np.count_nonzero(valid)))
+        self._valid_lists += int(np.count_nonzero(valid))
+
+    def means(self):
+        means = super().means()
+        return {metric: means[metric] for metric in self.labels + ['unique_count']}
+
+    def merge(self, other):
+        if type(other) is not type(self) or other.k != self.k:
+            raise ValueError('Only aggregates of the same kind and cutoff can be merged.')
+        for label in other.labels:
+            if label not in self._label_set:
+                self._new_label(label)
+        for label in self.labels:
+            if label not in other._label_set:
+                self.counts[label] += other._valid_lists
+                self.sketches[label].update(0.0, other._valid_lists)
+        self._valid_lists += other._valid_lists
+        return super().merge(other)
+
+    @classmethod
+    def from_dict(cls, state, field):
+        aggregate = cls(field, state['k'], state['sketch_size'])
+        aggregate._set_state(state)
+        aggregate.labels = list(state['labels'])
+        aggregate._label_set = set(aggregate.labels)
+        aggregate._detect_labels = state['detect_labels']
+        aggregate._valid_lists = state['valid_lists']
+        return aggregate
+
+    def to_dict(self):
+        state = super().to_dict()
+        state.update(labels=[_python(label) for label in self.labels], detect_labels=self._detect_labels,
+                     valid_lists=self._valid_lists)
+        return state
+
+    def _label(self, value):
+        if self._detect_labels and value:
+            if value not in self._label_set:
+                self._new_label(value)
+            return value
+        if not self._detect_labels and value in self._label_set:
+            return value
+        if self.field.ignore_none:
+            return _IGNORED
+        # Other labels are counted as None, which is a label when they are detected.
+        if self._detect_labels and None not in self._label_set:
+            self._new_label(None)
+        return None if None in self._label_set else _IGNORED
+
+    def _new_label(self, label):
+        self.labels.append(label)
+        self._label_set.add(label)
+        self._add_label(label)
+
+    def _add_label(self, label):
+        self._add_metric(label)
+        # The ranked lists seen before the label have a fraction of 0 for it.
+        self.counts[label] = self._valid_lists
+        self.sketches[label].update(0.0, self._valid_lists)
+
+
+class RBOAggregate:
+    """Running sums of the RBO triplets (rbo_min, rbo_res, rbo_ext) of a pair of systems.
+
+    Queries where either system has no results are not counted.
+    """
+
+    def __init__(self):
+        self.totals = np.zeros(3)
+        self.count = 0
+
+    def update(self, identifiers, other_identifiers, p):
+        """Adds the RBO of the ranked lists of the two systems for a query."""
+        if not identifiers or not other_identifiers:
+            return
+        self.totals += rbo(identifiers, other_identifiers, p)
+        self.count += 1
+
+    def update_frame(self, frame):
+        """Adds the RBO of several queries, as returned by `ResultList.rank_biased_overlap`."""
+        frame = frame[['rbo_min', 'rbo_res', 'rbo_ext']].dropna().to_numpy(dtype=float)
+        self.totals += frame.sum(axis=0)
+        self.count += len(frame)
+
+    def means(self):
+        """Returns the mean RBO triplet followed by the number of queries."""
+        with np.errstate(invalid='ignore'):
+            return list(self.totals / self.count) + [self.count]
+
+    def merge(self, other):
+        """Adds the RBO of another aggregate of the same pair of systems, and returns this aggregate."""
+        self.totals += other.totals
+        self.count += other.count
+        return self
+
+    def to_dict(self):
+        """Returns the state of the aggregate as a dictionary of python objects, which can be serialized as JSON."""
+        return {'totals': [float(total) for total in self.totals], 'count': self.count}
+
+    @classmethod
+    def from_dict(cls, state):
+        """Returns the aggregate whose state was returned by `to_dict`."""
+        aggregate = cls()
+        aggregate.totals = np.array(state['totals'], dtype=float)
+        aggregate.count = state['count']
+        return aggregate
+
+
+_IGNORED = object()
+
+
+def _python(value):
+    """Converts NumPy scalars to python objects, so that they can be serialized as JSON."""
+    return value.item() if isinstance(value, np.generic) else value
@@ -1,3 +1,13 @@
+import hashlib
+import itertools
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from evalcat.schema import PackedList
+
+
 class BaseResult(dict):
     """
     BaseResult stores the search results and handles reading from other data stores.
@@ -20,6 +30,9 @@ class BaseResult(dict):
         ```
     queries : list of str, default=None
         A list of queries. Used in a call to `_check_queries` to check that all systems have the same query set.
+    align : bool, default=False
+        If set to True, systems that miss some queries are given empty ranked lists for them, instead of raising a
+        ValueError. The queries are `queries` if provided, else all queries in the order they first appear.
 
     Attributes
     ----------
@@ -27,16 +40,261 @@ class BaseResult(dict):
         Stores the list of system names.
     queries : list
         Stores the list of queries.
+    query_index : dict
+        Maps each query to its position in `queries`, shared by all systems.
+    offsets : np.ndarray
+        Boundaries of the ranked list of each (system, query) when the items of all systems and queries are
+        concatenated, systems first. The ranked list of `systems[i]` and `queries[j]` spans the positions
+        `offsets[i * len(queries) + j]` to `offsets[i * len(queries) + j + 1]`.
     """
 
-    def __init__(self, results, queries=None):
+    def __init__(self, results, queries=None, align=False):
+        if align and results:
+            results, queries = _align_queries(results, queries)
+        # Only the mapping of systems is copied, the ranked lists of each system are shared with `results`.
         super().__init__(results)
         self.systems = list(results.keys()) if results else []
-        self.queries = _check_queries(results, queries) if results else []
+        self._reset_cache()
+        if results:
+            self.queries, self._query_index = _check_queries(results, queries)
+        else:
+            self.queries = []
+
+    @classmethod
+    def from_jsonl(cls, path, fields=None, queries=None, **kwargs):
+        """Reads search results from a JSON Lines file with one ranked list per line, without loading the whole file.
+
+        The values of `fields` are stored as the arrays of a ColumnarResult. See `evalcat.io.read_jsonl`
+        for the format of the file and the other parameters.
+
+        Returns
+        -------
+        ColumnarResult
+        """
+        from evalcat.io import read_jsonl
+        return read_jsonl(path, fields, queries, **kwargs)
+
+    @classmethod
+    def from_parquet(cls, path, fields=None, systems=None, queries=None, **kwargs):
+        """Reads search results from a long-format Parquet file, with one row per item. Requires pyarrow.
+
+        Only the columns of `fields` and the rows of `systems` and `queries` are read. See `evalcat.io.read_parquet`
+        for the format of the table and the other parameters.
+
+        Returns
+        -------
+        ColumnarResult
+        """
+        from evalcat.io import read_parquet
+        return read_parquet(path, fields, systems, queries, **kwargs)
+
+    def to_parquet(self, path, fields=None, **kwargs):
+        """Writes the search results to a long-format Parquet file, with one row per item. Requires pyarrow.
+
+        See `evalcat.io.write_parquet` for the format of the table and the other parameters.
+        """
+        from evalcat.io import write_parquet
+        write_parquet(self, path, fields, **kwargs)
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            lengths = np.fromiter(itertools.chain.from_iterable(map(len, self._ranked_lists(system))
+                                                                for system in self.systems),
+                                  dtype=np.int64, count=len(self.systems) * len(self.queries))
+            self._offsets = np.concatenate([[0], np.cumsum(lengths)])
+        return self._offsets
+
+    @property
+    def query_index(self):
+        if self._query_index is None:
+            self._query_index = {query: idx for idx, query in enumerate(self.queries)}
+        return self._query_index
+
+    def _ranked_lists(self, system):
+        """Returns an iterator over the ranked lists of a system, in the order of `queries`."""
+        query_res = self[system]
+        # Ranked lists are usually stored in the order of the queries, and are then read without hash lookups.
+        if list(query_res) == self.queries:
+            return iter(query_res.values())
+        return map(query_res.__getitem__, self.queries)
+
+    def add_system(self, system, results):
+        """Adds the search results of a new system, which must cover the same queries as the other systems.
+
+        Parameters
+        ----------
+        system : str
+            The name of the new system.
+        results : dict
+            Maps each query to the ranked list of items of the new system.
+
+        Raises
+        ------
+        ValueError
+            If the system is already in the search results, or its query set does not match.
+        """
+        if system in self:
+            raise ValueError(f'System {system!r} is already in the search results.')
+        queries, query_index = _check_queries({system: results}, self.queries or None)
+        self[system] = results
+        self.systems.append(system)
+        self.queries = queries
+        self._reset_cache()
+        self._query_index = query_index
+
+    def remove_system(self, system):
+        """Removes the search results of a system."""
+        if system not in self:
+            raise ValueError(f'System {system!r} is not in the search results.')
+        del self[system]
+        self.systems.remove(system)
+        if not self.systems:
+            self.queries = []
+        self._reset_cache()
+
+    def add_queries(self, results):
+        """Adds the search results of new queries to every system.
+
+        Parameters
+        ----------
+        results : dict
+            Nested python dictionary of search results, structured as for BaseResult, containing every system and
+            the same new queries for each system.
+
+        Raises
+        ------
+        ValueError
+            If not all systems are given, not all query sets match, or some queries are already in the search results.
+        """
+        queries = self._check_new_queries(results)
+        for system in self.systems:
+            self[system] = {**self[system], **results[system]}
+        self.queries.extend(queries)
+        self._reset_cache()
+
+    def _check_new_queries(self, results):
+        """Checks the search results of new queries for `add_queries` and returns the list of new queries."""
+        if set(results) != set(self.systems):
+            raise ValueError('The new queries must be given for every system.')
+        queries, _ = _check_queries(results)
+        existing = [query for query in queries if query in self.query_index]
+        if existing:
+            raise ValueError(f'Queries {_preview(existing)} are already in the search results.')
+        return queries
+
+    def _reset_cache(self):
+        self._offsets = None
+        self._query_index = None
+        self._columns = {}
+
+    def system_offsets(self, system):
+        """Returns the `offsets` of the ranked lists of a single system, one per query plus the end position."""
+        idx = self.systems.index(system) * len(self.queries)
+        return self.offsets[idx:idx + len(self.queries) + 1]
+
+    def subset(self, systems=None, queries=None):
+        """Returns a BaseResult containing only some of the systems and queries.
+
+        The search items are shared with this BaseResult, not copied.
+
+        Parameters
+        ----------
+        systems : list of str, optional
+            The systems to keep. If not provided, will keep all systems.
+        queries : list of str, optional
+            The queries to keep. If not provided, will keep all queries.
+
+        Returns
+        -------
+        BaseResult
+        """
+        systems = self.systems if systems is None else systems
+        queries = self.queries if queries is None else queries
+        return BaseResult({system: {query: self[system][query] for query in queries} for system in systems}, queries)
+
+    def fingerprint(self, system):
+        """Returns a hash of the search results of a system, which changes whenever any of its results changes.
+
+        Parameters
+        ----------
+        system : str
+            The name of the system.
+
+        Returns
+        -------
+        str
+            The SHA-256 hex digest of the queries and the ranked lists of the system.
+        """
+        rows = [(query, [dict(item) for item in self[system][query]]) for query in self.queries]
+        return hashlib.sha256(pickle.dumps(rows, protocol=4)).hexdigest()
+
+    def column(self, name):
+        """Returns the values of a field for all items, concatenated in the order described by `offsets`.
+
+        Parameters
+        ----------
+        name : str
+            The name of the field in each search item.
+
+        Returns
+        -------
+        np.ndarray
+            Array of objects of length `offsets[-1]`.
+
+        Notes
+        -----
+        If all ranked lists are PackedLists, their columns are concatenated without reading the items one by one.
+        """
+        packed = self._packed_lists()
+        if packed is not None:
+            columns = [ranked_list.column(name) for ranked_list in packed]
+            if all(isinstance(values, np.ndarray) for values in columns):
+                values = np.concatenate(columns).astype(object)
+                if values.size and isinstance(columns[0], np.ndarray) and columns[0].dtype.kind == 'f':
+                    values[pd.isna(values)] = None
+                return values
+            values = np.empty(self.offsets[-1], dtype=object)
+            values[:] = list(itertools.chain.from_iterable(columns))
+            return values
+        return pd.Series([item[name] for system in self.systems for ranked_list in self._ranked_lists(system)
+                          for item in ranked_list], dtype=object).to_numpy()
+
+    def _packed_lists(self):
+        """Returns all ranked lists in the order of `offsets` if they are all PackedLists, else None."""
+        if not self.systems or not self.queries or type(next(self._ranked_lists(self.systems[0]))) is not PackedList:
+            return None
+        ranked_lists = [ranked_list for system in self.systems for ranked_list in self._ranked_lists(system)]
+        if not all(type(ranked_list) is PackedList for ranked_list in ranked_lists):
+            return None
+        return ranked_lists
+
+    def numerical_column(self, name):
+        """Returns the values of a field for all items as a float array, where None is NaN.
+
+        The array is computed once and cached.
+        """
+        if (name, 'numerical') not in self._columns:
+            packed = self._packed_lists()
+            columns = [ranked_list.column(name) for ranked_list in packed] if packed is not None else []
+            if columns and all(isinstance(values, np.ndarray) for values in columns):
+                self._columns[name, 'numerical'] = np.concatenate(columns).astype(float)
+            else:
+                self._columns[name, 'numerical'] = _to_numerical(self.column(name))
+        return self._columns[name, 'numerical']
+
+    def categorical_column(self, name):
+        """Returns the values of a field for all items as a pd.Categorical, where None is missing.
+
+        The values are dictionary-encoded once and cached.
+        """
+        if (name, 'categorical') not in self._columns:
+            self._columns[name, 'categorical'] = _to_categorical(self.column(name))
+        return self._columns[name, 'categorical']
 
 
 def _check_queries(results, queries=None):
-    """Check that all systems have the same query set and returns a list of queries.
+    """Check that all systems have the same query set and returns a list of queries and their index.
 
     Parameters
     ----------
@@ -49,16 +307,77 @@ def _check_queries(results, queries=None):
     -------
     queries : list of str
         A list of queries.
+    query_index : dict
+        Maps each query to its position in `queries`.
 
     Raises
     ------
     ValueError
-        If not all systems have the same query set.
-    """
+        If `queries` contains duplicates, or not all systems have the same query set. The message names the first
+        system whose query set does not match, and some of its missing and unexpected queries.
 
+    Notes
+    -----
+    The queries of each system are compared to `queries` as a list, and if they are not in the same order, to the
+    index with a comparison of dict key views. Both run in C without building a set per system.
+    """
     if not queries:
         queries = list(next(iter(results.values())).keys())
+    else:
+        queries = list(queries)
+    query_index = {query: idx for idx, query in enumerate(queries)}
+    if len(query_index) != len(queries):
+        duplicates = [query for query, count in pd.Series(queries).value_counts().items() if count > 1]
+        raise ValueError(f'Queries {_preview(duplicates)} are duplicated.')
+
+    reference = query_index.keys()
+    for system, query_res in results.items():
+        # Query sets are usually in the same order, which is checked without hash lookups.
+        if list(query_res) != queries and query_res.keys() != reference:
+            missing = [query for query in queries if query not in query_res]
+            unexpected = [query for query in query_res if query not in query_index]
+            raise ValueError(f'The query set of system {system!r} does not match the input queries: '
+                             f'{len(missing)} missing {_preview(missing)}, '
+                             f'{len(unexpected)} unexpected {_preview(unexpected)}.')
+    return queries, query_index
+
+
+def _align_queries(results, queries=None):
+    """Returns the search results where each system has an empty ranked list for each query it misses, and the queries.
+
+    The queries are `queries` if provided, else all queries in the order they first appear. Only the systems that
+    miss queries are copied.
+    """
+    if queries:
+        queries = list(queries)
+    else:
+        queries = list(dict.fromkeys(itertools.chain.from_iterable(results.values())))
+    reference = dict.fromkeys(queries).keys()
+    aligned = {}
+    for system, query_res in results.items():
+        if query_res.keys() >= reference:
+            aligned[system] = query_res
+        else:
+            aligned[system] = {query: query_res[query] if query in query_res else [] for query in queries}
+            # Queries that are not in `queries` are kept, so that `_check_queries` reports them.
+            aligned[system].update(query_res)
+    return aligned, queries
+
+
+def _preview(values, n=5):
+    """Returns a representation of the first `n` values, for error messages."""
+    return repr(values[:n])[:-1] + (', ...]' if len(values) > n else ']')
+
+
+def _to_numerical(values):
+    if isinstance(values, pd.Categorical):
+        categories = np.append(np.asarray(values.categories, dtype=float), np.nan)
+        return categories[values.codes]
+    return np.asarray(values, dtype=float)
+
 
-    if not all(set(queries) == set(query_res.keys()) for query_res in results.values()):
-        raise ValueError('Not all query sets match the input queries.')
-    return queries
+def _to_categorical(values):
+    if isinstance(values, pd.Categorical):
+        return values
+    codes, uniques = pd.factorize(values)
+    return pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
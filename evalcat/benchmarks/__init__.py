@@ -0,0 +1,7 @@
+def run():
+    from evalcat.benchmarks.bench_rbo import bench_rbo_batch, bench_rbo_depth
+    from evalcat.benchmarks.bench_stages import bench_stages
+
+    bench_rbo_depth()
+    bench_rbo_batch()
+    bench_stages()
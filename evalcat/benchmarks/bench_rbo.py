@@ -0,0 +1,114 @@
+"""Benchmarks the scaling of RBO with the depth of the ranked lists."""
+
+import math
+import random
+import timeit
+
+from evalcat.rbo import overlap, rbo
+from evalcat.result_list import ResultList
+
+
+def _quadratic_rbo(S, T, p):
+    """Reference RBO that recomputes the overlap from scratch at every depth, as evalcat did originally."""
+    s, l = sorted((len(S), len(T)))
+    L, S = (S, T) if len(S) > len(T) else (T, S)
+
+    xk = overlap(S, L, s)
+    sum1 = sum((overlap(S, L, d) - xk) * p ** d / d for d in range(1, s + 1))
+    rbo_min = (1 - p) / p * (sum1 - xk * math.log(1 - p))
+
+    xl = overlap(L, S, l)
+    f = l + s - xl
+    sum1 = sum(p ** d / d for d in range(s + 1, f + 1))
+    sum2 = sum(p ** d / d for d in range(l + 1, f + 1))
+    sum3 = sum(p ** d / d for d in range(1, f + 1))
+    rbo_res = p ** s + p ** l - p ** f - ((1 - p) / p * (s * sum1 + l * sum2 + xl * (math.log(1 / (1 - p)) - sum3)))
+
+    xs = overlap(L, S, s)
+    sum1 = sum(overlap(L, S, d) / d * p ** d for d in range(1, l + 1))
+    sum2 = sum(xs * (d - s) / (s * d) * p ** d for d in range(s + 1, l + 1))
+    rbo_ext = (1 - p) / p * (sum1 + sum2) + ((xl - xs) / l + xs / s) * p ** l
+    return rbo_min, rbo_res, rbo_ext
+
+
+def _make_rankings(depth, n_items, seed=0):
+    rng = random.Random(seed)
+    return rng.sample(range(n_items), depth), rng.sample(range(n_items), depth)
+
+
+def bench_rbo_depth(depths=(10, 50, 100, 250, 500, 1000), p=0.9, number=3, quadratic_limit=1000, verbose=True):
+    """Times `rbo` against the quadratic reference for ranked lists of increasing depth.
+
+    Parameters
+    ----------
+    depths : list of int
+        The list depths to benchmark.
+    p : float, default=0.9
+        The RBO persistence parameter.
+    number : int, default=3
+        Number of calls timed at each depth. The best mean time over 3 repeats is reported.
+    quadratic_limit : int, default=1000
+        The quadratic reference is skipped for depths above this limit.
+    verbose : bool, default=True
+        If set to True, the records are printed as a table.
+
+    Returns
+    -------
+    list of dict
+        One record per depth containing the depth and the mean time in seconds of each implementation.
+    """
+    records = []
+    if verbose:
+        print(f'{"depth":>8}{"single-pass (s)":>18}{"quadratic (s)":>18}{"speed-up":>10}')
+    for depth in depths:
+        S, T = _make_rankings(depth, n_items=2 * depth)
+        fast = min(timeit.repeat(lambda: rbo(S, T, p), number=number, repeat=3)) / number
+        slow = None
+        if depth <= quadratic_limit:
+            slow = min(timeit.repeat(lambda: _quadratic_rbo(S, T, p), number=number, repeat=3)) / number
+        records.append({'depth': depth, 'single_pass': fast, 'quadratic': slow})
+        if verbose:
+            print(f'{depth:>8}{fast:>18.6f}'
+                  + (f'{slow:>18.6f}{slow / fast:>9.1f}x' if slow else f'{"-":>18}{"-":>10}'))
+    return records
+
+
+def bench_rbo_batch(n_queries=(100, 1000, 10000), depth=100, p=0.9, verbose=True):
+    """Times `ResultList.rank_biased_overlap` computing all queries at once against calling `rbo` once per query.
+
+    Parameters
+    ----------
+    n_queries : list of int
+        The numbers of queries to benchmark.
+    depth : int, default=100
+        The depth of every ranked list.
+    p : float, default=0.9
+        The RBO persistence parameter.
+    verbose : bool, default=True
+        If set to True, the records are printed as a table.
+
+    Returns
+    -------
+    list of dict
+        One record per number of queries containing the mean time in seconds of each implementation.
+    """
+    records = []
+    if verbose:
+        print(f'{"queries":>8}{"batch (s)":>18}{"per query (s)":>18}{"speed-up":>10}')
+    for n in n_queries:
+        S, T = zip(*(_make_rankings(depth, n_items=2 * depth, seed=seed) for seed in range(n)))
+        results = {system: {f'query {idx}': [{'id': item} for item in ranking] for idx, ranking in enumerate(rankings)}
+                   for system, rankings in [('S', S), ('T', T)]}
+        result_list = ResultList(results)
+        fast = min(timeit.repeat(lambda: result_list.rank_biased_overlap('id', p=p), number=1, repeat=3))
+        slow = min(timeit.repeat(lambda: result_list.rank_biased_overlap('id', p=p, batch=False), number=1,
+                                 repeat=3))
+        records.append({'queries': n, 'batch': fast, 'per_query': slow})
+        if verbose:
+            print(f'{n:>8}{fast:>18.6f}{slow:>18.6f}{slow / fast:>9.1f}x')
+    return records
+
+
+if __name__ == '__main__':
+    bench_rbo_depth()
+    bench_rbo_batch()
@@ -0,0 +1,213 @@
+"""Benchmarks each stage of an evaluation on synthetic search results, at several scales.
+
+The records can be written to a JSON file, and the files of two commits compared with `compare`:
+```
+python3 -m evalcat.benchmarks.bench_stages --scales small medium --output before.json
+python3 -m evalcat.benchmarks.bench_stages --scales small medium --output after.json --baseline before.json
+```
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from evalcat.base_result import BaseResult
+from evalcat.benchmarks.synthetic import synthetic_results
+from evalcat.columnar import ColumnarResult
+from evalcat.fields import CategoricalField, NumericalField
+from evalcat.result_list import ResultList
+
+SCALES = {
+    'small': {'n_systems': 3, 'n_queries': 1000, 'depth': 20},
+    'medium': {'n_systems': 5, 'n_queries': 10000, 'depth': 50},
+    'large': {'n_systems': 10, 'n_queries': 50000, 'depth': 100},
+}
+
+STAGES = ['ingest', 'ingest_columnar', 'label_discovery', 'numerical_metrics', 'categorical_metrics', 'rbo', 'views']
+
+
+def _stages(results, k):
+    """Runs each stage of an evaluation of `results` in order, yielding the name of a stage after running it."""
+    base_result = BaseResult(results)
+    # The offsets of the ranked lists are computed lazily, and are part of the ingestion.
+    _ = base_result.offsets
+    yield 'ingest'
+    ColumnarResult.from_results(results, fields=['id', 'price', 'label'])
+    yield 'ingest_columnar'
+
+    numerical = NumericalField('price')
+    categorical = CategoricalField('label')
+    categorical.process_base_result(base_result)
+    yield 'label_discovery'
+    summary = {'price': numerical.compute_metrics(base_result, k)}
+    yield 'numerical_metrics'
+    summary['label'] = categorical.compute_metrics(base_result, k)
+    yield 'categorical_metrics'
+
+    result_list = ResultList(base_result, [numerical, categorical], k, lazy=True)
+    result_list.rank_biased_overlap_matrix('id')
+    yield 'rbo'
+    result_list.summary = summary
+    system, query = base_result.systems[0], base_result.queries[0]
+    for field_name, metric in [('price', 'mean'), ('label', 'unique_count')]:
+        result_list.get_query_metric_df(field_name, system)
+        result_list.get_system_metric_df(field_name, query)
+        result_list.get_system_query_df(field_name, metric)
+    yield 'views'
+
+
+def _time_stages(results, k):
+    times = {}
+    start = time.perf_counter()
+    for stage in _stages(results, k):
+        end = time.perf_counter()
+        times[stage] = end - start
+        start = time.perf_counter()
+    return times
+
+
+def _trace_stages(results, k):
+    """Returns the peak memory in bytes allocated during each stage, above the memory allocated before it."""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for stage in _stages(results, k):
+            peaks[stage] = tracemalloc.get_traced_memory()[1] - base
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def bench_stages(scales=('small', 'medium'), k=10, repeat=3, memory=True, output=None, verbose=True,
+                 **generator_kwargs):
+    """Times each stage of an evaluation of synthetic search results at each scale, and traces its peak memory.
+
+    The stages are: building a BaseResult (`ingest`) and a ColumnarResult (`ingest_columnar`) from the results,
+    discovering the labels of a CategoricalField (`label_discovery`), computing the metrics of a NumericalField
+    (`numerical_metrics`) and a CategoricalField (`categorical_metrics`), computing the RBO matrix of all systems
+    (`rbo`), and building the DataFrame views of the summary (`views`).
+
+    Parameters
+    ----------
+    scales : list of str or dict, default=('small', 'medium')
+        The scales to benchmark, as names of `SCALES` or as keyword arguments of `synthetic_results`.
+    k : int, default=10
+        Only use the top K results to calculate the metrics.
+    repeat : int, default=3
+        Number of runs of the stages at each scale. The best time of each stage is reported.
+    memory : bool, default=True
+        If set to True, the stages are run one more time under `tracemalloc` to measure their peak memory.
+    output : str, optional
+        If provided, the records are written to this JSON file, with the commit and the versions of the
+        dependencies, so that they can be compared with `compare`.
+    verbose : bool, default=True
+        If set to True, the records are printed as a table.
+    **generator_kwargs
+        Other keyword arguments of `synthetic_results`, e.g. `n_labels`, `none_rate` or `overlap`.
+
+    Returns
+    -------
+    list of dict
+        One record per scale and stage containing the parameters of the scale, the number of items, the time in
+        seconds and the peak memory in bytes of the stage.
+    """
+    records = []
+    if verbose:
+        print(f'{"scale":>8}{"items":>10}{"stage":>22}{"time (s)":>12}{"peak (MB)":>12}')
+    for scale in scales:
+        name, params = (scale, SCALES[scale]) if isinstance(scale, str) else ('custom', scale)
+        params = {**generator_kwargs, **params}
+        results = synthetic_results(**params)
+        n_items = sum(len(items) for queries in results.values() for items in queries.values())
+        times = [_time_stages(results, k) for _ in range(repeat)]
+        peaks = _trace_stages(results, k) if memory else {}
+        for stage in STAGES:
+            seconds = min(run[stage] for run in times)
+            peak = peaks.get(stage)
+            records.append({'scale': name, **params, 'k': k, 'n_items': n_items, 'stage': stage,
+                            'seconds': seconds, 'peak_memory': peak})
+            if verbose:
+                print(f'{name:>8}{n_items:>10}{stage:>22}{seconds:>12.4f}'
+                      + (f'{peak / 2 ** 20:>12.1f}' if peak is not None else f'{"-":>12}'))
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'environment': _environment(), 'records': records}, f, indent=2)
+    return records
+
+
+def compare(baseline, current, verbose=True):
+    """Compares the records of two runs of `bench_stages` written to JSON files, e.g. on two commits.
+
+    Parameters
+    ----------
+    baseline : str
+        The JSON file of the reference run.
+    current : str
+        The JSON file of the run to compare to the reference.
+    verbose : bool, default=True
+        If set to True, the comparison is printed as a table.
+
+    Returns
+    -------
+    list of dict
+        One record per scale and stage found in both files containing the time and peak memory of each run, and
+        the ratio of the current time to the baseline time.
+    """
+    with open(baseline) as f:
+        before = {(record['scale'], record['n_items'], record['stage']): record for record in json.load(f)['records']}
+    with open(current) as f:
+        after = json.load(f)['records']
+
+    records = []
+    if verbose:
+        print(f'{"scale":>8}{"stage":>22}{"baseline (s)":>14}{"current (s)":>14}{"ratio":>8}')
+    for record in after:
+        key = (record['scale'], record['n_items'], record['stage'])
+        if key not in before:
+            continue
+        ratio = record['seconds'] / before[key]['seconds'] if before[key]['seconds'] else np.nan
+        records.append({'scale': record['scale'], 'n_items': record['n_items'], 'stage': record['stage'],
+                        'baseline_seconds': before[key]['seconds'], 'current_seconds': record['seconds'],
+                        'baseline_peak_memory': before[key]['peak_memory'],
+                        'current_peak_memory': record['peak_memory'], 'ratio': ratio})
+        if verbose:
+            print(f'{record["scale"]:>8}{record["stage"]:>22}{before[key]["seconds"]:>14.4f}'
+                  f'{record["seconds"]:>14.4f}{ratio:>7.2f}x')
+    return records
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', dest='memory', action='store_false')
+    parser.add_argument('--output', help='JSON file the records are written to.')
+    parser.add_argument('--baseline', help='JSON file of a previous run to compare the records to.')
+    args = parser.parse_args()
+    if args.baseline and not args.output:
+        parser.error('--baseline requires --output.')
+    bench_stages(args.scales, repeat=args.repeat, memory=args.memory, output=args.output)
+    if args.baseline:
+        compare(args.baseline, args.output)
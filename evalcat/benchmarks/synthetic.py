@@ -0,0 +1,60 @@
+"""Generates synthetic search results for the benchmarks."""
+
+import numpy as np
+
+
+def synthetic_results(n_systems=3, n_queries=1000, depth=20, n_labels=10, none_rate=0.1, overlap=0.5, seed=0,
+                      vary_depth=True):
+    """Returns random search results as a dictionary of systems, queries and ranked lists of items.
+
+    Each item is a dictionary with an `id`, a numerical `price` and a categorical `label`.
+
+    Parameters
+    ----------
+    n_systems : int, default=3
+        The number of systems.
+    n_queries : int, default=1000
+        The number of queries.
+    depth : int, default=20
+        The maximum depth of the ranked lists.
+    n_labels : int, default=10
+        The number of distinct labels.
+    none_rate : float, default=0.1
+        The probability of a price or a label being None.
+    overlap : float, default=0.5
+        The probability of an item being taken from a ranking shared by all systems for the query, at the same
+        rank, rather than being specific to the system. Controls the RBO between systems.
+    seed : int, default=0
+        Seed of the random generator.
+    vary_depth : bool, default=True
+        If set to True, the depth of each ranked list is drawn uniformly up to `depth`, including empty lists.
+        Else all ranked lists have a depth of `depth`.
+
+    Returns
+    -------
+    dict
+    """
+    rng = np.random.default_rng(seed)
+    n_lists = n_systems * n_queries
+    lengths = rng.integers(0, depth + 1, n_lists) if vary_depth else np.full(n_lists, depth)
+    n_items = int(lengths.sum())
+    segments = np.repeat(np.arange(n_lists), lengths)
+    ranks = np.arange(n_items) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    queries = segments % n_queries
+
+    # Shared items are numbered by (query, rank), and other items by their position, after all shared items.
+    shared = rng.random(n_items) < overlap
+    ids = np.where(shared, queries * depth + ranks, n_queries * depth + np.arange(n_items))
+    prices = np.round(rng.gamma(2.0, 20.0, n_items), 2)
+    labels = rng.integers(0, n_labels, n_items)
+    price_none = rng.random(n_items) < none_rate
+    label_none = rng.random(n_items) < none_rate
+
+    items = [{'id': f'doc {item_id}', 'price': None if no_price else price,
+              'label': None if no_label else f'label {label}'}
+             for item_id, price, label, no_price, no_label in zip(ids.tolist(), prices.tolist(), labels.tolist(),
+                                                                   price_none.tolist(), label_none.tolist())]
+    starts = np.concatenate([[0], np.cumsum(lengths)]).tolist()
+    return {f'system {system}': {f'query {query}': items[starts[segment]:starts[segment + 1]]
+                                 for query, segment in enumerate(range(system * n_queries, (system + 1) * n_queries))}
+            for system in range(n_systems)}
@@ -0,0 +1,132 @@
+"""
+Persistent cache of field summaries.
+
+Summaries are stored per system and field, under a key derived from the fingerprint of the system's search results,
+the cache key of the field and the cutoffs. A ResultList using the cache only computes the summaries of the systems
+whose results, or the fields whose parameters, changed since they were cached.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+# Included in every key, so that summaries cached by an incompatible version of the cache are never read.
+CACHE_VERSION = 1
+
+
+class SummaryCache:
+    """
+    SummaryCache stores summary DataFrames in a directory, evicting the least recently used ones beyond a size limit.
+
+    Parameters
+    ----------
+    directory : str or os.PathLike
+        The directory holding the cached summaries. It is created if it does not exist.
+    max_size : int, default=1 GiB
+        The maximum total size of the cached summaries, in bytes.
+
+    Notes
+    -----
+    Each summary is a pickle file named after its key. The modification time of a file is updated whenever it is
+    read, and the files with the oldest modification times are deleted first. Files are written to a temporary
+    file and renamed, so that several processes can share a cache directory.
+    """
+
+    def __init__(self, directory, max_size=1 << 30):
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(fingerprint, field, k):
+        """Returns the key of the summary of a field for the search results of a system.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The fingerprint of the system's search results, as returned by `BaseResult.fingerprint`.
+        field : Field
+            The field, after `process_base_result` has been called on the full search results.
+        k : int or list of int
+            The cutoffs.
+
+        Returns
+        -------
+        str
+        """
+        parts = (CACHE_VERSION, fingerprint, field.cache_key(), repr(k))
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the summary stored under `key`, or None if it is not in the cache.
+
+        A summary that cannot be read, e.g. a truncated file or one pickled by an incompatible version of pandas, is
+        removed and treated as missing, so that it is computed again.
+        """
+        path = self._path(key)
+        try:
+            summary = pd.read_pickle(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._remove(path)
+            return None
+        self._touch(path)
+        return summary
+
+    def put(self, key, summary):
+        """Stores a summary under `key`, then evicts the least recently used summaries beyond `max_size`."""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                summary.to_pickle(file)
+            os.replace(temp_path, self._path(key))
+        finally:
+            self._remove(temp_path)
+        self._touch(self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used summaries until the cache is smaller than `max_size`."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            self._remove(path)
+            size -= entry_size
+
+    def size(self):
+        """Returns the total size of the cached summaries, in bytes."""
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.pkl'))
+
+    def clear(self):
+        """Deletes all the cached summaries."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                os.remove(entry.path)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _touch(path):
+        now = time.time_ns()
+        try:
+            os.utime(path, ns=(now, now))
+        except FileNotFoundError:
+            pass
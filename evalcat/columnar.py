@@ -0,0 +1,376 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, union_categoricals
+
+from evalcat.aggregate import _python
+from evalcat.base_result import BaseResult, _to_categorical, _to_numerical
+
+
+class ColumnarResult(BaseResult):
+    """
+    ColumnarResult stores the search results as one contiguous array per field instead of a dict per item.
+
+    Numerical fields are stored as int or float arrays, where NaN represents None, and other fields are
+    dictionary-encoded as pd.Categorical. The ranked list of each (system, query) is a slice of these arrays
+    given by `offsets`. Dict-style access, `result[system][query][rank][field]`, is still supported through
+    lightweight views, so that any Field can be computed from a ColumnarResult.
+
+    Parameters
+    ----------
+    systems : list of str
+        The names of the systems.
+    queries : list of str
+        The queries, shared by all systems.
+    offsets : array-like of int
+        Array of length `len(systems) * len(queries) + 1`. The ranked list of `systems[i]` and `queries[j]` spans
+        the positions `offsets[i * len(queries) + j]` to `offsets[i * len(queries) + j + 1]` of every column.
+    columns : dict
+        Maps the field names to arrays or pd.Categorical of length `offsets[-1]`.
+
+    Attributes
+    ----------
+    systems : list
+        Stores the list of system names.
+    queries : list
+        Stores the list of queries.
+    offsets : np.ndarray
+        Stores the boundaries of the ranked lists.
+    columns : dict
+        Stores the array of each field.
+    """
+
+    def __init__(self, systems, queries, offsets, columns):
+        super().__init__({})
+        self._set_columns(systems, queries, offsets, columns)
+
+    def _set_columns(self, systems, queries, offsets, columns):
+        self.clear()
+        self._reset_cache()
+        self.systems = list(systems)
+        self.queries = list(queries)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        if len(self._offsets) != len(self.systems) * len(self.queries) + 1:
+            raise ValueError('`offsets` must contain one boundary per (system, query) plus the end position.')
+        self.columns = {}
+        for name, values in columns.items():
+            if len(values) != self._offsets[-1]:
+                raise ValueError(f'Column {name!r} does not have one value per item.')
+            self.columns[name] = values if isinstance(values, pd.Categorical) else np.asarray(values)
+        self._query_index = {query: idx for idx, query in enumerate(self.queries)}
+        self.update({system: _SystemView(self, idx) for idx, system in enumerate(self.systems)})
+
+    @classmethod
+    def from_results(cls, results, fields=None, queries=None, align=False):
+        """Builds a ColumnarResult from nested dicts of search results.
+
+        Parameters
+        ----------
+        results : dict, or BaseResult
+            Nested python dictionary of search results, structured as for BaseResult.
+        fields : list of str or Field, optional
+            The fields to store. If not provided, will store all the keys of the first search item.
+        queries : list of str, default=None
+            A list of queries. Used in a call to `_check_queries` to check that all systems have the same query set.
+        align : bool, default=False
+            If set to True, systems that miss some queries are given empty ranked lists for them. See BaseResult.
+
+        Returns
+        -------
+        ColumnarResult
+        """
+        if not isinstance(results, BaseResult):
+            results = BaseResult(results, queries, align=align)
+        if fields is None:
+            first_item = next((item for system_row in results.values() for query_row in system_row.values()
+                               for item in query_row), {})
+            fields = list(first_item.keys())
+        columns = {}
+        for field in fields:
+            name = getattr(field, 'name', field)
+            columns[name] = _encode_column(results.column(name))
+        return cls(results.systems, results.queries, results.offsets, columns)
+
+    def to_dict(self):
+        """Returns the search results as nested python dictionaries with a dict per item."""
+        return {system: {query: [dict(item) for item in query_row] for query, query_row in system_row.items()}
+                for system, system_row in self.items()}
+
+    def save(self, directory):
+        """Saves the search results to a directory, in a format that can be memory-mapped by `open`.
+
+        The directory contains `offsets.npy`, one `.npy` file per column holding its values, or the codes of a
+        dictionary-encoded column, and `metadata.json` with the systems, the queries and the categories of the
+        dictionary-encoded columns.
+
+        Parameters
+        ----------
+        directory : str or os.PathLike
+            The directory to write to. The files are first written to a temporary directory next to it, which
+            replaces it and any previous content once all of them are written, so that a failed save leaves it
+            unchanged.
+        """
+        directory = os.path.abspath(directory)
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        temp_directory = tempfile.mkdtemp(prefix=f'.{os.path.basename(directory)}.', dir=os.path.dirname(directory))
+        try:
+            self._save_files(temp_directory)
+            if os.path.exists(directory):
+                old_directory = f'{temp_directory}.old'
+                os.rename(directory, old_directory)
+                os.rename(temp_directory, directory)
+                shutil.rmtree(old_directory)
+            else:
+                os.rename(temp_directory, directory)
+        finally:
+            shutil.rmtree(temp_directory, ignore_errors=True)
+
+    def _save_files(self, directory):
+        np.save(os.path.join(directory, 'offsets.npy'), self.offsets)
+        columns = {}
+        for idx, (name, values) in enumerate(self.columns.items()):
+            filename = f'column_{idx}.npy'
+            if isinstance(values, pd.Categorical):
+                np.save(os.path.join(directory, filename), values.codes)
+                columns[name] = {'file': filename, 'categories': [_python(value) for value in values.categories]}
+            else:
+                np.save(os.path.join(directory, filename), values)
+                columns[name] = {'file': filename}
+        metadata = {'systems': [_python(system) for system in self.systems],
+                    'queries': [_python(query) for query in self.queries], 'columns': columns}
+        with open(os.path.join(directory, 'metadata.json'), 'w', encoding='utf-8') as file:
+            json.dump(metadata, file)
+
+    @classmethod
+    def open(cls, directory, mmap_mode='r'):
+        """Opens search results saved by `save`, memory-mapping the columns instead of reading them.
+
+        Only the pages of the columns that are accessed are read from disk, and processes that open the same
+        directory share them through the page cache.
+
+        Parameters
+        ----------
+        directory : str or os.PathLike
+            The directory written by `save`.
+        mmap_mode : {'r', 'r+', 'c', None}, default='r'
+            Passed to `np.load`. If None, the columns are read into memory.
+
+        Returns
+        -------
+        ColumnarResult
+        """
+        with open(os.path.join(directory, 'metadata.json'), encoding='utf-8') as file:
+            metadata = json.load(file)
+        columns = {}
+        for name, column in metadata['columns'].items():
+            values = np.load(os.path.join(directory, column['file']), mmap_mode=mmap_mode)
+            if 'categories' in column:
+                dtype = pd.CategoricalDtype(pd.Index(column['categories'], dtype=object))
+                values = pd.Categorical.from_codes(values, dtype=dtype)
+            columns[name] = values
+        offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode=mmap_mode)
+        return cls(metadata['systems'], metadata['queries'], offsets, columns)
+
+    def add_system(self, system, results):
+        """Adds the search results of a new system, which must cover the same queries as the other systems.
+
+        The values of the new system are appended to the columns. Dictionary-encoded columns keep their codes and
+        are widened with the categories of the new system, and integer columns become float columns if the new
+        system has missing values.
+
+        Parameters
+        ----------
+        system : str
+            The name of the new system.
+        results : dict
+            Maps each query to the ranked list of items of the new system.
+        """
+        if system in self:
+            raise ValueError(f'System {system!r} is already in the search results.')
+        new = ColumnarResult.from_results({system: results}, fields=list(self.columns), queries=self.queries or None)
+        offsets = np.concatenate([self.offsets, new.offsets[1:] + self.offsets[-1]])
+        columns = {name: _concat_columns([values, new.columns[name]]) for name, values in self.columns.items()}
+        self._set_columns(self.systems + [system], new.queries, offsets, columns)
+
+    def remove_system(self, system):
+        """Removes the search results of a system."""
+        if system not in self:
+            raise ValueError(f'System {system!r} is not in the search results.')
+        systems = [other for other in self.systems if other != system]
+        subset = self.subset(systems, self.queries if systems else [])
+        self._set_columns(subset.systems, subset.queries, subset.offsets, subset.columns)
+
+    def add_queries(self, results):
+        """Adds the search results of new queries to every system.
+
+        The columns are rebuilt with the ranked lists of the new queries placed after those of the existing
+        queries of each system.
+
+        Parameters
+        ----------
+        results : dict
+            Nested python dictionary of search results, structured as for BaseResult, containing every system and
+            the same new queries for each system.
+        """
+        queries = self._check_new_queries(results)
+        new = ColumnarResult.from_results({system: results[system] for system in self.systems},
+                                          fields=list(self.columns), queries=queries)
+        n_systems, n_old, n_new = len(self.systems), len(self.queries), len(queries)
+        segments = np.concatenate([np.arange(n_systems * n_old).reshape(n_systems, n_old),
+                                   n_systems * n_old + np.arange(n_systems * n_new).reshape(n_systems, n_new)],
+                                  axis=1).ravel()
+        starts = np.concatenate([self.offsets[:-1], new.offsets[:-1] + self.offsets[-1]])[segments]
+        lengths = np.concatenate([np.diff(self.offsets), np.diff(new.offsets)])[segments]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        positions = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], lengths)
+        columns = {name: _concat_columns([values, new.columns[name]])[positions]
+                   for name, values in self.columns.items()}
+        self._set_columns(self.systems, self.queries + queries, offsets, columns)
+
+    def subset(self, systems=None, queries=None):
+        """Returns a ColumnarResult containing only some of the systems and queries.
+
+        If the ranked lists to keep are contiguous, e.g. a range of systems with all their queries,
+        the columns of the subset are views of the columns of this ColumnarResult.
+
+        Parameters
+        ----------
+        systems : list of str, optional
+            The systems to keep. If not provided, will keep all systems.
+        queries : list of str, optional
+            The queries to keep. If not provided, will keep all queries.
+
+        Returns
+        -------
+        ColumnarResult
+        """
+        systems = self.systems if systems is None else list(systems)
+        queries = self.queries if queries is None else list(queries)
+        system_idx = np.array([self.systems.index(system) for system in systems], dtype=np.int64)
+        query_idx = np.array([self._query_index[query] for query in queries], dtype=np.int64)
+        segments = (system_idx[:, np.newaxis] * len(self.queries) + query_idx).ravel()
+
+        lengths = self.offsets[segments + 1] - self.offsets[segments]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        if len(segments) and np.all(np.diff(segments) == 1):
+            positions = slice(self.offsets[segments[0]], self.offsets[segments[-1] + 1])
+        else:
+            positions = np.arange(offsets[-1]) + np.repeat(self.offsets[segments] - offsets[:-1], lengths)
+        return ColumnarResult(systems, queries, offsets,
+                              {name: values[positions] for name, values in self.columns.items()})
+
+    def fingerprint(self, system):
+        """Returns a hash of the search results of a system, computed from the slices of its columns.
+
+        Dictionary-encoded columns are hashed by the categories used by the system and the codes relative to them,
+        so that categories added by other systems do not change the fingerprint.
+        """
+        offsets = self.system_offsets(system)
+        positions = slice(offsets[0], offsets[-1])
+        digest = hashlib.sha256(repr(self.queries).encode())
+        digest.update(np.ascontiguousarray(offsets - offsets[0]).tobytes())
+        for name, values in self.columns.items():
+            digest.update(repr(name).encode())
+            if isinstance(values, pd.Categorical):
+                used, codes = np.unique(values.codes[positions], return_inverse=True)
+                digest.update(repr([None if code < 0 else values.categories[code] for code in used]).encode())
+                digest.update(codes.astype(np.int64).tobytes())
+            else:
+                digest.update(values.dtype.str.encode())
+                digest.update(np.ascontiguousarray(values[positions]).tobytes())
+        return digest.hexdigest()
+
+    def column(self, name):
+        return self.columns[name]
+
+    def numerical_column(self, name):
+        values = self.columns[name]
+        if isinstance(values, np.ndarray) and values.dtype == float:
+            return values
+        return super().numerical_column(name)
+
+    def categorical_column(self, name):
+        values = self.columns[name]
+        if isinstance(values, pd.Categorical):
+            return values
+        return super().categorical_column(name)
+
+    def _value(self, name, position):
+        values = self.columns[name]
+        if isinstance(values, pd.Categorical):
+            code = values.codes[position]
+            return None if code < 0 else values.categories[code]
+        value = values[position].item()
+        return None if value != value else value
+
+
+class _SystemView(Mapping):
+    """Read-only mapping from the queries of a system in a ColumnarResult to their ranked lists of items."""
+
+    __slots__ = ('_result', '_start')
+
+    def __init__(self, result, system_idx):
+        self._result = result
+        self._start = system_idx * len(result.queries)
+
+    def __getitem__(self, query):
+        idx = self._start + self._result._query_index[query]
+        offsets = self._result.offsets
+        return [_Item(self._result, position) for position in range(offsets[idx], offsets[idx + 1])]
+
+    def __iter__(self):
+        return iter(self._result.queries)
+
+    def __len__(self):
+        return len(self._result.queries)
+
+
+class _Item(Mapping):
+    """Read-only mapping from field names to the values of a single item in a ColumnarResult."""
+
+    __slots__ = ('_result', '_position')
+
+    def __init__(self, result, position):
+        self._result = result
+        self._position = position
+
+    def __getitem__(self, name):
+        return self._result._value(name, self._position)
+
+    def __iter__(self):
+        return iter(self._result.columns)
+
+    def __len__(self):
+        return len(self._result.columns)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def _concat_columns(columns):
+    """Concatenates columns encoded by `_encode_column`, dictionary-encoding them all if any of them is."""
+    if not any(isinstance(values, pd.Categorical) for values in columns):
+        return np.concatenate(columns)
+    categoricals = []
+    for values in columns:
+        if not isinstance(values, pd.Categorical):
+            values = _to_categorical(pd.Series(values, dtype=object).where(~pd.isna(values), None).to_numpy())
+        categoricals.append(values)
+    union = union_categoricals(categoricals)
+    return pd.Categorical.from_codes(union.codes, categories=pd.Index(union.categories, dtype=object))
+
+
+def _encode_column(values):
+    """Stores integer columns as int arrays, other numerical columns as float arrays and the rest as categoricals."""
+    kind = infer_dtype(values, skipna=True)
+    if kind == 'integer' and not any(value is None for value in values):
+        return values.astype(np.int64)
+    if kind in ('integer', 'floating', 'mixed-integer-float', 'empty', 'decimal'):
+        return _to_numerical(values)
+    return _to_categorical(values)
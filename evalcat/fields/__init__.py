@@ -1,4 +1,5 @@
 from evalcat.fields.numerical import NumericalField
 from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.relevance import RelevanceField
 
-__all__ = ['NumericalField', 'CategoricalField']
+__all__ = ['NumericalField', 'CategoricalField', 'RelevanceField']
@@ -1,8 +1,15 @@
 import abc
+import itertools
+import numbers
+import operator
 
 
+import numpy as np
 import pandas as pd
 
+from evalcat.aggregate import MetricAggregate
+from evalcat.profiling import stage
+
 
 class Field(abc.ABC):
     """Abstract base class for all fields.
@@ -13,7 +20,21 @@ class Field(abc.ABC):
     ------
     name : str
         Name of the field must be the same as the field in the search results.
+
+    Attributes
+    ----------
+    at_k_batch : callable, optional
+        Computes statistics for the top K hits of all ranked lists at once. Defaults to None, and may be defined by
+        subclasses as a method `at_k_batch(columns, offsets, k)`. If defined, `compute_metrics` calls it instead of
+        calling `at_k` for each ranked list, so that the statistics can be vectorized over the concatenated items of
+        all ranked lists. `columns` maps the field names of `batch_columns` to their values for all items,
+        concatenated in the order of `offsets`, the boundaries of each ranked list as in `BaseResult.offsets`. It
+        returns a float array of shape (ranked lists, metrics), where NaN is None, and the names of the metrics.
+        It is only used if it is defined by the class defining `at_k` or by a subclass of it, so that a subclass
+        overriding `at_k`, e.g. of NumericalField, is computed with its `at_k` unless it also defines `at_k_batch`.
     """
+    at_k_batch = None
+
     def __init__(self, name):
         self.name = name
 
@@ -31,7 +52,79 @@ class Field(abc.ABC):
             Contains the full search results.
         """
 
-    def compute_metrics(self, base_result, k):
+    def widen_summary(self, summary, base_result):
+        """Updates the field for new search results, and returns its existing summary with any new metric columns.
+
+        Called by ResultList before computing the metrics of new systems or queries, so that the new and existing
+        summaries can be concatenated. Override if `process_base_result` derives metrics from the search results.
+
+        Parameters
+        ----------
+        summary : pd.DataFrame
+            The summary of the field for the existing search results.
+        base_result : BaseResult
+            Contains only the new search results.
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        return summary
+
+    def narrow_summary(self, summary, base_result):
+        """Updates the field for removed search results, and returns its summary without metrics they alone had.
+
+        Called by ResultList after removing a system and its rows from `summary`, so that the summary matches one
+        computed from the remaining search results. Override along with `widen_summary`.
+
+        Parameters
+        ----------
+        summary : pd.DataFrame
+            The summary of the field for the remaining search results.
+        base_result : BaseResult
+            Contains the remaining search results.
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        return summary
+
+    def cache_key(self):
+        """Returns a string identifying this field and its parameters, used to cache its summaries.
+
+        Two fields with the same cache key must compute the same metrics from the same search results.
+        The default key is made of the class and the attributes of the field, so it also reflects the state set by
+        `process_base_result`. Override if some attributes do not affect the metrics or cannot be represented.
+
+        Returns
+        -------
+        str
+        """
+        cls = type(self)
+        return repr((cls.__module__, cls.__qualname__, _canonical(vars(self))))
+
+    def aggregate(self, k, sketch_size=200):
+        """Returns an empty partial aggregate of the metrics of this field, used by StreamingEvaluator.
+
+        The aggregate keeps the sum, count and a quantile sketch of each metric over ranked lists, and can be merged
+        with the aggregates of other ranked lists. Override if the metrics cannot be averaged over ranked lists as
+        they are returned by `at_k`.
+
+        Parameters
+        ----------
+        k : int
+            Only use the top K results to calculate the metrics.
+        sketch_size : int, default=200
+            The size of the quantile sketch of each metric.
+
+        Returns
+        -------
+        MetricAggregate
+        """
+        return MetricAggregate(self, k, sketch_size)
+
+    def compute_metrics(self, base_result, k, metrics=None):
         """Computes metrics and returns a DataFrame with MultiIndex (system, query) and column metric.
 
         Should be called directly by ResultList to generate a summary DataFrame for this field.
@@ -40,32 +133,72 @@ class Field(abc.ABC):
         ----------
         base_result : BaseResult
             Contains the full search results.
-        k : int, default=None
+        k : int or list of int, default=None
             Only use the top K results to calculate of statistics.
+            If a list of cutoffs is given, the metrics are computed at each cutoff.
+        metrics : list of str, optional
+            Only return these metrics. Subclasses may skip the computation of the other metrics.
 
         Returns
         -------
         pd.DataFrame
-            DataFrame with MultiIndex (system, query) and column metric.
-            Contains the computed metrics for the search results.
+            DataFrame with MultiIndex (system, query) and column metric, or MultiIndex (system, query, k)
+            if `k` is a list of cutoffs. Contains the computed metrics for the search results.
 
         Notes
         -----
-        Iterates over system and query, applying `at_k` to each search result list.
+        If the subclass defines `at_k_batch`, it is called with the columns of `batch_columns` for all ranked
+        lists at once, at each cutoff. Otherwise iterates over system and query, applying `at_k` to each search
+        result list at each cutoff. The stages `process_base_result`, `metrics` (the `at_k_batch` calls, or the
+        `at_k` calls of each system) and `dataframe` are recorded by an active `evalcat.profiling.Profiler`.
         """
-        self.process_base_result(base_result)
+        with stage('process_base_result', self.name):
+            self.process_base_result(base_result)
+
+        cutoffs, multi_k = cutoff_list(k)
+        if _uses_at_k_batch(self):
+            index = summary_index(base_result, cutoffs if multi_k else None)
+            if not len(index):
+                return pd.DataFrame([], index=index, columns=[])
+            columns = {name: _batch_column(base_result, name, kind) for name, kind in self.batch_columns().items()}
+            with stage('metrics', self.name):
+                values, metric_labels = self._batch_metrics(columns, base_result.offsets, cutoffs, metrics)
+            with stage('dataframe', self.name):
+                summary = pd.DataFrame(values.reshape(len(index), -1), index=index, columns=metric_labels, copy=False)
+            return select_metrics(summary, metrics)
 
-        metrics = []
-        metric_labels = []
+        rows = []
         for system in base_result.systems:
-            for query in base_result.queries:
-                computed_metric = self.at_k(base_result[system][query], k=k)
-                if not metric_labels:
-                    metric_labels = computed_metric.keys()
-                metrics.append(computed_metric.values())
-        return pd.DataFrame(metrics,
-                            index=pd.MultiIndex.from_product([base_result.systems, base_result.queries]),
-                            columns=metric_labels)
+            with stage('metrics', self.name, system, calls=len(base_result.queries) * len(cutoffs)):
+                for query in base_result.queries:
+                    result_list = base_result[system][query]
+                    for cutoff in cutoffs:
+                        rows.append(self.at_k(result_list, k=cutoff))
+        with stage('dataframe', self.name):
+            index = summary_index(base_result, cutoffs if multi_k else None)
+            summary = _summary_frame(rows, index)
+        return select_metrics(summary, metrics)
+
+    def batch_columns(self):
+        """Returns the columns passed to `at_k_batch`, as a dict mapping field names to the kind of their column.
+
+        The kinds are 'numerical', a float array where NaN is None, 'categorical', a pd.Categorical where None is
+        missing, or 'object', an object array. Override along with defining `at_k_batch`.
+
+        Returns
+        -------
+        dict
+        """
+        return {self.name: 'object'}
+
+    def _batch_metrics(self, columns, offsets, cutoffs, metrics=None):
+        """Returns the array of shape (ranked lists, cutoffs, metrics) of `at_k_batch` at each cutoff, and the labels.
+
+        Internal to the fields of evalcat: NumericalField and CategoricalField replace it to compute all cutoffs in a
+        single pass, or only `metrics`.
+        """
+        values, labels = zip(*(self.at_k_batch(columns, offsets, cutoff) for cutoff in cutoffs))
+        return np.stack([np.asarray(cutoff_values, dtype=float) for cutoff_values in values], axis=1), list(labels[0])
 
     @abc.abstractmethod
     def at_k(self, result_list, k):
@@ -95,3 +228,134 @@ class Field(abc.ABC):
             'mean': 2
         }
         """
+
+
+def _uses_at_k_batch(field):
+    """Returns whether `field` defines `at_k_batch` in the class defining `at_k` or in a subclass of it."""
+    if field.at_k_batch is None:
+        return False
+    mro = type(field).__mro__
+    batch_class = next(cls for cls in mro if 'at_k_batch' in vars(cls))
+    return issubclass(batch_class, next(cls for cls in mro if 'at_k' in vars(cls)))
+
+
+def _canonical(value):
+    """Returns a representation of `value` that does not depend on the iteration order of sets and dicts."""
+    if isinstance(value, dict):
+        return sorted((repr(key), _canonical(item)) for key, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return ('set', sorted(repr(_canonical(item)) for item in value))
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return repr(value)
+
+
+_NUMBER_TYPES = (numbers.Real, np.bool_)
+
+
+def _summary_frame(rows, index):
+    """Returns a summary DataFrame from the metrics of all rows, each a dict mapping the metrics to their values.
+
+    The columns are the metrics in order of first appearance, and a row without a metric is NaN for it. The metrics
+    are flattened in row-major order and converted with `np.fromiter` to a float array, where None is NaN, which the
+    DataFrame wraps without copying. Metrics that are not numbers, e.g. labels, are kept as objects, with the dtype of
+    each column inferred, and columns of numbers are float as in the float array.
+    """
+    columns = list(rows[0]) if rows else []
+    if any(row.keys() != rows[0].keys() for row in rows):
+        columns = list(dict.fromkeys(itertools.chain.from_iterable(rows)))
+        cells = [row.get(column) for row in rows for column in columns]
+    elif len(columns) > 1:
+        cells = list(itertools.chain.from_iterable(map(operator.itemgetter(*columns), rows)))
+    else:
+        cells = [row[column] for row in rows for column in columns]
+    if not columns:
+        return pd.DataFrame([], index=index, columns=[])
+    # Only numbers are converted, as float() would also parse strings that look like numbers.
+    if all(cell is None or isinstance(cell, _NUMBER_TYPES) for cell in cells):
+        values = np.fromiter(cells, dtype=float, count=len(cells))
+        return pd.DataFrame(values.reshape(len(index), len(columns)), index=index, columns=columns, copy=False)
+    values = np.empty(len(cells), dtype=object)
+    values[:] = cells
+    summary = pd.DataFrame(values.reshape(len(index), len(columns)), index=index, columns=columns).infer_objects()
+    numbers_only = [column for column, dtype in summary.dtypes.items() if dtype.kind in 'iub']
+    return summary.astype(dict.fromkeys(numbers_only, float)) if numbers_only else summary
+
+
+def _batch_column(base_result, name, kind):
+    if kind == 'numerical':
+        return base_result.numerical_column(name)
+    if kind == 'categorical':
+        return base_result.categorical_column(name)
+    if kind == 'object':
+        return base_result.column(name)
+    raise ValueError(f"Column kind must be 'numerical', 'categorical' or 'object', got {kind!r}.")
+
+
+def segment_ranks(offsets):
+    """Returns the segment and the 0-based rank of every item in the ranked lists delimited by `offsets`.
+
+    Parameters
+    ----------
+    offsets : np.ndarray
+        Boundaries of each ranked list, as in `BaseResult.offsets`.
+
+    Returns
+    -------
+    segments : np.ndarray
+        The index of the ranked list containing each item.
+    ranks : np.ndarray
+        The rank of each item in its ranked list.
+    """
+    lengths = np.diff(offsets)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    ranks = np.arange(offsets[-1] - offsets[0]) - np.repeat(offsets[:-1] - offsets[0], lengths)
+    return segments, ranks
+
+
+def cutoff_list(k):
+    """Returns the list of cutoffs in `k`, and whether `k` is a list of cutoffs rather than a single cutoff."""
+    if isinstance(k, (list, tuple, range, np.ndarray)):
+        if not len(k):
+            raise ValueError('`k` must contain at least one cutoff.')
+        return list(k), True
+    return [k], False
+
+
+def summary_index(base_result, cutoffs=None):
+    """Returns the MultiIndex (system, query) of a summary DataFrame, or (system, query, k) if cutoffs are given."""
+    levels = [base_result.systems, base_result.queries]
+    if cutoffs is not None:
+        levels.append(cutoffs)
+    return pd.MultiIndex.from_product(levels)
+
+
+def select_metrics(summary, metrics=None):
+    """Returns the columns of a summary DataFrame that are in `metrics`, or all columns if `metrics` is None."""
+    if metrics is None:
+        return summary
+    return summary.loc[:, [metric for metric in summary.columns if metric in metrics]]
+
+
+def rank_bands(ranks, depths):
+    """Splits items into bands of ranks, so that metrics at several cutoffs can be accumulated incrementally.
+
+    Parameters
+    ----------
+    ranks : np.ndarray
+        The rank of each item in its ranked list.
+    depths : list of int
+        The cutoffs, in ascending order.
+
+    Returns
+    -------
+    list of np.ndarray
+        For each depth, the positions of the items with a rank from the previous depth (inclusive)
+        to this depth (exclusive), in the order of `ranks` within each rank. With a single depth, the positions are
+        in the order of `ranks` without sorting.
+    """
+    if len(depths) == 1:
+        return [np.flatnonzero(ranks < depths[0])]
+    by_rank = np.argsort(ranks, kind='stable')
+    bounds = np.searchsorted(ranks[by_rank], depths)
+    return [by_rank[start:end] for start, end in zip(np.concatenate([[0], bounds[:-1]]), bounds)]
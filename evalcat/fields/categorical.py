@@ -1,4 +1,11 @@
-from evalcat.fields.base import Field
+import numpy as np
+import pandas as pd
+
+from evalcat.aggregate import LabelAggregate
+from evalcat.fields.base import Field, rank_bands, segment_ranks
+
+# Number of codes counted at once when looking for the labels, so that memory-mapped columns are read in chunks.
+LABELS_CHUNK_SIZE = 1 << 22
 
 
 class CategoricalField(Field):
@@ -14,25 +21,65 @@ class CategoricalField(Field):
         If not provided, `_get_labels` will be called to retrieve label values.
     ignore_none : bool, default=True
         If set to True, will ignore items with None or "" labels, or if `labels` are provided, will ignore
-        labels not in that list. Else if set to False, all the aforementioned labels will be mapped to None.
+        labels not in that list. Else if set to False, all the aforementioned labels will be mapped to None, which
+        is added to `labels` if they are provided without it.
     """
 
     def __init__(self, name, labels=None, ignore_none=True):
         super().__init__(name)
         if labels:
-            self.labels = set(labels)
+            self.labels = set(labels) if ignore_none else set(labels) | {None}
         else:
             self.labels = None
         self.ignore_none = ignore_none
+        self._detect_labels = not labels
 
     def process_base_result(self, base_result):
         if not self.labels:
             self.labels = self._get_labels(base_result)
 
+    def widen_summary(self, summary, base_result):
+        """Adds the labels of new search results to the field, and a column of zeros per new label to `summary`.
+
+        Labels passed to the constructor are kept as they are. Ranked lists whose fractions are NaN, because they
+        are empty or all of their labels are ignored, are NaN for the new labels too.
+        """
+        if not self._detect_labels or self.labels is None:
+            return summary
+        new_labels = [label for label in self._get_labels(base_result) if label not in self.labels]
+        if not new_labels:
+            return summary
+        self.labels.update(new_labels)
+        if 'unique_count' not in summary.columns:
+            return summary
+        zeros = np.where(summary['unique_count'] > 0, 0.0, np.nan)
+        widened = summary.drop(columns='unique_count')
+        for label in new_labels:
+            widened[label] = zeros
+        widened['unique_count'] = summary['unique_count']
+        return widened
+
+    def narrow_summary(self, summary, base_result):
+        """Drops the labels that no remaining search result has from the field, and their columns from `summary`.
+
+        Labels passed to the constructor are kept as they are.
+        """
+        if not self._detect_labels or self.labels is None:
+            return summary
+        self.labels = self._get_labels(base_result) if base_result.systems else set()
+        # The None label may be stored as a NaN column name.
+        removed = [column for column in summary.columns.drop('unique_count', errors='ignore')
+                   if (None if column != column else column) not in self.labels]
+        return summary.drop(columns=removed)
+
+    def aggregate(self, k, sketch_size=200):
+        """Returns an empty LabelAggregate, which discovers the labels as they arrive unless they were provided."""
+        return LabelAggregate(self, k, sketch_size, labels=None if self._detect_labels else self.labels)
+
     def _get_labels(self, base_result):
         """Returns a set containing all unique labels from the corresponding Field in BaseResult.
 
-        Iterates over all systems, queries and items, returning all unique labels in the Field.
+        Reads the dictionary-encoded column of the Field, returning all labels that occur in it.
         If `self.ignore_none` is True, ignores labels that are empty strings or None.
 
         Returns
@@ -42,19 +89,96 @@ class CategoricalField(Field):
 
         Notes
         -----
-        Since this function will iterate over all systems, queries and items, it might take a long time for large
-        result lists. An alternative would be to pass a list of labels to the constructor to skip this step.
+        The encoded column is cached by BaseResult and reused by `compute_metrics`, so the search results are only
+        traversed once. Passing a list of labels to the constructor skips this step.
         """
+        column = base_result.categorical_column(self.name)
+        occurs = np.zeros(len(column.categories) + 1, dtype=bool)
+        for start in range(0, len(column.codes), LABELS_CHUNK_SIZE):
+            occurs |= np.bincount(column.codes[start:start + LABELS_CHUNK_SIZE] + 1, minlength=len(occurs)) > 0
         labels = set()
-        for system_row in base_result.values():
-            for query_row in system_row.values():
-                for item in query_row:
-                    if item[self.name]:
-                        labels.add(item[self.name])
-                    elif not self.ignore_none:
-                        labels.add(None)
+        for label, label_occurs in zip(column.categories, occurs[1:]):
+            if not label_occurs:
+                continue
+            if label:
+                labels.add(label)
+            elif not self.ignore_none:
+                labels.add(None)
+        if occurs[0] and not self.ignore_none:
+            labels.add(None)
         return labels
 
+    def batch_columns(self):
+        return {self.name: 'categorical'}
+
+    def at_k_batch(self, columns, offsets, k):
+        """Vectorized `at_k` over the ranked lists delimited by `offsets`, from the dictionary-encoded column."""
+        values, labels = self._batch_metrics(columns, offsets, [k])
+        return values[:, 0], labels
+
+    def _batch_metrics(self, columns, offsets, cutoffs, metrics=None):
+        """Computes the label distributions at all cutoffs in a single pass."""
+        labels = list(self.labels)
+        return self._metrics_at_k(columns[self.name], offsets, cutoffs, labels), labels + ['unique_count']
+
+    def _metrics_at_k(self, column, offsets, cutoffs, labels):
+        """Vectorized `at_k` over the ranked lists delimited by `offsets`, at each cutoff.
+
+        Parameters
+        ----------
+        column : pd.Categorical
+            The dictionary-encoded field values of all items.
+        offsets : np.ndarray
+            Boundaries of each ranked list in `column`.
+        cutoffs : list of int
+            Only use the top K results to calculate of statistics, for each K in `cutoffs`.
+        labels : list
+            The labels to count, in the order of the output columns.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (ranked lists, cutoffs, labels + 1). The label columns contain the fraction of items with
+            that label and the last column contains the number of unique labels. Empty ranked lists are NaN.
+
+        Notes
+        -----
+        Label counts are accumulated from one cutoff to the next over the items between the two cutoffs.
+        """
+        n_segments, n_labels = len(offsets) - 1, len(labels)
+        segments, ranks = segment_ranks(offsets)
+        columns = self._label_columns(column.categories, labels)[column.codes]
+        keep = columns >= 0
+        max_depth = int(np.diff(offsets).max(initial=0))
+        depths = [min(cutoff, max_depth) if cutoff else max_depth for cutoff in cutoffs]
+        keep &= ranks < max(depths)
+        cells, ranks = segments[keep] * n_labels + columns[keep], ranks[keep]
+
+        counts = np.zeros(n_segments * n_labels, dtype=np.int64)
+        metrics = np.empty((n_segments, len(cutoffs), n_labels + 1))
+        unique_depths = sorted(set(depths))
+        for depth, band in zip(unique_depths, rank_bands(ranks, unique_depths)):
+            counts += np.bincount(cells[band], minlength=n_segments * n_labels)
+            depth_counts = counts.reshape(n_segments, n_labels)
+            depth_metrics = np.empty((n_segments, n_labels + 1))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                depth_metrics[:, :-1] = depth_counts / depth_counts.sum(axis=1, keepdims=True)
+            depth_metrics[:, -1] = np.count_nonzero(depth_counts, axis=1)
+            metrics[:, [idx for idx, cutoff_depth in enumerate(depths) if cutoff_depth == depth]] = \
+                depth_metrics[:, np.newaxis]
+        metrics[np.diff(offsets) == 0] = np.nan
+        return metrics
+
+    def _label_columns(self, categories, labels):
+        """Maps each category, and missing values as the last element, to its column in `labels` or to -1 if ignored.
+
+        As in `at_k`, categories not in `labels` are counted as None if `ignore_none` is False.
+        """
+        label_idx = {label: idx for idx, label in enumerate(labels)}
+        other = -1 if self.ignore_none else label_idx.get(None, -1)
+        return np.array([label_idx[category] if category in label_idx else other for category in categories]
+                        + [label_idx.get(None, other)], dtype=np.int64)
+
     def at_k(self, result_list, k=None):
         if not result_list:
             metrics = {label: None for label in self.labels}
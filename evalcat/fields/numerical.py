@@ -1,7 +1,11 @@
 import math
 
 
-from evalcat.fields.base import Field
+import numpy as np
+import pandas as pd
+
+
+from evalcat.fields.base import Field, rank_bands, segment_ranks
 
 
 class NumericalField(Field):
@@ -26,6 +30,80 @@ class NumericalField(Field):
             self.percentiles = [1, 25, 50, 75, 99]
         self.ignore_none = ignore_none
 
+    def batch_columns(self):
+        return {self.name: 'numerical'}
+
+    def at_k_batch(self, columns, offsets, k):
+        """Vectorized `at_k` over the ranked lists delimited by `offsets`, from the numerical column of the field."""
+        values, labels = self._batch_metrics(columns, offsets, [k])
+        return values[:, 0], labels
+
+    def _batch_metrics(self, columns, offsets, cutoffs, metrics=None):
+        """Computes all cutoffs in a single pass. The values are not sorted if no percentile is in `metrics`."""
+        percentiles = [n for n in self.percentiles if metrics is None or f'{n}-percentile' in metrics]
+        values = self._metrics_at_k(columns[self.name], offsets, cutoffs, percentiles)
+        return values, [f'{n}-percentile' for n in percentiles] + ['total', 'mean']
+
+    def _metrics_at_k(self, values, offsets, cutoffs, percentiles=None):
+        """Vectorized `at_k` over the ranked lists delimited by `offsets`, at each cutoff.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Float array of the field values of all items, where NaN represents None.
+        offsets : np.ndarray
+            Boundaries of each ranked list in `values`.
+        cutoffs : list of int
+            Only use the top K results to calculate of statistics, for each K in `cutoffs`.
+        percentiles : list of int or float, optional
+            The percentiles to compute. If not provided, will use `self.percentiles`.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (ranked lists, cutoffs, percentiles + 2), where the last two columns are the total and
+            the mean. Ranked lists without any field values are NaN.
+
+        Notes
+        -----
+        The values are sorted once, and each cutoff selects its values from the sorted array for the percentiles.
+        Counts and totals are accumulated from one cutoff to the next over the items between the two cutoffs.
+        """
+        if percentiles is None:
+            percentiles = self.percentiles
+        n_segments = len(offsets) - 1
+        segments, ranks = segment_ranks(offsets)
+        if self.ignore_none:
+            valid = ~np.isnan(values)
+        else:
+            values = np.nan_to_num(values, nan=0.0)
+            valid = np.ones(len(values), dtype=bool)
+        max_depth = int(np.diff(offsets).max(initial=0))
+        depths = [min(cutoff, max_depth) if cutoff else max_depth for cutoff in cutoffs]
+        valid &= ranks < max(depths)
+        values, segments, ranks = values[valid], segments[valid], ranks[valid]
+
+        if percentiles:
+            order = np.lexsort((values, segments))
+            sorted_values, sorted_ranks = values[order], ranks[order]
+        counts = np.zeros(n_segments, dtype=np.int64)
+        totals = np.zeros(n_segments)
+        metrics = np.empty((n_segments, len(cutoffs), len(percentiles) + 2))
+        unique_depths = sorted(set(depths))
+        for depth, band in zip(unique_depths, rank_bands(ranks, unique_depths)):
+            counts += np.bincount(segments[band], minlength=n_segments)
+            totals += np.bincount(segments[band], weights=values[band], minlength=n_segments)
+            depth_metrics = np.empty((n_segments, len(percentiles) + 2))
+            if percentiles:
+                depth_metrics[:, :-2] = segment_percentiles(sorted_values[sorted_ranks < depth], counts, percentiles)
+            depth_metrics[:, -2] = totals
+            with np.errstate(divide='ignore', invalid='ignore'):
+                depth_metrics[:, -1] = totals / counts
+            depth_metrics[counts == 0] = np.nan
+            metrics[:, [idx for idx, cutoff_depth in enumerate(depths) if cutoff_depth == depth]] = \
+                depth_metrics[:, np.newaxis]
+        return metrics
+
     def at_k(self, result_list, k=None):
         if not k:
             k = len(result_list)
@@ -84,3 +162,33 @@ def percentile(arr, percentiles):
         else:
             output[idx] = (c - x) * arr[int(f)] + (x - f) * arr[int(c)]
     return output
+
+
+def segment_percentiles(arr, counts, percentiles):
+    """Computes the percentile values of many sorted arrays at once, as `percentile` does for a single array.
+
+    Parameters
+    ----------
+    arr : np.ndarray
+        Concatenation of the input arrays, each sorted in ascending order.
+    counts : np.ndarray
+        The length of each input array.
+    percentiles : list of int or float
+        List of percentile values to compute, must be between 0 and 100 inclusive.
+
+    Returns
+    ------
+    output : np.ndarray
+        Array of shape (len(counts), len(percentiles)). Rows of empty input arrays are NaN.
+    """
+    output = np.full((len(counts), len(percentiles)), np.nan)
+    nonempty = counts > 0
+    counts = counts[nonempty]
+    starts = (np.cumsum(counts) - counts)[:, np.newaxis]
+    x = (counts[:, np.newaxis] - 1) * (np.asarray(percentiles, dtype=float) / 100)
+    f = np.floor(x)
+    c = np.ceil(x)
+    lower = arr[starts + f.astype(np.int64)]
+    upper = arr[starts + c.astype(np.int64)]
+    output[nonempty] = np.where(f == c, lower, (c - x) * lower + (x - f) * upper)
+    return output
@@ -0,0 +1,273 @@
+import hashlib
+import math
+import pickle
+
+
+import numpy as np
+import pandas as pd
+
+
+from evalcat.aggregate import QueryAggregate
+from evalcat.fields.base import Field, _canonical, cutoff_list, rank_bands, segment_ranks, select_metrics, summary_index
+from evalcat.profiling import stage
+
+
+class RelevanceField(Field):
+    """
+    RelevanceField provides methods for the computation of relevance metrics from relevance judgments (qrels).
+
+    Parameters
+    ----------
+    name : str
+        The name of the field identifying a document in each search item.
+    qrels : dict
+        Maps each query to a dictionary mapping document identifiers to relevance grades.
+    relevance_level : int or float, default=1
+        Documents with a grade of at least `relevance_level` are relevant, for all metrics but nDCG.
+    gain : {'linear', 'exponential'}, default='linear'
+        The gain of a document of grade g for nDCG: g as in trec_eval, or 2^g - 1.
+
+    Notes
+    -----
+    Computes the following metrics at cutoff k, following the definitions of trec_eval:
+
+    - ndcg: the discounted cumulative gain with a discount of 1 / log2(rank + 1), divided by that of the ideal
+      ranking of the judged documents of the query.
+    - ap: the average precision, the sum of the precision at the rank of each relevant retrieved document divided
+      by the number of relevant documents of the query.
+    - rr: the reciprocal rank of the first relevant document, or 0.
+    - precision: the number of relevant retrieved documents divided by k, or by the length of the ranked list if k
+      is not provided.
+    - recall: the number of relevant retrieved documents divided by the number of relevant documents of the query.
+
+    Documents that are not judged have a grade of 0, and queries without relevant documents are NaN.
+    """
+    METRICS = ['ndcg', 'ap', 'rr', 'precision', 'recall']
+
+    def __init__(self, name, qrels, relevance_level=1, gain='linear'):
+        super().__init__(name)
+        if gain not in ('linear', 'exponential'):
+            raise ValueError("`gain` must be 'linear' or 'exponential'.")
+        self.qrels = qrels
+        self.relevance_level = relevance_level
+        self.gain = gain
+        # The qrels and their hash, computed by `cache_key` when first needed.
+        self._qrels_hash = None
+
+    def cache_key(self):
+        """Returns a string identifying this field and its parameters, used to cache its summaries.
+
+        The qrels are represented by a SHA-256 hash of their sorted judgments, which is computed once rather than on
+        every lookup. It is computed again if `qrels` is replaced, but not if it is modified in place.
+
+        Returns
+        -------
+        str
+        """
+        if self._qrels_hash is None or self._qrels_hash[0] is not self.qrels:
+            judgments = sorted((repr(query), repr(document), repr(grade))
+                               for query, grades in self.qrels.items() for document, grade in grades.items())
+            self._qrels_hash = (self.qrels, hashlib.sha256(pickle.dumps(judgments, protocol=4)).hexdigest())
+        attributes = {name: value for name, value in vars(self).items() if name not in ('qrels', '_qrels_hash')}
+        cls = type(self)
+        return repr((cls.__module__, cls.__qualname__, self._qrels_hash[1], _canonical(attributes)))
+
+    def compute_metrics(self, base_result, k, metrics=None):
+        """Computes metrics and returns a DataFrame with MultiIndex (system, query) and column metric.
+
+        Looks up the grades of all items at once by joining the dictionary-encoded column of the field with the
+        qrels, and accumulates gains, discounts and relevant counts per ranked list with array operations.
+
+        Parameters
+        ----------
+        base_result : BaseResult
+            Contains the full search results.
+        k : int or list of int, default=None
+            Only use the top K results to calculate of statistics.
+            If a list of cutoffs is given, the metrics are computed at each cutoff.
+        metrics : list of str, optional
+            Only return these metrics.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with MultiIndex (system, query) and column metric, or MultiIndex (system, query, k)
+            if `k` is a list of cutoffs. Contains the computed metrics for the search results.
+        """
+        with stage('process_base_result', self.name):
+            self.process_base_result(base_result)
+
+        cutoffs, multi_k = cutoff_list(k)
+        index = summary_index(base_result, cutoffs if multi_k else None)
+        if not len(index):
+            return pd.DataFrame([], index=index, columns=[])
+        with stage('metrics', self.name):
+            values = self._metrics_at_k(base_result.categorical_column(self.name), base_result.offsets,
+                                        base_result.queries, cutoffs)
+        with stage('dataframe', self.name):
+            summary = pd.DataFrame(values.reshape(len(index), -1), index=index, columns=self.METRICS)
+        return select_metrics(summary, metrics)
+
+    def _judgments(self, queries):
+        """Returns the judgments of `queries` as flat arrays (query positions, documents, grades), grouped by query."""
+        query_positions, documents, grades = [], [], []
+        for query_idx, query in enumerate(queries):
+            judgments = self.qrels.get(query)
+            if judgments:
+                query_positions.append(np.full(len(judgments), query_idx, dtype=np.int64))
+                documents.extend(judgments)
+                grades.extend(judgments.values())
+        if not query_positions:
+            return np.zeros(0, dtype=np.int64), [], np.zeros(0)
+        return np.concatenate(query_positions), documents, np.array(grades, dtype=float)
+
+    def _grades(self, column, item_queries, judgments):
+        """Returns the grade of each item of `column`, by looking up its (query, document) pair in the judgments.
+
+        The judgments are encoded with the categories of `column` into sorted integer keys, which the keys of the
+        items are searched in.
+        """
+        query_positions, documents, grades = judgments
+        item_grades = np.zeros(len(column.codes))
+        codes = column.categories.get_indexer(pd.Index(documents, dtype=object))
+        retrieved = codes >= 0
+        if not retrieved.any():
+            return item_grades
+        n_categories = len(column.categories)
+        judged_keys = query_positions[retrieved] * n_categories + codes[retrieved]
+        order = np.argsort(judged_keys)
+        judged_keys, judged_grades = judged_keys[order], grades[retrieved][order]
+
+        item_keys = item_queries * n_categories + column.codes
+        positions = np.minimum(np.searchsorted(judged_keys, item_keys), len(judged_keys) - 1)
+        found = (judged_keys[positions] == item_keys) & (column.codes >= 0)
+        item_grades[found] = judged_grades[positions[found]]
+        return item_grades
+
+    def _metrics_at_k(self, column, offsets, queries, cutoffs):
+        """Vectorized `at_k` over the ranked lists delimited by `offsets`, at each cutoff.
+
+        Parameters
+        ----------
+        column : pd.Categorical
+            The dictionary-encoded document identifiers of all items.
+        offsets : np.ndarray
+            Boundaries of each ranked list in `column`. Ranked list i is for query `queries[i % len(queries)]`.
+        queries : list
+            The queries of the ranked lists.
+        cutoffs : list of int
+            Only use the top K results to calculate of statistics, for each K in `cutoffs`.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (ranked lists, cutoffs, metrics), with the metrics in the order of `METRICS`.
+
+        Notes
+        -----
+        Only the items above the largest cutoff are looked up in the qrels. DCG, relevant counts and precision sums
+        are accumulated from one cutoff to the next over the items between the two cutoffs.
+        """
+        n_segments = len(offsets) - 1
+        lengths = np.diff(offsets)
+        max_depth = int(lengths.max(initial=0))
+        depths = [min(cutoff, max_depth) if cutoff else max_depth for cutoff in cutoffs]
+        segments, ranks = segment_ranks(offsets)
+        keep = ranks < max(depths)
+        segments, ranks = segments[keep], ranks[keep]
+        judgments = self._judgments(queries)
+        grades = self._grades(column[keep], segments % len(queries), judgments)
+
+        relevant = grades >= self.relevance_level
+        gains = self._gains(grades) / np.log2(ranks + 2)
+        # The number of relevant items above each item of its ranked list, for the precision at its rank.
+        kept_lengths = np.minimum(lengths, max(depths))
+        # Empty ranked lists start at the end of the items, hence the cumulative sum is prepended with 0.
+        relevant_before = np.concatenate([[0], np.cumsum(relevant)])
+        starts = np.cumsum(kept_lengths) - kept_lengths
+        relevant_before = relevant_before[:-1] - np.repeat(relevant_before[starts], kept_lengths)
+        precisions = np.where(relevant, (relevant_before + 1) / (ranks + 1), 0.0)
+        relevant_segments = segments[relevant]
+        first = np.flatnonzero(np.diff(relevant_segments, prepend=-1))
+        first_relevant = np.full(n_segments, np.inf)
+        first_relevant[relevant_segments[first]] = ranks[relevant][first]
+
+        n_relevant, ideal_gains = self._judged_queries(queries, cutoffs, judgments)
+        segment_queries = np.arange(n_segments) % len(queries)
+        n_relevant = n_relevant[segment_queries]
+
+        dcg = np.zeros(n_segments)
+        retrieved = np.zeros(n_segments)
+        precision_sums = np.zeros(n_segments)
+        metrics = np.empty((n_segments, len(cutoffs), len(self.METRICS)))
+        unique_depths = sorted(set(depths))
+        depth_totals = {}
+        for depth, band in zip(unique_depths, rank_bands(ranks, unique_depths)):
+            dcg += np.bincount(segments[band], weights=gains[band], minlength=n_segments)
+            retrieved += np.bincount(segments[band], weights=relevant[band], minlength=n_segments)
+            precision_sums += np.bincount(segments[band], weights=precisions[band], minlength=n_segments)
+            depth_totals[depth] = dcg.copy(), retrieved.copy(), precision_sums.copy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for idx, (cutoff, depth) in enumerate(zip(cutoffs, depths)):
+                depth_dcg, depth_retrieved, depth_precision_sums = depth_totals[depth]
+                metrics[:, idx, 0] = depth_dcg / ideal_gains[idx][segment_queries]
+                metrics[:, idx, 1] = depth_precision_sums / n_relevant
+                metrics[:, idx, 2] = np.where(first_relevant < depth, 1 / (first_relevant + 1), 0.0)
+                metrics[:, idx, 3] = depth_retrieved / (cutoff if cutoff else lengths)
+                metrics[:, idx, 4] = depth_retrieved / n_relevant
+        metrics[n_relevant == 0] = np.nan
+        return metrics
+
+    def _judged_queries(self, queries, cutoffs, judgments):
+        """Returns the number of relevant documents of each query, and the ideal DCG of each query at each cutoff."""
+        query_positions, _, grades = judgments
+        n_relevant = np.bincount(query_positions, weights=grades >= self.relevance_level, minlength=len(queries))
+        # The ideal ranking of each query sorts its judged documents by decreasing gain.
+        gains = self._gains(grades)
+        order = np.lexsort((-gains, query_positions))
+        query_offsets = np.concatenate([[0], np.cumsum(np.bincount(query_positions, minlength=len(queries)))])
+        _, ranks = segment_ranks(query_offsets)
+        discounted = gains[order] / np.log2(ranks + 2)
+        ideal_gains = np.empty((len(cutoffs), len(queries)))
+        for idx, cutoff in enumerate(cutoffs):
+            kept = ranks < cutoff if cutoff else slice(None)
+            ideal_gains[idx] = np.bincount(query_positions[order][kept], weights=discounted[kept],
+                                           minlength=len(queries))
+        return n_relevant, ideal_gains
+
+    def _gains(self, grades):
+        grades = np.maximum(grades, 0)
+        return grades if self.gain == 'linear' else 2 ** grades - 1
+
+    def aggregate(self, k, sketch_size=200):
+        """Returns an empty QueryAggregate, which passes the query of each ranked list to `at_k`."""
+        return QueryAggregate(self, k, sketch_size)
+
+    def at_k(self, result_list, k=None, query=None):
+        """Computes the relevance metrics of a ranked list for `query`, which is required to look up its qrels."""
+        if query is None:
+            raise ValueError('RelevanceField requires the query of the ranked list.')
+        judgments = self.qrels.get(query, {})
+        n_relevant = sum(grade >= self.relevance_level for grade in judgments.values())
+        if not n_relevant:
+            return {metric: None for metric in self.METRICS}
+        depth = k if k else len(result_list)
+
+        dcg = retrieved = precision_sum = rr = 0
+        for rank, item in enumerate(result_list[:depth], start=1):
+            grade = judgments.get(item[self.name], 0)
+            dcg += self._gains(np.array(grade, dtype=float)) / math.log2(rank + 1)
+            if grade >= self.relevance_level:
+                retrieved += 1
+                precision_sum += retrieved / rank
+                rr = rr or 1 / rank
+        ideal = sorted(self._gains(np.array(list(judgments.values()), dtype=float)), reverse=True)[:k or None]
+        ideal_dcg = sum(gain / math.log2(rank + 1) for rank, gain in enumerate(ideal, start=1))
+        return {
+            'ndcg': dcg / ideal_dcg,
+            'ap': precision_sum / n_relevant,
+            'rr': rr,
+            'precision': retrieved / depth if depth else None,
+            'recall': retrieved / n_relevant,
+        }
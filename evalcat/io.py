@@ -0,0 +1,385 @@
+"""
+Reading and writing search results and summaries.
+
+The readers stream the input and store the requested fields directly as the arrays of a ColumnarResult,
+so that memory usage is bounded by the size of the encoded columns rather than the size of the raw input.
+
+Parquet files are read and written with pyarrow, which is an optional dependency.
+"""
+
+import json
+import os
+from array import array
+from numbers import Integral, Real
+
+import numpy as np
+import pandas as pd
+
+from evalcat.base_result import _check_queries, _to_categorical
+from evalcat.columnar import ColumnarResult, _encode_column
+
+SUMMARY_INDEX = ['system', 'query', 'k']
+
+
+def read_jsonl(path, fields=None, queries=None, system_key='system', query_key='query', results_key='results'):
+    """Reads search results from a JSON Lines file with one ranked list per line.
+
+    Each line is a JSON object such as
+    ```
+    {"system": "system A", "query": "query 1", "results": [Item1, Item2]}
+    ```
+    Lines are read one at a time, and only the values of `fields` are kept.
+
+    Parameters
+    ----------
+    path : str, os.PathLike or file object
+        The JSON Lines file, or an iterable of its lines.
+    fields : list of str or Field, optional
+        The fields to store, including any identifier used for RBO.
+        If not provided, will store all the keys of the first search item.
+    queries : list of str, default=None
+        A list of queries. Every system must have a ranked list for each of these queries.
+        If not provided, the query set will be generated from the first system's queries.
+    system_key, query_key, results_key : str
+        The keys holding the system name, the query and the ranked list of items in each line.
+
+    Returns
+    -------
+    ColumnarResult
+
+    Raises
+    ------
+    ValueError
+        If a (system, query) appears on more than one line, or not all systems have the same query set.
+
+    Notes
+    -----
+    Items missing one of the fields store None for it. Ranked lists may appear in any order in the file;
+    the columns are reordered, systems first, once all lines have been read.
+    """
+    if isinstance(path, (str, os.PathLike)):
+        with open(path, encoding='utf-8') as lines:
+            return read_jsonl(lines, fields, queries, system_key, query_key, results_key)
+
+    names = None if fields is None else [getattr(field, 'name', field) for field in fields]
+    builders = None
+    system_index = {}
+    system_queries = []
+    segments = {}
+    for line in path:
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        system, query, items = row[system_key], row[query_key], row[results_key]
+        if names is None:
+            names = list(items[0].keys()) if items else None
+        if builders is None and names is not None:
+            builders = {name: _ColumnBuilder() for name in names}
+
+        if system not in system_index:
+            system_index[system] = len(system_index)
+            system_queries.append([])
+        if (system, query) in segments:
+            raise ValueError(f'Search results of system {system!r} for query {query!r} appear more than once.')
+        start = len(next(iter(builders.values()))) if builders else 0
+        segments[system, query] = (start, len(items))
+        system_queries[system_index[system]].append(query)
+        for name, builder in (builders or {}).items():
+            for item in items:
+                builder.append(item.get(name))
+
+    systems = list(system_index)
+    if not systems:
+        return ColumnarResult([], [], [0], {})
+    query_sets = {system: dict.fromkeys(query_set) for system, query_set in zip(systems, system_queries)}
+    queries, _ = _check_queries(query_sets, queries)
+
+    starts, lengths = np.array([segments[system, query] for system in systems for query in queries],
+                               dtype=np.int64).reshape(-1, 2).T
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    if np.array_equal(starts, offsets[:-1]):
+        positions = slice(None)
+    else:
+        positions = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], lengths)
+    columns = {name: builder.finish()[positions] for name, builder in (builders or {}).items()}
+    return ColumnarResult(systems, queries, offsets, columns)
+
+
+def read_parquet(path, fields=None, systems=None, queries=None, system_column='system', query_column='query',
+                 rank_column='rank'):
+    """Reads search results from a long-format Parquet file or dataset, with one row per item.
+
+    The table has a column for the system, the query, the rank of the item and each field, e.g.
+    ```
+    | system | query | rank | id | price |
+    |--------|-------|------|----|-------|
+    |system A|query 1|  1   | 7  |  5.0  |
+    |system A|query 1|  2   | 3  |  2.5  |
+    ```
+    Only the columns of `fields` are read, and only the row groups of `systems` and `queries` are loaded.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The Parquet file, or a directory of Parquet files.
+    fields : list of str or Field, optional
+        The fields to read, including any identifier used for RBO. If not provided, will read all columns.
+    systems : list of str, optional
+        Only read these systems, in this order. If not provided, will read all systems in order of appearance.
+    queries : list of str, optional
+        Only read these queries, in this order. If not provided, will read all queries in order of appearance.
+    system_column, query_column : str
+        The columns holding the system name and the query.
+    rank_column : str, optional
+        The column giving the order of the items in each ranked list. If None, the items are ranked in the
+        order of the rows.
+
+    Returns
+    -------
+    ColumnarResult
+
+    Notes
+    -----
+    A long-format table cannot represent empty ranked lists, so a (system, query) without any row is read as an
+    empty ranked list. This includes the systems and queries of `systems` and `queries` that are not in the table.
+    String columns are read dictionary-encoded, which keeps them compact in memory.
+    """
+    pa, pq = _import_pyarrow()
+    import pyarrow.dataset
+
+    schema = pa.dataset.dataset(path, format='parquet').schema
+    index_columns = [system_column, query_column] + ([rank_column] if rank_column else [])
+    if fields is None:
+        names = [name for name in schema.names if name not in index_columns]
+    else:
+        names = [getattr(field, 'name', field) for field in fields]
+    filters = [(column, 'in', list(values)) for column, values in [(system_column, systems), (query_column, queries)]
+               if values is not None]
+    columns = index_columns + names
+    read_dictionary = [name for name in columns if pa.types.is_string(schema.field(name).type)
+                       or pa.types.is_large_string(schema.field(name).type)]
+    table = pq.read_table(path, columns=columns, filters=filters or None, read_dictionary=read_dictionary)
+
+    system_idx, systems = _factorize(table.column(system_column), systems)
+    query_idx, queries = _factorize(table.column(query_column), queries)
+    segments = system_idx * len(queries) + query_idx
+    ranks = table.column(rank_column).to_numpy() if rank_column else None
+    steps = np.diff(segments)
+    if np.all((steps > 0) | ((steps == 0) & (True if ranks is None else np.diff(ranks) >= 0))):
+        # Rows are already sorted by system, query and rank, as written by `write_parquet`.
+        order = slice(None)
+    elif ranks is None:
+        order = np.argsort(segments, kind='stable')
+    else:
+        order = np.lexsort((ranks, segments))
+    lengths = np.bincount(segments, minlength=len(systems) * len(queries))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return ColumnarResult(systems, queries, offsets, {name: _from_arrow(table.column(name), order) for name in names})
+
+
+def write_parquet(base_result, path, fields=None, system_column='system', query_column='query', rank_column='rank',
+                  **kwargs):
+    """Writes search results to a long-format Parquet file, with one row per item, as read by `read_parquet`.
+
+    Parameters
+    ----------
+    base_result : BaseResult
+        Contains the full search results.
+    path : str or os.PathLike
+        The Parquet file.
+    fields : list of str or Field, optional
+        The fields to write. If not provided, will write all the columns of a ColumnarResult, or all the keys of
+        the first search item.
+    system_column, query_column, rank_column : str
+        The names of the columns holding the system name, the query and the 1-based rank of the items.
+    **kwargs
+        Passed to `pyarrow.parquet.write_table`, e.g. `compression` or `row_group_size`.
+    """
+    pa, pq = _import_pyarrow()
+
+    if fields is None:
+        if isinstance(base_result, ColumnarResult):
+            fields = list(base_result.columns)
+        else:
+            fields = list(next((item for system_row in base_result.values() for query_row in system_row.values()
+                                for item in query_row), {}).keys())
+    lengths = np.diff(base_result.offsets)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    n_queries = max(len(base_result.queries), 1)
+    columns = {
+        system_column: pa.DictionaryArray.from_arrays(segments // n_queries, pa.array(base_result.systems)),
+        query_column: pa.DictionaryArray.from_arrays(segments % n_queries, pa.array(base_result.queries)),
+        rank_column: np.arange(1, len(segments) + 1) - np.repeat(base_result.offsets[:-1], lengths),
+    }
+    for field in fields:
+        name = getattr(field, 'name', field)
+        if isinstance(base_result, ColumnarResult):
+            values = base_result.columns[name]
+        else:
+            values = _encode_column(base_result.column(name))
+        columns[name] = _to_arrow(values)
+    pq.write_table(pa.table(columns), path, **kwargs)
+
+
+def write_summary(summary, path, **kwargs):
+    """Writes the summary DataFrame of a field to a Parquet file.
+
+    The index levels are stored in the columns `system`, `query` and, with several cutoffs, `k`.
+    The labels of the metrics, which may not be strings, are stored in the metadata of the file.
+
+    Parameters
+    ----------
+    summary : pd.DataFrame
+        The summary of a field, e.g. `result_list.summary['field_name']`.
+    path : str or os.PathLike
+        The Parquet file.
+    **kwargs
+        Passed to `pyarrow.parquet.write_table`.
+    """
+    pa, pq = _import_pyarrow()
+
+    index = summary.index
+    names = SUMMARY_INDEX[:index.nlevels]
+    arrays = [pa.DictionaryArray.from_arrays(index.codes[level], pa.array(index.levels[level]))
+              for level in range(index.nlevels)]
+    arrays.extend(pa.array(summary.iloc[:, idx].to_numpy()) for idx in range(summary.shape[1]))
+    names.extend(str(metric) for metric in summary.columns)
+    metadata = {'evalcat': json.dumps({'metrics': [_json_label(metric) for metric in summary.columns]})}
+    pq.write_table(pa.table(arrays, names=names, metadata=metadata), path, **kwargs)
+
+
+def read_summary(path):
+    """Reads the summary DataFrame of a field written by `write_summary`.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The Parquet file.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with MultiIndex (system, query) or (system, query, k) and column metric.
+    """
+    pa, pq = _import_pyarrow()
+
+    table = pq.read_table(path)
+    metrics = json.loads(table.schema.metadata[b'evalcat'])['metrics']
+    n_levels = table.num_columns - len(metrics)
+    levels, codes = [], []
+    for level in range(n_levels):
+        level_codes, level_values = pd.factorize(table.column(level).to_pandas())
+        levels.append(pd.Index(list(level_values)))
+        codes.append(level_codes)
+    index = pd.MultiIndex(levels=levels, codes=codes)
+    values = {idx: table.column(n_levels + idx).to_numpy() for idx in range(len(metrics))}
+    summary = pd.DataFrame(values, index=index)
+    summary.columns = pd.Index(metrics)
+    return summary
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError('pyarrow is required to read and write Parquet files.') from error
+    return pyarrow, pyarrow.parquet
+
+
+def _factorize(column, values):
+    """Returns the position of every row's value in `values`, and `values`, in order of appearance if not given."""
+    codes, uniques = pd.factorize(column.to_pandas())
+    if values is None:
+        return codes.astype(np.int64), list(uniques)
+    values = list(values)
+    positions = {value: idx for idx, value in enumerate(values)}
+    return np.array([positions[value] for value in uniques], dtype=np.int64)[codes], values
+
+
+def _from_arrow(column, order):
+    """Returns an Arrow column as a ColumnarResult column, taking the rows in `order`."""
+    pa, _ = _import_pyarrow()
+    if pa.types.is_integer(column.type) and not column.null_count:
+        return column.to_numpy().astype(np.int64)[order]
+    if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+        return column.to_pandas().to_numpy(dtype=float, na_value=np.nan)[order]
+    values = column.to_pandas().array
+    if isinstance(values, pd.Categorical):
+        codes, uniques = pd.factorize(values[order])
+        return pd.Categorical.from_codes(codes, categories=pd.Index(np.asarray(uniques), dtype=object))
+    return _encode_column(np.asarray(values, dtype=object)[order])
+
+
+def _to_arrow(values):
+    pa, _ = _import_pyarrow()
+    if isinstance(values, pd.Categorical):
+        return pa.DictionaryArray.from_arrays(pa.array(values.codes, mask=values.codes < 0),
+                                              pa.array(np.asarray(values.categories, dtype=object)))
+    return pa.array(values)
+
+
+def _json_label(label):
+    return label if label is None or isinstance(label, (str, int, float, bool)) else str(label)
+
+
+class _ColumnBuilder:
+    """Appends values one at a time to a compact column, encoded as `_encode_column` would encode them.
+
+    Values are stored as 64-bit integers while they are all integers, as floats while they are all numbers or None,
+    and are dictionary-encoded as soon as any other value is appended.
+    """
+
+    __slots__ = ('kind', 'values', 'codebook')
+
+    def __init__(self):
+        self.kind = 'int'
+        self.values = array('q')
+        self.codebook = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        if self.kind == 'int':
+            if isinstance(value, Integral) and not isinstance(value, bool):
+                self.values.append(value)
+                return
+            self._convert('float' if value is None or _is_number(value) else 'categorical')
+        if self.kind == 'float':
+            if value is None or _is_number(value):
+                self.values.append(np.nan if value is None else value)
+                return
+            self._convert('categorical')
+        self.values.append(self._code(value))
+
+    def _code(self, value):
+        if value is None or value != value:
+            return -1
+        # Booleans are equal to 0 and 1, but are only given their code if pandas factorizes them apart.
+        return self.codebook.setdefault((isinstance(value, bool), value), len(self.codebook))
+
+    def _convert(self, kind):
+        if kind == 'float':
+            self.values = array('d', self.values)
+        else:
+            self.codebook = {}
+            self.values = array('q', map(self._code, self.values.tolist()))
+        self.kind = kind
+
+    def finish(self):
+        """Returns the column as an int or float array, or a pd.Categorical."""
+        if self.kind == 'categorical':
+            codes = np.frombuffer(self.values, dtype=np.int64)
+            values = np.empty(len(self.codebook), dtype=object)
+            values[:] = [value for _, value in self.codebook]
+            categories = _to_categorical(values)
+            codes = np.append(categories.codes, -1)[codes]
+            return pd.Categorical.from_codes(codes, dtype=categories.dtype)
+        if self.kind == 'int' and self.values:
+            return np.frombuffer(self.values, dtype=np.int64)
+        return np.frombuffer(self.values, dtype=float) if self.values else np.array([], dtype=float)
+
+
+def _is_number(value):
+    return isinstance(value, Real) and not isinstance(value, bool)
@@ -0,0 +1,218 @@
+"""
+Chunked and parallel computation of ResultList summaries.
+
+The work is split by field and by chunks of (system, query) ranked lists, and the summaries of the chunks are
+concatenated back into the same DataFrames as a sequential computation.
+"""
+
+import math
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from evalcat.columnar import ColumnarResult
+
+
+def compute_summary(base_result, fields, k, n_jobs=None, executor='process', metrics=None, chunk_size=None):
+    """Computes the summary of each field in parallel.
+
+    Parameters
+    ----------
+    base_result : BaseResult
+        Contains the full search results.
+    fields : list of Field
+        The fields to compute.
+    k : int or list of int
+        Only use the top K results to calculate the metrics.
+    n_jobs : int, optional
+        The number of workers. If -1 or not provided, will use the number of CPUs.
+    executor : {'process', 'thread'} or concurrent.futures.Executor, default='process'
+        The kind of pool to run the chunks on, or an existing executor.
+    metrics : list of str, optional
+        Only compute these metrics, for fields that support it.
+    chunk_size : int, optional
+        If provided, each chunk contains about `chunk_size` items or fewer.
+
+    Returns
+    -------
+    dict
+        Maps the field names to their summary DataFrames.
+
+    Notes
+    -----
+    `process_base_result` is called on the full results before splitting, so that state such as the labels of a
+    CategoricalField is shared by all chunks. With a process pool, a ColumnarResult is placed in shared memory once
+    and other BaseResults are sent once to each worker, rather than once per chunk. With an existing executor,
+    each chunk is sent along with its task.
+    """
+    if not n_jobs or n_jobs < 0:
+        n_jobs = os.cpu_count()
+    for field in fields:
+        field.process_base_result(base_result)
+    chunks = _chunks(base_result, max(n_jobs * 4, _n_chunks(base_result, chunk_size)))
+    if not chunks:
+        # Without queries there is nothing to split, and the fields return their empty summaries.
+        return {field.name: _compute_chunk(field, base_result, k, metrics) for field in fields}
+    tasks = [(field_idx, chunk) for field_idx in range(len(fields)) for chunk in chunks]
+
+    if isinstance(executor, Executor):
+        futures = [executor.submit(_compute_chunk, fields[field_idx], base_result.subset(*chunk), k, metrics)
+                   for field_idx, chunk in tasks]
+        frames = [future.result() for future in futures]
+    elif executor == 'thread':
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            frames = list(pool.map(lambda task: _compute_chunk(fields[task[0]], base_result.subset(*task[1]), k,
+                                                               metrics), tasks))
+    elif executor == 'process':
+        with SharedResult(base_result) as shared:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=(shared.spec, fields, k, metrics)) as pool:
+                frames = list(pool.map(_worker_compute_chunk, tasks))
+    else:
+        raise ValueError("`executor` must be 'process', 'thread' or a concurrent.futures.Executor.")
+
+    return {field.name: pd.concat(frames[idx * len(chunks):(idx + 1) * len(chunks)])
+            for idx, field in enumerate(fields)}
+
+
+def compute_summary_in_chunks(base_result, fields, k, chunk_size, metrics=None):
+    """Computes the summary of each field sequentially, one chunk of ranked lists at a time.
+
+    Only one chunk of the columns is processed at once, which bounds the memory used by the computation of the
+    metrics, and with a memory-mapped ColumnarResult, the memory used by the search results.
+
+    Parameters
+    ----------
+    base_result : BaseResult
+        Contains the full search results.
+    fields : list of Field
+        The fields to compute.
+    k : int or list of int
+        Only use the top K results to calculate the metrics.
+    chunk_size : int
+        Each chunk contains about `chunk_size` items or fewer, unless a single ranked list is longer.
+    metrics : list of str, optional
+        Only compute these metrics, for fields that support it.
+
+    Returns
+    -------
+    dict
+        Maps the field names to their summary DataFrames.
+    """
+    for field in fields:
+        field.process_base_result(base_result)
+    chunks = _chunks(base_result, _n_chunks(base_result, chunk_size))
+    return {field.name: pd.concat([_compute_chunk(field, base_result.subset(*chunk), k, metrics) for chunk in chunks])
+            for field in fields}
+
+
+def _n_chunks(base_result, chunk_size):
+    """Returns the number of chunks needed for chunks of `chunk_size` items, or 1 if `chunk_size` is None."""
+    if not chunk_size:
+        return 1
+    return max(1, math.ceil(base_result.offsets[-1] / chunk_size))
+
+
+def _chunks(base_result, n_chunks):
+    """Splits the ranked lists into about `n_chunks` chunks of (systems, queries), in the order of the summaries.
+
+    Chunks contain whole ranges of systems, or ranges of the queries of a single system if there are fewer
+    systems than chunks.
+    """
+    systems, queries = base_result.systems, base_result.queries
+    if len(systems) >= n_chunks:
+        size = math.ceil(len(systems) / n_chunks)
+        return [(systems[start:start + size], None) for start in range(0, len(systems), size)]
+    size = math.ceil(len(queries) / math.ceil(n_chunks / len(systems))) if queries else 1
+    return [([system], queries[start:start + size]) for system in systems for start in range(0, len(queries), size)]
+
+
+def _compute_chunk(field, base_result, k, metrics=None):
+    return field.compute_metrics(base_result, k, metrics=metrics)
+
+
+class SharedResult:
+    """Context manager exposing a BaseResult to worker processes.
+
+    The columns and offsets of a ColumnarResult are copied once into shared memory, which workers attach to
+    without copying. Other BaseResults are pickled as they are.
+
+    Parameters
+    ----------
+    base_result : BaseResult
+        The search results to share.
+
+    Attributes
+    ----------
+    spec : tuple
+        Picklable description of the shared results, to be passed to `attach`.
+    """
+
+    def __init__(self, base_result):
+        self.base_result = base_result
+        self._blocks = []
+        self.spec = None
+
+    def __enter__(self):
+        if not isinstance(self.base_result, ColumnarResult):
+            self.spec = ('pickle', self.base_result)
+            return self
+        offsets = self._share(self.base_result.offsets)
+        arrays = {}
+        for name, values in self.base_result.columns.items():
+            if isinstance(values, pd.Categorical):
+                arrays[name] = (self._share(values.codes), values.categories)
+            else:
+                arrays[name] = (self._share(values), None)
+        self.spec = ('shared', self.base_result.systems, self.base_result.queries, offsets, arrays)
+        return self
+
+    def __exit__(self, *exc):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def _share(self, array):
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        return block.name, array.dtype.str, array.shape
+
+    @staticmethod
+    def attach(spec):
+        """Returns the BaseResult described by `spec`, and the shared memory blocks that must be kept open with it."""
+        if spec[0] == 'pickle':
+            return spec[1], []
+        _, systems, queries, offsets, arrays = spec
+        blocks = []
+
+        def attach_array(block_name, dtype, shape):
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+        columns = {}
+        for name, (array, categories) in arrays.items():
+            values = attach_array(*array)
+            if categories is not None:
+                values = pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(categories))
+            columns[name] = values
+        return ColumnarResult(systems, queries, attach_array(*offsets), columns), blocks
+
+
+_worker_state = {}
+
+
+def _init_worker(spec, fields, k, metrics):
+    base_result, blocks = SharedResult.attach(spec)
+    _worker_state.update(base_result=base_result, blocks=blocks, fields=fields, k=k, metrics=metrics)
+
+
+def _worker_compute_chunk(task):
+    field_idx, chunk = task
+    return _compute_chunk(_worker_state['fields'][field_idx], _worker_state['base_result'].subset(*chunk),
+                          _worker_state['k'], _worker_state['metrics'])
@@ -0,0 +1,151 @@
+"""
+Instrumentation of the stages of a ResultList computation.
+
+ResultList and the fields mark their stages with `stage`, e.g. `process_base_result`, `metrics` and `dataframe` in
+`Field.compute_metrics`. A stage is only recorded while a Profiler is active, i.e. inside `Profiler.activate`, which
+ResultList enters around its computations when it is given a profiler. Otherwise `stage` returns a shared no-op
+context manager, so the instrumentation costs a context variable lookup per stage.
+
+Stages run by other processes or threads, e.g. with `n_jobs`, are not recorded, but the stages around them are.
+"""
+
+import contextlib
+import contextvars
+import time
+import tracemalloc
+
+import pandas as pd
+
+_active = contextvars.ContextVar('evalcat_profiler', default=None)
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def stage(name, field=None, system=None, calls=1):
+    """Returns a context manager recording a stage in the active Profiler, or doing nothing if there is none.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    field : str, optional
+        The name of the field the stage is computed for.
+    system : str, optional
+        The system the stage is computed for. Only recorded by profilers with `per_system` set.
+    calls : int, default=1
+        The number of calls made by the stage, e.g. the number of `at_k` calls.
+    """
+    profiler = _active.get()
+    if profiler is None:
+        return _NULL_STAGE
+    return profiler.stage(name, field, system, calls)
+
+
+class Profiler:
+    """
+    Profiler records the wall time, call count and peak memory of each stage, per field and optionally per system.
+
+    Parameters
+    ----------
+    memory : bool, default=False
+        If set to True, the peak memory allocated during each stage is traced with `tracemalloc`, which slows down
+        the computation.
+    per_system : bool, default=False
+        If set to True, stages computed one system at a time are recorded per system.
+    callbacks : list of callable, optional
+        Called with the record of each stage when it ends, a dict with keys stage, field, system, seconds,
+        peak_memory and calls.
+
+    Attributes
+    ----------
+    records : list of dict
+        The record of each stage, in the order they ended.
+    """
+
+    def __init__(self, memory=False, per_system=False, callbacks=None):
+        self.memory = memory
+        self.per_system = per_system
+        self.callbacks = list(callbacks) if callbacks else []
+        self.records = []
+        self._frames = []
+        self._started_tracing = False
+
+    def add_callback(self, callback):
+        """Registers a callable called with the record of each stage when it ends."""
+        self.callbacks.append(callback)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Makes this profiler record the stages run in the current context."""
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    @contextlib.contextmanager
+    def stage(self, name, field=None, system=None, calls=1):
+        """Records the stage run inside the context. See `evalcat.profiling.stage`."""
+        self._enter_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            record = {'stage': name, 'field': field, 'system': system if self.per_system else None,
+                      'seconds': seconds, 'peak_memory': self._exit_memory(), 'calls': calls}
+            self.records.append(record)
+            for callback in self.callbacks:
+                callback(record)
+
+    def report(self):
+        """Returns the total wall time, calls and peak memory of each stage.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with MultiIndex (field, stage), or (field, stage, system) if `per_system` is set, and columns
+            [calls, seconds, peak_memory], in the order the stages first ended. The field is None for stages that
+            are not specific to a field, and the peak memory is in bytes, or NaN if memory is not traced.
+        """
+        keys = ['field', 'stage', 'system'] if self.per_system else ['field', 'stage']
+        totals = {}
+        for record in self.records:
+            key = tuple(record[name] for name in keys)
+            calls, seconds, peak = totals.get(key, (0, 0.0, None))
+            if record['peak_memory'] is not None:
+                peak = max(peak or 0, record['peak_memory'])
+            totals[key] = calls + record['calls'], seconds + record['seconds'], peak
+        index = pd.MultiIndex.from_tuples(list(totals), names=keys) if totals else \
+            pd.MultiIndex.from_arrays([[]] * len(keys), names=keys)
+        return pd.DataFrame(list(totals.values()), index=index, columns=['calls', 'seconds', 'peak_memory'],
+                            dtype=float).astype({'calls': int})
+
+    def reset(self):
+        """Discards the recorded stages."""
+        self.records = []
+
+    def _enter_memory(self):
+        if not self.memory:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self._frames:
+            self._frames[-1][1] = max(self._frames[-1][1], peak)
+        tracemalloc.reset_peak()
+        # Each frame holds the memory when the stage started, and the highest peak seen since.
+        self._frames.append([current, current])
+
+    def _exit_memory(self):
+        if not self.memory:
+            return None
+        base, peak = self._frames.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if self._frames:
+            self._frames[-1][1] = max(self._frames[-1][1], peak)
+            tracemalloc.reset_peak()
+        elif self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return peak - base
@@ -9,6 +9,9 @@ The current implementation handles uneven lists but not ties.
 """
 
 import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 
 def overlap(S, T, d):
@@ -19,15 +22,49 @@ def agreement(S, T, d):
     return overlap(S, T, d) / d
 
 
+def cumulative_overlap(S, T, depth=None):
+    """Computes the overlap of S and T at every depth from 1 to `depth` in a single pass.
+
+    Parameters
+    ----------
+    S, T : list
+        Ranked lists of item identifiers.
+    depth : int, optional
+        The deepest depth to compute. If not provided, will use the length of the longer list.
+
+    Returns
+    -------
+    overlaps : list of int
+        The element at index `d - 1` is equal to `overlap(S, T, d)`.
+
+    Notes
+    -----
+    The items seen so far in each list are tracked as the depth grows, so each depth only checks whether the
+    items entering at that depth are already present in the other list. This is O(depth) instead of the O(depth²)
+    needed to call `overlap` at every depth.
+    """
+    if depth is None:
+        depth = max(len(S), len(T))
+    seen_s, seen_t = set(), set()
+    x = 0
+    overlaps = []
+    for d in range(depth):
+        if d < len(S) and S[d] not in seen_s:
+            seen_s.add(S[d])
+            x += S[d] in seen_t
+        if d < len(T) and T[d] not in seen_t:
+            seen_t.add(T[d])
+            x += T[d] in seen_s
+        overlaps.append(x)
+    return overlaps
+
+
 def rbo_min(S, T, p, k=None):
     """Minimum value of RBO as defined in equation (11).
     """
     if not k:
         k = min(len(S), len(T))
-    xk = overlap(S, T, k)
-    sum1 = sum((overlap(S, T, d) - xk) * p ** d / d for d in range(1, k + 1))
-
-    return (1 - p) / p * (sum1 - xk * math.log(1 - p))
+    return _rbo_min(cumulative_overlap(S, T, k), k, p)
 
 
 def rbo_res(S, T, p):
@@ -35,13 +72,38 @@ def rbo_res(S, T, p):
 
     Implementation handles uneven lists but not ties.
     """
-    if len(S) > len(T):
-        L, S = S, T
-    else:
-        L, S = T, S
-    l, s = len(L), len(S)
+    s, l = sorted((len(S), len(T)))
+    return _rbo_res(cumulative_overlap(S, T, l), s, l, p)
+
+
+def rbo_ext(S, T, p):
+    """Extrapolated RBO value as defined in equation (30).
+
+    Implementation handles uneven lists but not ties.
+    """
+    s, l = sorted((len(S), len(T)))
+    return _rbo_ext(cumulative_overlap(S, T, l), s, l, p)
+
+
+def rbo(S, T, p):
+    """Returns a tuple containing RBO_min, RBO_res and RBO_ext.
+
+    The cumulative overlap is computed once and shared by all three values.
+    """
+    s, l = sorted((len(S), len(T)))
+    overlaps = cumulative_overlap(S, T, l)
+    return _rbo_min(overlaps, s, p), _rbo_res(overlaps, s, l, p), _rbo_ext(overlaps, s, l, p)
+
 
-    xl = overlap(L, S, l)
+def _rbo_min(overlaps, k, p):
+    xk = overlaps[k - 1] if k else 0
+    sum1 = sum((overlaps[d - 1] - xk) * p ** d / d for d in range(1, k + 1))
+
+    return (1 - p) / p * (sum1 - xk * math.log(1 - p))
+
+
+def _rbo_res(overlaps, s, l, p):
+    xl = overlaps[l - 1] if l else 0
     f = l + s - xl
     sum1 = sum(p ** d / d for d in range(s + 1, f + 1))
     sum2 = sum(p ** d / d for d in range(l + 1, f + 1))
@@ -49,25 +111,125 @@ def rbo_res(S, T, p):
     return p ** s + p ** l - p ** f - ((1 - p) / p * (s * sum1 + l * sum2 + xl * (math.log(1 / (1 - p)) - sum3)))
 
 
-def rbo_ext(S, T, p):
-    """Extrapolated RBO value as defined in equation (30).
-
-    Implementation handles uneven lists but not ties.
-    """
-    if len(S) > len(T):
-        L, S = S, T
-    else:
-        L, S = T, S
-    l, s = len(L), len(S)
-
-    xl = overlap(L, S, l)
-    xs = overlap(L, S, s)
-    sum1 = sum(overlap(L, S, d) / d * p ** d for d in range(1, l + 1))
+def _rbo_ext(overlaps, s, l, p):
+    xl = overlaps[l - 1] if l else 0
+    xs = overlaps[s - 1] if s else 0
+    sum1 = sum(overlaps[d - 1] / d * p ** d for d in range(1, l + 1))
     sum2 = sum(xs * (d - s) / (s * d) * p ** d for d in range(s + 1, l + 1))
     return (1 - p) / p * (sum1 + sum2) + ((xl - xs) / l + xs / s) * p ** l
 
 
-def rbo(S, T, p):
-    """Returns a tuple containing RBO_min, RBO_res and RBO_ext.
+def first_ranks(codes, lengths, n_codes):
+    """Finds the rank at which every item first appears in each ranked list.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The codes of all ranked lists, concatenated.
+    lengths : np.ndarray
+        The length of each ranked list.
+    n_codes : int
+        The number of distinct codes.
+
+    Returns
+    -------
+    keys : np.ndarray
+        Sorted array of `list_index * n_codes + code` for every distinct item of every list.
+    ranks : np.ndarray
+        The 1-based rank at which the corresponding item first appears in its list.
     """
-    return rbo_min(S, T, p), rbo_res(S, T, p), rbo_ext(S, T, p)
+    starts = np.cumsum(lengths) - lengths
+    ranks = np.arange(1, len(codes) + 1) - np.repeat(starts, lengths)
+    keys = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths) * n_codes + codes
+    keys, first = np.unique(keys, return_index=True)
+    return keys, ranks[first]
+
+
+def rbo_from_first_ranks(first_s, first_t, lengths_s, lengths_t, n_codes, p):
+    """Vectorized RBO from the output of `first_ranks` for two sets of ranked lists.
+
+    An item shared by both lists of a pair adds 1 to the overlap at every depth from the deeper of its two first
+    ranks onwards. The overlap sums needed by equations (11) and (30) are therefore sums over the shared items of
+    prefix sums of the weights p^d / d, which avoids materializing the overlap at every depth.
+    """
+    n = len(lengths_s)
+    s = np.minimum(lengths_s, lengths_t)
+    l = np.maximum(lengths_s, lengths_t)
+
+    common, idx_s, idx_t = np.intersect1d(first_s[0], first_t[0], assume_unique=True, return_indices=True)
+    pair = common // n_codes if n_codes else common
+    depth = np.maximum(first_s[1][idx_s], first_t[1][idx_t])
+
+    d = np.arange(int((s + l).max(initial=0)) + 1)
+    powers = p ** d
+    weights = np.zeros(len(d))
+    weights[1:] = powers[1:] / d[1:]
+    cum_weights = np.cumsum(weights)
+    cum_powers = np.cumsum(powers) - 1
+
+    in_s = depth <= s[pair]
+    xs = np.bincount(pair, weights=in_s, minlength=n)
+    xl = np.bincount(pair, minlength=n).astype(float)
+    sum_s = np.bincount(pair, weights=(cum_weights[s[pair]] - cum_weights[depth - 1]) * in_s, minlength=n)
+    sum_l = np.bincount(pair, weights=cum_weights[l[pair]] - cum_weights[depth - 1], minlength=n)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rbo_min = (1 - p) / p * (sum_s - xs * cum_weights[s] - xs * math.log(1 - p))
+
+        f = (l + s - xl).astype(np.int64)
+        sum1 = cum_weights[f] - cum_weights[s]
+        sum2 = cum_weights[f] - cum_weights[l]
+        rbo_res = (powers[s] + powers[l] - powers[f]
+                   - ((1 - p) / p * (s * sum1 + l * sum2 + xl * (math.log(1 / (1 - p)) - cum_weights[f]))))
+
+        sum2 = xs / s * ((cum_powers[l] - cum_powers[s]) - s * (cum_weights[l] - cum_weights[s]))
+        rbo_ext = (1 - p) / p * (sum_l + sum2) + ((xl - xs) / l + xs / s) * powers[l]
+
+    rbos = np.column_stack([rbo_min, rbo_res, rbo_ext])
+    rbos[s == 0] = np.nan
+    return rbos
+
+
+def rbo_pairs(rankings, pairs, n_codes, p, n_jobs=None):
+    """Computes the RBO triplets between many pairs of systems that share their preprocessing.
+
+    Parameters
+    ----------
+    rankings : list of tuple
+        One `(first_ranks, lengths)` tuple per system, where `first_ranks` is the output of `first_ranks`.
+        All systems must have been encoded with the same codebook and contain the same number of ranked lists.
+    pairs : list of tuple of int
+        The indices in `rankings` of the systems to compare.
+    n_codes : int
+        The number of distinct codes in the codebook.
+    p : float
+        The RBO persistence parameter.
+    n_jobs : int, optional
+        If greater than 1, the pairs are distributed over a pool of `n_jobs` processes.
+        `rankings` is sent once to each process instead of once per pair.
+
+    Returns
+    -------
+    list of np.ndarray
+        The output of `rbo_from_first_ranks` for each pair.
+    """
+    if n_jobs and n_jobs > 1 and len(pairs) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_pair_worker,
+                                 initargs=(rankings, n_codes, p)) as executor:
+            return list(executor.map(_pair_worker, pairs, chunksize=max(1, len(pairs) // (4 * n_jobs))))
+    return [rbo_from_first_ranks(rankings[i][0], rankings[j][0], rankings[i][1], rankings[j][1], n_codes, p)
+            for i, j in pairs]
+
+
+_worker_state = {}
+
+
+def _init_pair_worker(rankings, n_codes, p):
+    _worker_state.update(rankings=rankings, n_codes=n_codes, p=p)
+
+
+def _pair_worker(pair):
+    i, j = pair
+    rankings = _worker_state['rankings']
+    return rbo_from_first_ranks(rankings[i][0], rankings[j][0], rankings[i][1], rankings[j][1],
+                                _worker_state['n_codes'], _worker_state['p'])
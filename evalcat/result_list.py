@@ -1,9 +1,36 @@
+import contextlib
+import functools
+import itertools
+import os
+from collections.abc import Mapping
+from concurrent.futures import Executor
+
+import numpy as np
 import pandas as pd
 
 
 from evalcat.base_result import BaseResult
-from evalcat.fields.base import Field
-from evalcat.rbo import rbo
+from evalcat.cache import SummaryCache
+from evalcat.columnar import ColumnarResult
+from evalcat.fields.base import Field, cutoff_list, summary_index
+from evalcat.parallel import compute_summary, compute_summary_in_chunks
+from evalcat.profiling import Profiler, stage
+from evalcat.rbo import first_ranks, rbo, rbo_from_first_ranks, rbo_pairs
+from evalcat.significance import paired_bootstrap, paired_t_test, permutation_test
+from evalcat.views import SummaryViews
+
+
+def _profiled(name=None):
+    """Decorates a method of ResultList to activate its profiler, and to record the method as the stage `name`."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.profiler is None:
+                return method(self, *args, **kwargs)
+            with self.profiler.activate(), stage(name) if name else contextlib.nullcontext():
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
 
 
 class ResultList:
@@ -28,6 +55,27 @@ class ResultList:
         ```
     fields : list of Field
         Contains the fields to be evaluated. List items should be instances of Field subclasses.
+    k : int or list of int, default=10
+        Only use the top K results to calculate the metrics. If a list of cutoffs is given, the metrics are computed
+        at each cutoff in a single pass and the summary DataFrames have an additional index level `k`.
+    n_jobs : int, optional
+        If provided, the metrics are computed in parallel by `n_jobs` workers, splitting the work by field and by
+        chunks of systems and queries. If -1, will use the number of CPUs.
+    executor : {'process', 'thread'} or concurrent.futures.Executor, default='process'
+        The kind of pool used when `n_jobs` is provided, or an existing executor to submit the work to.
+    lazy : bool, default=False
+        If set to True, the metrics of a field are only computed the first time they are requested, and then
+        memoized. `get_system_query_df` only computes the requested metric for fields that support it.
+    chunk_size : int, optional
+        If provided, the metrics and RBO are computed one chunk of about `chunk_size` items at a time, which bounds
+        the memory used, e.g. for a ColumnarResult memory-mapped with `ColumnarResult.open`.
+    cache : SummaryCache or str, optional
+        A cache, or the directory of a cache, storing the summary of each system and field on disk. Only the systems
+        whose search results are not in the cache are computed. The cache is keyed by `BaseResult.fingerprint`,
+        `Field.cache_key` and `k`.
+    profiler : Profiler or bool, optional
+        If provided, records the wall time, calls and peak memory of the stages of the computations of the
+        ResultList, reported by `get_profile_df`. If True, a Profiler with the default parameters is used.
 
     Attributes
     ----------
@@ -35,9 +83,15 @@ class ResultList:
         Stores the search results.
     fields : list of Field
         Contains a list of Field subclass instances.
-    summary : pd.DataFrame
-        DataFrame with MultiIndex (system, query) and column metric.
-        Contains the computed metrics for the search results.
+    summary : dict of pd.DataFrame, or LazySummary
+        Maps each field name to a DataFrame with MultiIndex (system, query), or (system, query, k) if `k` is a list,
+        and column metric. Contains the computed metrics for the search results.
+
+    Notes
+    -----
+    The views returned by the `get_*_df` methods are taken by position from the summary, using dicts mapping the
+    systems and queries to their positions, and cached until the summary of the field is replaced. The cached views
+    are not updated when a summary is modified in place: replace the summary of the field with its modified copy.
 
     Methods
     -------
@@ -47,32 +101,199 @@ class ResultList:
         Returns a DataFrame comparing systems against metrics for a single query and field.
     get_system_query_df(field_name, metric)
         Returns a DataFrame comparing systems against queries for a single metric and field.
+    get_long_df(field_names, metrics, systems, queries)
+        Returns a DataFrame with one row per value of the summary, filtered by field, metric, system and query.
+    rank_biased_overlap(identifier, systems, p)
+        Returns a DataFrame containing the RBO of two systems for each query.
+    rank_biased_overlap_matrix(identifier, systems, p)
+        Returns a DataFrame containing the RBO between every pair of systems.
+    get_profile_df()
+        Returns a DataFrame containing the wall time, calls and peak memory of each stage, if profiled.
+    add_system(system, results), remove_system(system), add_queries(results)
+        Update the search results and the summary, only computing the metrics of the new ranked lists.
     """
-    def __init__(self, results, fields=None, k=10, **kwargs):
+    def __init__(self, results, fields=None, k=10, n_jobs=None, executor='process', lazy=False, chunk_size=None,
+                 cache=None, profiler=None, **kwargs):
+        self.profiler = Profiler() if profiler is True else profiler or None
         if isinstance(results, BaseResult):
             self.base_result = results
         else:
-            self.base_result = BaseResult(results, **kwargs)
+            with self._profiling(), stage('ingest'):
+                self.base_result = BaseResult(results, **kwargs)
         self.fields = fields
-        self.summary = self._compute_summary(k)
+        self.k = k
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.cache = SummaryCache(cache) if isinstance(cache, (str, os.PathLike)) else cache
+        self._views = None
+        if lazy:
+            self.summary = LazySummary(self) if fields else None
+        else:
+            self.summary = self._compute_summary(k)
 
-    def _compute_summary(self, k=10):
-        if not self.fields:
+    def _profiling(self):
+        """Returns a context manager activating the profiler of the ResultList, if any."""
+        return self.profiler.activate() if self.profiler is not None else contextlib.nullcontext()
+
+    @_profiled()
+    def _compute_summary(self, k=10, fields=None, metrics=None, base_result=None):
+        fields = self.fields if fields is None else fields
+        base_result = self.base_result if base_result is None else base_result
+        if not fields:
             return
+        if self.cache is not None and metrics is None and base_result.systems:
+            return self._compute_cached_summary(base_result, k, fields)
+        return self._compute_fields(base_result, k, fields, metrics)
+
+    def _compute_fields(self, base_result, k, fields, metrics=None):
+        if self.n_jobs not in (None, 0, 1) or isinstance(self.executor, Executor):
+            with stage('compute_metrics'):
+                return compute_summary(base_result, fields, k, n_jobs=self.n_jobs, executor=self.executor,
+                                       metrics=metrics, chunk_size=self.chunk_size)
+        if self.chunk_size:
+            with stage('compute_metrics'):
+                return compute_summary_in_chunks(base_result, fields, k, self.chunk_size, metrics=metrics)
+        summary = {}
+        for field in fields:
+            with stage('compute_metrics', field.name):
+                summary[field.name] = field.compute_metrics(base_result, k, metrics=metrics)
+        return summary
+
+    def _compute_cached_summary(self, base_result, k, fields):
+        """Reads the summary of each system and field from the cache, computing and storing the missing ones."""
+        systems = base_result.systems
+        fingerprints = {system: base_result.fingerprint(system) for system in systems}
         summary = {}
-        for field in self.fields:
-            summary[field.name] = field.compute_metrics(self.base_result, k)
+        for field in fields:
+            # Fields such as CategoricalField derive their state from all systems, which is part of the key.
+            field.process_base_result(base_result)
+            keys = {system: self.cache.key(fingerprints[system], field, k) for system in systems}
+            summaries = {system: self._cached_summary(keys[system], system) for system in systems}
+            missing = [system for system in systems if summaries[system] is None]
+            if missing:
+                subset = base_result if len(missing) == len(systems) else base_result.subset(missing)
+                computed = self._compute_fields(subset, k, [field])[field.name]
+                for system in missing:
+                    summaries[system] = computed.loc[[system]]
+                    summaries[system].index = summaries[system].index.remove_unused_levels()
+                    self.cache.put(keys[system], summaries[system])
+            summary[field.name] = pd.concat([summaries[system] for system in systems])
         return summary
 
-    def _get_field_from_summary(self, field_name):
+    def _cached_summary(self, key, system):
+        """Reads a summary from the cache, indexed by `system` rather than by the system it was stored for.
+
+        The key only depends on the search results, so the summary may have been stored by a system of another name.
+        """
+        summary = self.cache.get(key)
+        if summary is not None:
+            summary.index = summary.index.set_levels([system], level=0)
+        return summary
+
+    def add_system(self, system, results):
+        """Adds a new system and computes its metrics, without recomputing the metrics of the other systems.
+
+        Parameters
+        ----------
+        system : str
+            The name of the new system.
+        results : dict
+            Maps each query to the ranked list of items of the new system. The queries must be those of the
+            ResultList.
+        """
+        self.base_result.add_system(system, results)
+        self._views = None
+        self._update_summary(self.base_result.subset([system]))
+
+    def remove_system(self, system):
+        """Removes a system and its metrics, and the labels of CategoricalFields only found in this system.
+
+        Parameters
+        ----------
+        system : str
+            The name of the system.
+        """
+        self.base_result.remove_system(system)
+        self._views = None
+        for summaries in self._summaries():
+            for field in self.fields:
+                if field.name in summaries:
+                    summary = summaries[field.name].drop(system, level=0)
+                    summaries[field.name] = field.narrow_summary(summary, self.base_result)
+
+    def add_queries(self, results):
+        """Adds new queries and computes their metrics, without recomputing the metrics of the existing queries.
+
+        Parameters
+        ----------
+        results : dict
+            Nested python dictionary of search results, structured as for BaseResult, containing every system and
+            the same new queries for each system.
+        """
+        queries = list(next(iter(results.values()), {}))
+        self.base_result.add_queries(results)
+        self._views = None
+        self._update_summary(self.base_result.subset(queries=queries))
+
+    def _summaries(self):
+        """Returns the dicts holding the summaries that have already been computed."""
+        if isinstance(self.summary, LazySummary):
+            return [self.summary._summary, self.summary._partial]
+        return [self.summary] if self.summary else []
+
+    def _update_summary(self, new_result):
+        """Computes the metrics of the ranked lists of `new_result` and splices them into the computed summaries.
+
+        Fields are first given the chance to widen their existing summaries, e.g. with the new labels of a
+        CategoricalField. The rows are then put back in the order of the systems and queries of `base_result`.
+        """
+        if isinstance(self.summary, LazySummary):
+            self.summary._partial.clear()
+            self.summary._unknown.clear()
+        cutoffs, multi_k = cutoff_list(self.k)
+        index = summary_index(self.base_result, cutoffs if multi_k else None)
+        for summaries in self._summaries():
+            for field in self.fields:
+                if field.name not in summaries:
+                    continue
+                summary = field.widen_summary(summaries[field.name], new_result)
+                new_summary = self._compute_summary(self.k, [field], base_result=new_result)[field.name]
+                if len(summary.columns):
+                    new_summary = new_summary.reindex(columns=summary.columns)
+                summaries[field.name] = pd.concat([summary, new_summary]).reindex(index)
+
+    def _summary_views(self):
+        """Returns the SummaryViews of the ResultList, built when first needed after the search results change."""
+        if self._views is None:
+            cutoffs, multi_k = cutoff_list(self.k)
+            self._views = SummaryViews(self.base_result, cutoffs if multi_k else None)
+        return self._views
+
+    def _summary_frame(self, field_name, metrics=None):
+        """Returns the summary of a field containing at least `metrics`, or all metrics, computing them if needed.
+
+        Unlike `_get_field_from_summary`, the DataFrame of a lazy field that is not fully computed is the one holding
+        its computed metrics, so that the views cached for it are kept until more metrics are computed.
+        """
+        if metrics and isinstance(self.summary, LazySummary) and isinstance(field_name, str) \
+                and field_name in self.summary and not self.summary.is_computed(field_name):
+            self.summary.get_metrics(field_name, metrics)
+            return self.summary.partial(field_name)
+        return self._get_field_from_summary(field_name)
+
+    def _get_field_from_summary(self, field_name, metric=None):
         if isinstance(field_name, str):
             if field_name not in self.summary:
                 raise ValueError("Field is not in result_list.")
+            elif metric is not None and isinstance(self.summary, LazySummary):
+                return self.summary.get_metrics(field_name, [metric])
             else:
                 return self.summary[field_name]
         else:
             raise TypeError("`field_name` must be a string.")
 
+    @_profiled('get_query_metric_df')
     def get_query_metric_df(self, field_name, system):
         """Returns a DataFrame comparing queries against metrics for a single system.
 
@@ -88,10 +309,12 @@ class ResultList:
         DataFrame
             DataFrame with index queries and column metrics.
         """
-        if system not in self.base_result.systems:
+        views = self._summary_views()
+        if system not in views.system_index:
             raise ValueError("System not in result_list.")
-        return self._get_field_from_summary(field_name).loc[system]
+        return views.system_view(field_name, self._get_field_from_summary(field_name), system)
 
+    @_profiled('get_system_metric_df')
     def get_system_metric_df(self, field_name, query):
         """Returns a DataFrame comparing systems against metrics for a single query.
 
@@ -107,10 +330,12 @@ class ResultList:
         DataFrame
             DataFrame with index systems and column metrics.
         """
-        if query not in self.base_result.queries:
+        views = self._summary_views()
+        if query not in views.query_index:
             raise ValueError("Query not in result_list.")
-        return self._get_field_from_summary(field_name).xs(query, level=1)
+        return views.query_view(field_name, self._get_field_from_summary(field_name), query)
 
+    @_profiled('get_system_query_df')
     def get_system_query_df(self, field_name, metric):
         """Returns a DataFrame comparing systems against queries for a single metric.
 
@@ -126,12 +351,204 @@ class ResultList:
         DataFrame
             DataFrame with index systems and column queries.
         """
-        summary_field = self._get_field_from_summary(field_name)
+        summary_field = self._summary_frame(field_name, [metric])
         if metric not in summary_field.columns.values:
             raise ValueError("Metric not calculated for this field.")
-        return summary_field.loc[:, metric].unstack(1)
+        return self._summary_views().metric_view(field_name, summary_field, metric)
+
+    @_profiled('get_long_df')
+    def get_long_df(self, field_names=None, metrics=None, systems=None, queries=None):
+        """Returns a DataFrame with one row per value of the summary, filtered by field, metric, system and query.
+
+        Parameters
+        ----------
+        field_names : str or list of str, optional
+            The names of the fields. If not provided, will return all fields.
+        metrics : str or list of str, optional
+            The names of the metrics. If not provided, will return all metrics of each field.
+        systems : str or list of str, optional
+            The names of the systems. If not provided, will return all systems.
+        queries : str or list of str, optional
+            The queries. If not provided, will return all queries.
+
+        Returns
+        -------
+        DataFrame
+            DataFrame with columns [field, system, query, metric, value], or [field, system, query, k, metric,
+            value] if `k` is a list of cutoffs. The rows are in the order of the fields, systems and queries given,
+            then of the cutoffs and the metrics of each field. All columns but k and value are categorical.
+        """
+        field_names, metrics, systems, queries = (
+            [value] if isinstance(value, str) else value for value in (field_names, metrics, systems, queries))
+        if field_names is None:
+            field_names = list(self.summary) if self.summary else []
+        summaries = {field_name: self._summary_frame(field_name, metrics) for field_name in field_names}
+        return self._summary_views().long_frame(summaries, metrics, systems, queries)
+
+    @_profiled('get_system_aggregate_df')
+    def get_system_aggregate_df(self, field_name, metrics=None, aggregate='mean'):
+        """Returns a DataFrame comparing systems against metrics aggregated over queries.
+
+        Parameters
+        ----------
+        field_name : str
+            The name of the field.
+        metrics : list of str, optional
+            Only aggregate these metrics.
+        aggregate : str or function, default='mean'
+            The aggregation, as accepted by `pd.DataFrame.agg`, e.g. 'median' or 'std'.
+            Queries where a metric is undefined are skipped.
+
+        Returns
+        -------
+        DataFrame
+            DataFrame with index systems, or MultiIndex (system, k) if `k` is a list of cutoffs, and column metrics.
+        """
+        summary_field = self._get_field_from_summary(field_name)
+        if metrics is not None:
+            missing = [metric for metric in metrics if metric not in summary_field.columns]
+            if missing:
+                raise ValueError(f"Metrics not calculated for this field: {missing}.")
+            summary_field = summary_field[metrics]
+        levels = 0 if summary_field.index.nlevels == 2 else [0, 2]
+        return summary_field.groupby(level=levels, sort=False).agg(aggregate)
+
+    @_profiled('compare_systems')
+    def compare_systems(self, field_name, metric, systems=None, baseline=None, test='bootstrap', n_samples=10000,
+                        alpha=0.05, seed=None, n_jobs=None, k=None):
+        """Tests whether the mean of a metric over queries differs between pairs of systems.
+
+        Parameters
+        ----------
+        field_name : str
+            The name of the field.
+        metric : str
+            The name of the metric.
+        systems : list of str, optional
+            The systems to compare. If not provided, will compare all systems.
+        baseline : str, optional
+            If provided, every other system is compared with `baseline`. Else every pair of systems is compared.
+        test : {'bootstrap', 'permutation', 't-test'}, default='bootstrap'
+            The paired test: a bootstrap test, a randomization test or a t-test.
+        n_samples : int, default=10000
+            The number of samples of the bootstrap and randomization tests.
+        alpha : float, default=0.05
+            The confidence intervals of the bootstrap test have a level of `1 - alpha`.
+        seed : int, optional
+            Seed of the bootstrap and randomization tests, for reproducible p-values.
+        n_jobs : int, optional
+            If greater than 1, the samples of the bootstrap and randomization tests are drawn by `n_jobs` threads.
+        k : int, optional
+            The cutoff to compare, required if `k` is a list of cutoffs.
+
+        Returns
+        -------
+        DataFrame
+            DataFrame with MultiIndex (system A, system B) and columns [mean_a, mean_b, difference, n_queries,
+            p_value]. The bootstrap test adds the confidence interval of the difference [ci_low, ci_high], and the
+            t-test adds the t statistic. The difference is B minus A, over the queries where the metric is defined
+            for both systems.
 
-    def rank_biased_overlap(self, identifier='id', systems=None, p=0.9):
+        Notes
+        -----
+        See `evalcat.significance` for the tests. The p-values are not corrected for multiple comparisons.
+        """
+        tests = {'bootstrap': lambda differences: paired_bootstrap(differences, n_samples, alpha, seed, n_jobs),
+                 'permutation': lambda differences: (permutation_test(differences, n_samples, seed, n_jobs),),
+                 't-test': lambda differences: paired_t_test(differences)[::-1]}
+        columns = {'bootstrap': ['p_value', 'ci_low', 'ci_high'], 'permutation': ['p_value'],
+                   't-test': ['p_value', 'statistic']}
+        if test not in tests:
+            raise ValueError("`test` must be 'bootstrap', 'permutation' or 't-test'.")
+        systems = list(systems) if systems is not None else list(self.base_result.systems)
+        if baseline is not None and baseline not in systems:
+            systems.insert(0, baseline)
+        if any(system not in self.base_result for system in systems):
+            raise ValueError("Systems provided are not in results.")
+        values = self._get_field_from_summary(field_name, metric)
+        if metric not in values.columns.values:
+            raise ValueError("Metric not calculated for this field.")
+        values = values[metric]
+        if values.index.nlevels == 3:
+            if k is None or k not in values.index.levels[2]:
+                raise ValueError("`k` must be one of the cutoffs of the summary.")
+            values = values.xs(k, level=2)
+        matrix = values.unstack(1).reindex(systems).to_numpy(dtype=float)
+
+        if baseline is not None:
+            pairs = [(baseline, system) for system in systems if system != baseline]
+        else:
+            pairs = list(itertools.combinations(systems, 2))
+        rows = []
+        for system_a, system_b in pairs:
+            a, b = matrix[systems.index(system_a)], matrix[systems.index(system_b)]
+            defined = ~(np.isnan(a) | np.isnan(b))
+            a, b = a[defined], b[defined]
+            with np.errstate(invalid='ignore'):
+                means = [a.mean(), b.mean()] if len(a) else [np.nan, np.nan]
+            rows.append(means + [means[1] - means[0], len(a)] + list(tests[test](b - a)))
+        return pd.DataFrame(rows, index=pd.MultiIndex.from_tuples(pairs) if pairs else None,
+                            columns=['mean_a', 'mean_b', 'difference', 'n_queries'] + columns[test])
+
+    def get_profile_df(self):
+        """Returns a DataFrame containing the total wall time, calls and peak memory of each profiled stage.
+
+        The stages of the ResultList are `ingest`, `compute_metrics` per field, and its public methods. The stages of
+        `Field.compute_metrics` are `process_base_result`, `metrics` and `dataframe`.
+
+        Returns
+        -------
+        DataFrame
+            DataFrame with MultiIndex (field, stage), or (field, stage, system) if the profiler records systems, and
+            columns [calls, seconds, peak_memory]. See `Profiler.report`.
+        """
+        if self.profiler is None:
+            raise RuntimeError('ResultList was not created with a profiler.')
+        return self.profiler.report()
+
+    def _encode_identifiers(self, systems, identifier, queries=None):
+        """Encodes the identifiers of each system's ranked lists for `rbo_from_first_ranks`.
+
+        Returns a `(first_ranks, lengths)` tuple per system, and the number of distinct codes.
+        If `queries` is a slice, only the ranked lists of this range of queries are encoded.
+        Missing identifiers are given their own code, so that they are compared like any other identifier.
+        With `chunk_size`, the identifiers of a ColumnarResult that are not dictionary-encoded, e.g. memory-mapped
+        integers, are encoded for this range only instead of being encoded and cached for all items.
+        """
+        system_offsets = []
+        for system in systems:
+            offsets = self.base_result.system_offsets(system)
+            if queries is not None:
+                offsets = offsets[queries.start:queries.stop + 1]
+            system_offsets.append(offsets)
+        column = self.base_result.columns.get(identifier) if isinstance(self.base_result, ColumnarResult) else None
+        if self.chunk_size and column is not None and not isinstance(column, pd.Categorical):
+            values = np.concatenate([column[offsets[0]:offsets[-1]] for offsets in system_offsets])
+            codes, uniques = pd.factorize(values)
+            n_codes = len(uniques) + 1
+            system_codes = np.split(codes, np.cumsum([offsets[-1] - offsets[0] for offsets in system_offsets])[:-1])
+        else:
+            identifiers = self.base_result.categorical_column(identifier)
+            n_codes = len(identifiers.categories) + 1
+            system_codes = [identifiers.codes[offsets[0]:offsets[-1]] for offsets in system_offsets]
+        rankings = []
+        for offsets, codes in zip(system_offsets, system_codes):
+            lengths = np.diff(offsets)
+            rankings.append((first_ranks(np.where(codes < 0, n_codes - 1, codes), lengths, n_codes), lengths))
+        return rankings, n_codes
+
+    def _query_chunks(self):
+        """Splits the queries into ranges with about `chunk_size` items over all systems, or a single range."""
+        n_queries = len(self.base_result.queries)
+        if not self.chunk_size or not n_queries:
+            return [slice(0, n_queries)]
+        items = np.cumsum(np.diff(self.base_result.offsets).reshape(-1, n_queries).sum(axis=0))
+        ends = np.searchsorted(items, np.arange(self.chunk_size, items[-1], self.chunk_size), side='right')
+        bounds = np.unique(np.concatenate([[0], ends, [n_queries]]))
+        return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    @_profiled('rank_biased_overlap')
+    def rank_biased_overlap(self, identifier='id', systems=None, p=0.9, batch=True):
         """Computes the rank-biased overlap (RBO) of two systems across all queries.
 
         Parameters
@@ -142,6 +559,10 @@ class ResultList:
             The names of the two systems to be compared. If not provided, will compare the first two systems.
         p : float, default=0.9
             A RBO parameter modelling the user's persistence, or the probability of continuing to the next search item.
+        batch : bool, default=True
+            If set to True, will compute RBO for all queries at once with array operations.
+            Else if set to False, will compute RBO one query at a time.
+
         Returns
         -------
         DataFrame
@@ -164,6 +585,7 @@ class ResultList:
                     raise ValueError('RBO can only compare 2 systems.')
                 res1 = self.base_result[systems[0]]
                 res2 = self.base_result[systems[1]]
+                systems = list(systems)
             except TypeError:
                 raise TypeError('`systems` must be a list containing the names of 2 systems.')
             except ValueError as e:
@@ -171,8 +593,18 @@ class ResultList:
             except KeyError:
                 raise ValueError('Systems provided are not in results.')
         else:
-            res1 = self.base_result[self.base_result.systems[0]]
-            res2 = self.base_result[self.base_result.systems[1]]
+            systems = self.base_result.systems[:2]
+            res1 = self.base_result[systems[0]]
+            res2 = self.base_result[systems[1]]
+
+        if batch:
+            rbos = []
+            for queries in self._query_chunks():
+                ((first1, lengths1), (first2, lengths2)), n_codes = self._encode_identifiers(systems, identifier,
+                                                                                              queries)
+                rbos.append(rbo_from_first_ranks(first1, first2, lengths1, lengths2, n_codes, p))
+            return pd.DataFrame(np.concatenate(rbos), index=self.base_result.queries,
+                                columns=['rbo_min', 'rbo_res', 'rbo_ext'])
 
         rbos = []
         for query in self.base_result.queries:
@@ -184,3 +616,150 @@ class ResultList:
                 rbos.append(rbo(id1, id2, p))
 
         return pd.DataFrame(rbos, index=self.base_result.queries, columns=['rbo_min', 'rbo_res', 'rbo_ext'])
+
+    @_profiled('rank_biased_overlap_matrix')
+    def rank_biased_overlap_matrix(self, identifier='id', systems=None, p=0.9, value='rbo_ext', aggregate=True,
+                                   n_jobs=None):
+        """Computes the rank-biased overlap (RBO) between every pair of systems.
+
+        Parameters
+        ----------
+        identifier : str
+            The name of a metric that can uniquely identify a search result item.
+        systems : list of str, optional
+            The names of the systems to be compared. If not provided, will compare all systems.
+        p : float, default=0.9
+            A RBO parameter modelling the user's persistence, or the probability of continuing to the next search item.
+        value : {'rbo_min', 'rbo_res', 'rbo_ext'}, default='rbo_ext'
+            The RBO value placed in the matrix.
+        aggregate : bool, default=True
+            If set to True, will average the RBO of each pair of systems over queries, ignoring queries where either
+            system has no results. Else if set to False, will return a matrix for each query.
+        n_jobs : int, optional
+            If greater than 1, the pairs of systems are compared in parallel over a pool of `n_jobs` processes.
+
+        Returns
+        -------
+        DataFrame
+            If `aggregate` is True, DataFrame with index systems and column systems.
+            Else DataFrame with MultiIndex (query, system) and column systems.
+
+        Notes
+        -----
+        The identifiers of each system are extracted and encoded once and shared by all the pairs it is part of.
+        As RBO is symmetric, each unordered pair of systems is only computed once. If the ResultList has a
+        `chunk_size`, the queries are encoded and compared one chunk at a time.
+        """
+        columns = ['rbo_min', 'rbo_res', 'rbo_ext']
+        if value not in columns:
+            raise ValueError(f'`value` must be one of {columns}.')
+        if systems is None:
+            systems = self.base_result.systems
+        elif isinstance(systems, str) or not all(system in self.base_result for system in systems):
+            raise ValueError('Systems provided are not in results.')
+
+        queries = self.base_result.queries
+        pairs = [(i, j) for i in range(len(systems)) for j in range(i, len(systems))]
+        rbos = np.full((len(systems), len(systems), len(queries)), np.nan)
+        for chunk in self._query_chunks():
+            rankings, n_codes = self._encode_identifiers(systems, identifier, chunk)
+            for (i, j), pair_rbos in zip(pairs, rbo_pairs(rankings, pairs, n_codes, p, n_jobs=n_jobs)):
+                rbos[i, j, chunk] = rbos[j, i, chunk] = pair_rbos[:, columns.index(value)]
+
+        if aggregate:
+            counts = (~np.isnan(rbos)).sum(axis=2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means = np.nansum(rbos, axis=2) / counts
+            return pd.DataFrame(means, index=systems, columns=systems)
+        return pd.DataFrame(rbos.transpose(2, 0, 1).reshape(-1, len(systems)),
+                            index=pd.MultiIndex.from_product([queries, systems]), columns=systems)
+
+
+class LazySummary(Mapping):
+    """
+    LazySummary maps field names to summary DataFrames, computing each field the first time it is accessed.
+
+    Parameters
+    ----------
+    result_list : ResultList
+        The ResultList whose fields are summarized.
+    """
+
+    def __init__(self, result_list):
+        self._result_list = result_list
+        self._fields = {field.name: field for field in result_list.fields}
+        self._summary = {}
+        self._partial = {}
+        # The metrics requested from each field that it does not compute, so that they are only computed once.
+        self._unknown = {}
+
+    def __getitem__(self, field_name):
+        if field_name not in self._summary:
+            field = self._fields[field_name]
+            self._summary[field_name] = self._result_list._compute_summary(self._result_list.k, [field])[field_name]
+            self._partial.pop(field_name, None)
+        return self._summary[field_name]
+
+    def __contains__(self, field_name):
+        return field_name in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def is_computed(self, field_name):
+        """Returns whether all the metrics of a field have been computed."""
+        return field_name in self._summary
+
+    def partial(self, field_name):
+        """Returns the summary DataFrame of the metrics of a field computed so far, without computing any.
+
+        Parameters
+        ----------
+        field_name : str
+            The name of the field.
+
+        Returns
+        -------
+        pd.DataFrame or None
+            The full summary of the field if all its metrics have been computed, the DataFrame holding the metrics
+            computed by `get_metrics` otherwise, or None if no metric has been computed.
+        """
+        if field_name in self._summary:
+            return self._summary[field_name]
+        return self._partial.get(field_name)
+
+    def get_metrics(self, field_name, metrics):
+        """Returns a summary DataFrame containing only some metrics of a field.
+
+        Only the missing metrics are computed, if the field has not been fully computed yet. Metrics that the field
+        does not compute are left out of the returned DataFrame.
+
+        Parameters
+        ----------
+        field_name : str
+            The name of the field.
+        metrics : list of str
+            The names of the metrics.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with MultiIndex (system, query) and column metric.
+        """
+        if field_name in self._summary:
+            summary = self._summary[field_name]
+            return summary.loc[:, [metric for metric in summary.columns if metric in metrics]]
+        field = self._fields[field_name]
+        partial = self._partial.get(field_name)
+        unknown = self._unknown.setdefault(field_name, set())
+        missing = [metric for metric in metrics
+                   if (partial is None or metric not in partial.columns) and metric not in unknown]
+        if missing or partial is None:
+            computed = self._result_list._compute_summary(self._result_list.k, [field], metrics=missing)[field_name]
+            unknown.update(metric for metric in missing if metric not in computed.columns)
+            partial = computed if partial is None else pd.concat([partial, computed], axis=1)
+            self._partial[field_name] = partial
+        return partial.loc[:, [metric for metric in partial.columns if metric in metrics]]
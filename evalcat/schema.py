@@ -0,0 +1,243 @@
+"""
+Compact search items with a declared schema.
+
+A dict per search item costs a few hundred bytes, and a boxed Python object per numerical value. An ItemSchema
+declares the fields of the items once, and stores each item either as a record with `__slots__` or, packed with the
+other items of its ranked list, as one typed array per numerical field and one tuple per other field. Both support
+the `item[field_name]` access of `Field.at_k`, as well as `item.field_name`.
+"""
+
+import numbers
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+# Declared types stored as typed arrays in a PackedList, where floats use NaN for None.
+_ARRAY_TYPES = {float: np.float64, int: np.int64, bool: np.bool_}
+
+
+class ItemSchema:
+    """
+    ItemSchema declares the fields of search items, to store the items compactly.
+
+    Parameters
+    ----------
+    fields : list of str, or dict
+        The names of the fields, or a dict mapping each name to its type. Fields of type float, int or bool are
+        packed into NumPy arrays by `pack`, and other fields into tuples. Names must be valid identifiers.
+
+    Attributes
+    ----------
+    fields : tuple of str
+        The names of the fields.
+    types : dict
+        Maps each field name to its declared type, or object if it was not declared.
+    record_class : type
+        The class of the records returned by `item`, with a slot per field.
+
+    Examples
+    --------
+    >>> schema = ItemSchema({'id': str, 'name': str, 'price': float, 'category': str})
+    >>> item = schema.item(id='53', name='Orange', price=1.0, category='fruit')
+    >>> item['price'], item.price
+    (1.0, 1.0)
+    >>> ranked_list = schema.pack([('53', 'Orange', 1.0, 'fruit'), ('17', 'Apple', None, 'fruit')])
+    >>> ranked_list[1]['price'] is None
+    True
+    """
+
+    def __init__(self, fields):
+        types = dict(fields) if isinstance(fields, Mapping) else dict.fromkeys(fields, object)
+        for name in types:
+            if not isinstance(name, str) or not name.isidentifier() or name.startswith('_'):
+                raise ValueError(f'Field name {name!r} must be an identifier that does not start with "_".')
+        self.fields = tuple(types)
+        self.types = types
+        self.record_class = type('Item', (Record,), {'__slots__': self.fields, '_schema': self,
+                                                     '_field_set': frozenset(self.fields)})
+        self._positions = {name: idx for idx, name in enumerate(self.fields)}
+
+    def __reduce__(self):
+        return ItemSchema, (self.types,)
+
+    def __repr__(self):
+        return f'ItemSchema({self.types!r})'
+
+    def item(self, *values, **kwargs):
+        """Returns a record of the schema, with values given in the order of `fields` or by name.
+
+        Fields that are not given are None.
+        """
+        if len(values) > len(self.fields):
+            raise ValueError(f'Expected at most {len(self.fields)} values, got {len(values)}.')
+        record = self.record_class.__new__(self.record_class)
+        for name, value in zip(self.fields, values):
+            object.__setattr__(record, name, value)
+        for name in self.fields[len(values):]:
+            object.__setattr__(record, name, kwargs.pop(name, None))
+        if kwargs:
+            raise ValueError(f'Fields {sorted(kwargs)} are not in the schema or given twice.')
+        return record
+
+    def pack(self, items):
+        """Packs the items of a ranked list into a PackedList.
+
+        Parameters
+        ----------
+        items : iterable
+            The items, as mappings such as dicts or records, missing fields being None, or as tuples of values in
+            the order of `fields`.
+
+        Returns
+        -------
+        PackedList
+        """
+        items = items if isinstance(items, (list, tuple)) else list(items)
+        if items and not isinstance(items[0], Mapping):
+            rows = items
+        else:
+            rows = [tuple(item.get(name) for name in self.fields) for item in items]
+        columns = list(zip(*rows)) if rows else [()] * len(self.fields)
+        if len(columns) != len(self.fields):
+            raise ValueError(f'Items must have {len(self.fields)} values, in the order of the fields of the schema.')
+        return PackedList(self, tuple(self._pack_column(name, values) for name, values in zip(self.fields, columns)))
+
+    def pack_results(self, results):
+        """Packs every ranked list of nested search results, structured as for BaseResult.
+
+        Returns
+        -------
+        dict
+            Maps each system to a dict mapping each query to a PackedList.
+        """
+        return {system: {query: self.pack(items) for query, items in query_res.items()}
+                for system, query_res in results.items()}
+
+    def _pack_column(self, name, values):
+        dtype = _ARRAY_TYPES.get(self.types[name])
+        if dtype is None:
+            return tuple(values)
+        if dtype is np.float64:
+            return np.array([np.nan if value is None else value for value in values], dtype=dtype)
+        if any(value is None for value in values):
+            raise ValueError(f'Field {name!r} of type {self.types[name].__name__} cannot be None, declare it as '
+                             f'float or object instead.')
+        return np.array(values, dtype=dtype)
+
+
+class Record(Mapping):
+    """Base class of the records of an ItemSchema, a read-only mapping from field names to values.
+
+    The values are stored in slots and can also be read as attributes. Records are created by `ItemSchema.item`.
+    """
+
+    __slots__ = ()
+    _schema = None
+    _field_set = frozenset()
+
+    def __getitem__(self, name):
+        if name not in self._field_set:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __iter__(self):
+        return iter(self._schema.fields)
+
+    def __len__(self):
+        return len(self._schema.fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Records are read-only.')
+
+    def __reduce__(self):
+        return self._schema.item, tuple(getattr(self, name) for name in self._schema.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class PackedList(Sequence):
+    """
+    PackedList is a ranked list of items of an ItemSchema, stored as one array or tuple per field.
+
+    Indexing returns a lightweight view of an item, which supports `item[field_name]` and `item.field_name`, and
+    slicing returns a PackedList sharing the arrays. Created by `ItemSchema.pack`.
+
+    Parameters
+    ----------
+    schema : ItemSchema
+        The schema of the items.
+    columns : tuple
+        The values of each field of the schema, as a NumPy array or a tuple.
+    """
+
+    __slots__ = ('schema', 'columns')
+
+    def __init__(self, schema, columns):
+        self.schema = schema
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return PackedList(self.schema, tuple(values[idx] for values in self.columns))
+        if not isinstance(idx, numbers.Integral):
+            raise TypeError('PackedList indices must be integers or slices.')
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('PackedList index out of range.')
+        return PackedItem(self, idx)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(item == other_item for item, other_item in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'PackedList({[dict(item) for item in self]!r})'
+
+    def column(self, name):
+        """Returns the values of a field for all items, as a NumPy array or a tuple."""
+        return self.columns[self.schema._positions[name]]
+
+    def value(self, name, position):
+        """Returns the value of a field for the item at `position`, where NaN in a float array is None."""
+        values = self.columns[self.schema._positions[name]]
+        if isinstance(values, tuple):
+            return values[position]
+        value = values[position].item()
+        return None if value != value else value
+
+
+class PackedItem(Mapping):
+    """Read-only view of an item of a PackedList."""
+
+    __slots__ = ('_list', '_position')
+
+    def __init__(self, packed_list, position):
+        self._list = packed_list
+        self._position = position
+
+    def __getitem__(self, name):
+        if name not in self._list.schema._positions:
+            raise KeyError(name)
+        return self._list.value(name, self._position)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._list.schema._positions:
+            raise AttributeError(name)
+        return self._list.value(name, self._position)
+
+    def __iter__(self):
+        return iter(self._list.schema.fields)
+
+    def __len__(self):
+        return len(self._list.schema.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
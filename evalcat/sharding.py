@@ -0,0 +1,118 @@
+"""
+Evaluation of search results sharded by query.
+
+Each shard of the queries is evaluated independently into a StreamingEvaluator, whose state is a dictionary of
+python objects that can be sent between processes or machines, and the shards are merged into the aggregates of
+the full search results.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from evalcat.base_result import BaseResult
+from evalcat.streaming import StreamingEvaluator
+
+
+def shard_queries(base_result, n_shards):
+    """Splits search results into about `n_shards` BaseResults with all the systems and a range of the queries.
+
+    Parameters
+    ----------
+    base_result : BaseResult
+        The search results to split.
+    n_shards : int
+        The number of shards.
+
+    Returns
+    -------
+    list of BaseResult
+    """
+    queries = base_result.queries
+    size = max(1, math.ceil(len(queries) / n_shards))
+    return [base_result.subset(queries=queries[start:start + size]) for start in range(0, max(len(queries), 1), size)]
+
+
+def evaluate_shard(base_result, fields, k=10, **kwargs):
+    """Returns the state of a StreamingEvaluator of the search results of a shard, as returned by `to_dict`.
+
+    Parameters
+    ----------
+    base_result : BaseResult
+        The search results of the shard.
+    fields : list of Field
+        The fields to evaluate.
+    k : int, default=10
+        Only use the top K results to calculate the metrics.
+    **kwargs
+        Other parameters of StreamingEvaluator, e.g. `rbo_pairs`.
+
+    Returns
+    -------
+    dict
+    """
+    evaluator = StreamingEvaluator(fields, k=k, **kwargs)
+    evaluator.update_base_result(base_result)
+    return evaluator.to_dict()
+
+
+def merge(states, fields):
+    """Merges the states of the StreamingEvaluators of several shards.
+
+    Parameters
+    ----------
+    states : list of dict
+        The states of the shards, as returned by `evaluate_shard` or `StreamingEvaluator.to_dict`.
+    fields : list of Field
+        The fields of the evaluators.
+
+    Returns
+    -------
+    StreamingEvaluator
+        The evaluator of the union of the shards.
+    """
+    if not states:
+        raise ValueError('There are no shards to merge.')
+    merged = StreamingEvaluator.from_dict(states[0], fields)
+    for state in states[1:]:
+        merged.merge(StreamingEvaluator.from_dict(state, fields))
+    return merged
+
+
+def evaluate_sharded(results, fields, k=10, n_shards=None, n_jobs=None, **kwargs):
+    """Evaluates search results by shards of queries in worker processes, and merges the shards.
+
+    Parameters
+    ----------
+    results : dict or BaseResult
+        The search results.
+    fields : list of Field
+        The fields to evaluate.
+    k : int, default=10
+        Only use the top K results to calculate the metrics.
+    n_shards : int, optional
+        The number of shards. If not provided, will use the number of workers.
+    n_jobs : int, optional
+        The number of worker processes. If -1 or not provided, will use the number of CPUs.
+    **kwargs
+        Other parameters of StreamingEvaluator, e.g. `rbo_pairs`.
+
+    Returns
+    -------
+    StreamingEvaluator
+        The evaluator of the full search results. Its snapshots are the means over queries of the ResultList
+        summaries of the same search results.
+
+    Notes
+    -----
+    Each shard is sent to a worker, which returns the state of its evaluator as a dictionary, as a worker on
+    another machine would. The labels of a CategoricalField without explicit labels are discovered by each shard.
+    """
+    base_result = results if isinstance(results, BaseResult) else BaseResult(results)
+    if not n_jobs or n_jobs < 0:
+        n_jobs = os.cpu_count()
+    shards = shard_queries(base_result, n_shards or n_jobs)
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [pool.submit(evaluate_shard, shard, fields, k, **kwargs) for shard in shards]
+        states = [future.result() for future in futures]
+    return merge(states, fields)
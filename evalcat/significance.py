@@ -0,0 +1,170 @@
+"""
+Paired significance tests between systems.
+
+The tests take the per-query differences of a metric between two systems, and test whether their mean is 0.
+The bootstrap and randomization tests are vectorized: each chunk of samples is drawn as one random matrix with a
+row per sample, and chunks can be drawn by several threads, each with its own random generator derived from `seed`,
+so that the result does not depend on the number of threads.
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Number of random values drawn at once, which bounds the memory used by each chunk of samples.
+RESAMPLING_CHUNK_SIZE = 1 << 20
+
+
+def paired_t_test(differences):
+    """Two-sided paired t-test of the mean of `differences` against 0.
+
+    Parameters
+    ----------
+    differences : array-like
+        The differences of a metric between two systems, one per query.
+
+    Returns
+    -------
+    statistic : float
+        The t statistic, NaN if there are fewer than 2 differences.
+    p_value : float
+        The p-value, NaN if there are fewer than 2 differences or they are all equal.
+    """
+    differences = np.asarray(differences, dtype=float)
+    n = len(differences)
+    if n < 2:
+        return math.nan, math.nan
+    std = differences.std(ddof=1)
+    mean = differences.mean()
+    if std == 0:
+        return (math.nan, math.nan) if mean == 0 else (math.copysign(math.inf, mean), 0.0)
+    statistic = mean / (std / math.sqrt(n))
+    df = n - 1
+    return statistic, _betainc(df / 2, 0.5, df / (df + statistic ** 2))
+
+
+def paired_bootstrap(differences, n_samples=10000, alpha=0.05, seed=None, n_jobs=None):
+    """Two-sided paired bootstrap test of the mean of `differences` against 0.
+
+    The queries are resampled with replacement, and the p-value is the fraction of bootstrap means, shifted to a
+    mean of 0, that are at least as far from 0 as the observed mean.
+
+    Parameters
+    ----------
+    differences : array-like
+        The differences of a metric between two systems, one per query.
+    n_samples : int, default=10000
+        The number of bootstrap samples.
+    alpha : float, default=0.05
+        The confidence interval is the `1 - alpha` percentile interval of the bootstrap means.
+    seed : int, optional
+        Seed of the random generators, for reproducible results.
+    n_jobs : int, optional
+        If greater than 1, the samples are drawn by `n_jobs` threads.
+
+    Returns
+    -------
+    p_value : float
+    ci_low, ci_high : float
+        The bounds of the confidence interval of the mean difference.
+    """
+    differences = np.asarray(differences, dtype=float)
+    n = len(differences)
+    if not n:
+        return math.nan, math.nan, math.nan
+
+    def sample_means(rng, n_rows):
+        positions = rng.integers(0, n, size=(n_rows, n), dtype=np.int32 if n < 2 ** 31 else np.int64)
+        return np.take(differences, positions).sum(axis=1) / n
+
+    means = _resample(sample_means, n, n_samples, seed, n_jobs)
+    observed = differences.mean()
+    p_value = np.count_nonzero(np.abs(means - observed) >= _at_least(abs(observed), differences)) / n_samples
+    ci_low, ci_high = np.quantile(means, [alpha / 2, 1 - alpha / 2])
+    return p_value, ci_low, ci_high
+
+
+def permutation_test(differences, n_samples=10000, seed=None, n_jobs=None):
+    """Two-sided paired randomization test of the mean of `differences` against 0.
+
+    Under the null hypothesis, the two systems are exchangeable for each query, so the sign of each difference is
+    flipped at random. The signs are drawn as random bits, and the mean of each sample is a matrix product.
+
+    Parameters
+    ----------
+    differences : array-like
+        The differences of a metric between two systems, one per query.
+    n_samples : int, default=10000
+        The number of random sign assignments.
+    seed : int, optional
+        Seed of the random generators, for reproducible results.
+    n_jobs : int, optional
+        If greater than 1, the samples are drawn by `n_jobs` threads.
+
+    Returns
+    -------
+    float
+        The p-value, counting the observed assignment as one of the samples.
+    """
+    differences = np.asarray(differences, dtype=float)
+    n = len(differences)
+    if not n:
+        return math.nan
+    total = differences.sum()
+
+    def sample_means(rng, n_rows):
+        bits = np.frombuffer(rng.bytes(n_rows * ((n + 7) // 8)), dtype=np.uint8).reshape(n_rows, -1)
+        flipped = np.unpackbits(bits, axis=1, count=n).astype(float) @ differences
+        return (total - 2 * flipped) / n
+
+    means = _resample(sample_means, n, n_samples, seed, n_jobs)
+    extreme = np.count_nonzero(np.abs(means) >= _at_least(abs(total / n), differences))
+    return (extreme + 1) / (n_samples + 1)
+
+
+def _resample(sample_means, n, n_samples, seed, n_jobs):
+    """Returns `n_samples` sample means, drawn in chunks of about RESAMPLING_CHUNK_SIZE random values."""
+    rows = max(1, RESAMPLING_CHUNK_SIZE // n)
+    chunks = [min(rows, n_samples - start) for start in range(0, n_samples, rows)]
+    generators = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(len(chunks))]
+    if n_jobs and n_jobs > 1 and len(chunks) > 1:
+        # NumPy releases the GIL while drawing and reducing large arrays, so threads run on several cores.
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            return np.concatenate(list(executor.map(sample_means, generators, chunks)))
+    return np.concatenate([sample_means(rng, n_rows) for rng, n_rows in zip(generators, chunks)])
+
+
+def _at_least(value, differences):
+    """Lowers a threshold by a rounding tolerance, so that sample means equal to `value` count as extreme."""
+    return value - 1e-12 * (np.abs(differences).mean() + value)
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b), evaluated with a continued fraction as in [1]_.
+
+    .. [1] William H. Press, Saul A. Teukolsky, William T. Vetterling, and Brian P. Flannery. 2007. Numerical
+       Recipes: The Art of Scientific Computing (3rd ed.). Cambridge University Press. Section 6.4.
+    """
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1 - _betainc(b, a, 1 - x)
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return math.exp(log_front) * fraction / a
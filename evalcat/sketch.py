@@ -0,0 +1,164 @@
+"""
+Mergeable quantile sketches.
+
+Implementation of the KLL sketch as described in [1]_. The sketch keeps a bounded number of values in compactors of
+increasing weight: when a compactor is full, its values are sorted and every other value is promoted to the next
+compactor, whose values count twice as much. Sketches of different streams can be merged into a sketch of their union.
+
+.. [1] Zohar Karnin, Kevin Lang, and Edo Liberty. 2016. Optimal Quantile Approximation in Streams.
+   IEEE 57th Annual Symposium on Foundations of Computer Science (FOCS), 71-78. DOI:https://doi.org/10.1109/FOCS.2016.17
+"""
+
+import math
+import random
+
+import numpy as np
+
+
+class KLLSketch:
+    """
+    KLLSketch estimates the quantiles of a stream of numbers in bounded memory.
+
+    Parameters
+    ----------
+    k : int, default=200
+        The capacity of the largest compactor. The rank error is about 1.7 / k, and the sketch stores about 3k values.
+    seed : int, optional
+        Seed of the random choices made when compacting, for reproducible sketches.
+
+    Attributes
+    ----------
+    count : int
+        The total weight of the values added to the sketch.
+    min, max : float
+        The smallest and largest values added to the sketch, or NaN if it is empty.
+    """
+
+    C = 2 / 3
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.compactors = [[]]
+        self.count = 0
+        self.min = math.nan
+        self.max = math.nan
+        self._random = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def __len__(self):
+        """Returns the number of values stored in the sketch."""
+        return self._size
+
+    def update(self, value, weight=1):
+        """Adds a value to the sketch, counted `weight` times."""
+        if weight <= 0:
+            return
+        value = float(value)
+        self.count += weight
+        if not value >= self.min:
+            self.min = value
+        if not value <= self.max:
+            self.max = value
+        # A value of weight 2^h is stored in compactor h, so any integer weight is stored by its binary digits.
+        level = 0
+        while weight:
+            if weight & 1:
+                while level >= len(self.compactors):
+                    self._grow()
+                self.compactors[level].append(value)
+                self._size += 1
+            weight >>= 1
+            level += 1
+        self._compress()
+
+    def merge(self, other):
+        """Adds the values of another sketch to this sketch.
+
+        Parameters
+        ----------
+        other : KLLSketch
+            The sketch to merge. It is not modified.
+
+        Returns
+        -------
+        KLLSketch
+            This sketch.
+        """
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level].extend(compactor)
+        self._size += len(other)
+        self.count += other.count
+        self.min = float(np.fmin(self.min, other.min))
+        self.max = float(np.fmax(self.max, other.max))
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Returns the estimated quantile of the values, or NaN if the sketch is empty.
+
+        Parameters
+        ----------
+        q : float or list of float
+            The quantiles to estimate, between 0 and 1 inclusive.
+
+        Returns
+        -------
+        float or np.ndarray
+        """
+        q = np.asarray(q, dtype=float)
+        if not self.count:
+            return np.full(q.shape, np.nan)[()]
+        values = np.concatenate([np.asarray(compactor, dtype=float) for compactor in self.compactors])
+        weights = np.concatenate([np.full(len(compactor), 2 ** level, dtype=float)
+                                  for level, compactor in enumerate(self.compactors)])
+        order = np.argsort(values, kind='stable')
+        values, cumulative = values[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        result = values[np.minimum(positions, len(values) - 1)]
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return result[()]
+
+    def to_dict(self):
+        """Returns the state of the sketch as a dictionary of python objects, which can be serialized as JSON."""
+        return {'k': self.k, 'compactors': [list(compactor) for compactor in self.compactors], 'count': self.count,
+                'min': None if math.isnan(self.min) else self.min, 'max': None if math.isnan(self.max) else self.max}
+
+    @classmethod
+    def from_dict(cls, state, seed=None):
+        """Returns the sketch whose state was returned by `to_dict`."""
+        sketch = cls(state['k'], seed=seed)
+        for _ in range(len(state['compactors']) - 1):
+            sketch._grow()
+        sketch.compactors = [list(compactor) for compactor in state['compactors']]
+        sketch._size = sum(len(compactor) for compactor in sketch.compactors)
+        sketch.count = state['count']
+        sketch.min = math.nan if state['min'] is None else state['min']
+        sketch.max = math.nan if state['max'] is None else state['max']
+        return sketch
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * self.C ** depth)))
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for level in range(len(self.compactors)):
+                compactor = self.compactors[level]
+                if len(compactor) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self._grow()
+                    compactor.sort()
+                    # With an odd number of values, the largest stays at this level.
+                    kept = [compactor.pop()] if len(compactor) % 2 else []
+                    promoted = compactor[self._random.randint(0, 1)::2]
+                    self.compactors[level + 1].extend(promoted)
+                    self.compactors[level] = kept
+                    self._size -= len(compactor) - len(promoted)
+                    break
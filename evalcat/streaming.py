@@ -0,0 +1,298 @@
+"""
+Online evaluation of search results.
+
+The metrics of each ranked list are computed as it arrives and folded into running aggregates per system, so that
+memory does not grow with the number of ranked lists.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from evalcat.aggregate import RBOAggregate, _python
+from evalcat.result_list import ResultList
+
+
+class StreamingEvaluator:
+    """
+    StreamingEvaluator aggregates the metrics of ranked lists as they arrive, instead of storing them like ResultList.
+
+    Parameters
+    ----------
+    fields : list of Field
+        Contains the fields to be evaluated. List items should be instances of Field subclasses.
+    k : int, default=10
+        Only use the top K results to calculate the metrics.
+    rbo_pairs : list of tuple of str, optional
+        The pairs of systems whose mean RBO is tracked.
+    identifier : str, default='id'
+        The name of a field that can uniquely identify a search result item, for RBO.
+    p : float, default=0.9
+        A RBO parameter modelling the user's persistence.
+    sketch_size : int, default=200
+        The size of the KLL sketches estimating the quantiles of each metric over ranked lists.
+
+    Attributes
+    ----------
+    systems : list
+        The systems seen so far, in order of arrival.
+
+    Notes
+    -----
+    The snapshot of a field contains, for each system, the mean of each metric over the ranked lists seen so far,
+    ignoring ranked lists where the metric is undefined. This is the mean over queries of the summary computed by
+    ResultList for the same ranked lists. The labels of a CategoricalField without explicit labels are discovered as
+    they arrive, and count as 0 in the ranked lists seen before them.
+
+    Memory per system is constant, except for RBO, where the identifiers of a ranked list are kept until the ranked
+    lists of the same query have arrived for all the systems it is paired with.
+    """
+
+    def __init__(self, fields, k=10, rbo_pairs=None, identifier='id', p=0.9, sketch_size=200):
+        self.fields = fields
+        self.k = k
+        self.rbo_pairs = [tuple(pair) for pair in rbo_pairs or []]
+        self.identifier = identifier
+        self.p = p
+        self.sketch_size = sketch_size
+        self.systems = []
+        self._aggregates = {field.name: {} for field in fields}
+        self._rbo = {pair: RBOAggregate() for pair in self.rbo_pairs}
+        self._partners = {}
+        for system, other in self.rbo_pairs:
+            self._partners.setdefault(system, set()).add(other)
+            self._partners.setdefault(other, set()).add(system)
+        self._pending = {}
+
+    def update(self, system, query, items):
+        """Adds the ranked list of a system for a query.
+
+        Parameters
+        ----------
+        system : str
+            The name of the system.
+        query : str
+            The query.
+        items : list
+            The ranked list of search items.
+        """
+        if system not in self.systems:
+            self.systems.append(system)
+        for field in self.fields:
+            aggregates = self._aggregates[field.name]
+            if system not in aggregates:
+                aggregates[system] = field.aggregate(self.k, self.sketch_size)
+            aggregates[system].update(items, query)
+        if system in self._partners:
+            self._update_rbo(system, query, [item[self.identifier] for item in items])
+
+    def _update_rbo(self, system, query, identifiers):
+        arrived, pending = self._pending.setdefault(query, (set(), {}))
+        arrived.add(system)
+        pending[system] = identifiers
+        for other in self._partners[system]:
+            if other in pending:
+                pair = (system, other) if (system, other) in self._rbo else (other, system)
+                self._rbo[pair].update(pending[pair[0]], pending[pair[1]], self.p)
+        # Identifiers are only kept while a paired system has not sent this query yet.
+        done = [member for member in pending if self._partners[member] <= arrived]
+        for member in done:
+            del pending[member]
+        if not pending:
+            del self._pending[query]
+
+    def update_base_result(self, base_result):
+        """Adds all the ranked lists of a BaseResult at once.
+
+        The metrics are computed with `Field.compute_metrics`, which is much faster than calling `update` for each
+        ranked list. It is computed by a shallow copy of each field, so that the state set by `process_base_result`,
+        such as the labels of a CategoricalField, is not kept by the field, and the labels of other search results
+        can still be discovered. Other attributes, such as the qrels of a RelevanceField, are shared, not copied.
+
+        Parameters
+        ----------
+        base_result : BaseResult
+            The search results to add, e.g. a shard of the queries.
+        """
+        for system in base_result.systems:
+            if system not in self.systems:
+                self.systems.append(system)
+        n_queries = len(base_result.queries)
+        for field in self.fields:
+            summary = copy.copy(field).compute_metrics(base_result, self.k)
+            aggregates = self._aggregates[field.name]
+            for idx, system in enumerate(base_result.systems):
+                if system not in aggregates:
+                    aggregates[system] = field.aggregate(self.k, self.sketch_size)
+                aggregates[system].update_summary(summary.iloc[idx * n_queries:(idx + 1) * n_queries])
+        self._update_base_result_rbo(base_result)
+
+    def _update_base_result_rbo(self, base_result):
+        systems = set(base_result.systems)
+        paired = [system for system in base_result.systems if system in self._partners]
+        if not paired:
+            return
+        if self._pending or any(not self._partners[system] <= systems for system in paired):
+            # Some RBO pairs are only complete with other search results, so the ranked lists go through `update`.
+            for query in base_result.queries:
+                for system in paired:
+                    self._update_rbo(system, query,
+                                     [item[self.identifier] for item in base_result[system][query]])
+            return
+        result_list = ResultList(base_result, lazy=True)
+        for pair, aggregate in self._rbo.items():
+            if pair[0] in systems:
+                aggregate.update_frame(result_list.rank_biased_overlap(self.identifier, systems=pair, p=self.p))
+
+    def merge(self, other):
+        """Adds the aggregates of another StreamingEvaluator with the same fields and parameters.
+
+        The snapshots of the merged evaluator are those of an evaluator that received the ranked lists of both.
+        Ranked lists still waiting for their RBO pair in `other` are added to this evaluator, and their RBO is
+        computed if the pair is in this evaluator.
+
+        Parameters
+        ----------
+        other : StreamingEvaluator
+            The evaluator to merge. It is not modified.
+
+        Returns
+        -------
+        StreamingEvaluator
+            This evaluator.
+        """
+        if ([field.name for field in other.fields] != [field.name for field in self.fields]
+                or (other.k, other.rbo_pairs, other.identifier, other.p) != (self.k, self.rbo_pairs, self.identifier,
+                                                                               self.p)):
+            raise ValueError('Only evaluators with the same fields and parameters can be merged.')
+        for system in other.systems:
+            if system not in self.systems:
+                self.systems.append(system)
+        for field_name, aggregates in self._aggregates.items():
+            for system, aggregate in other._aggregates[field_name].items():
+                if system in aggregates:
+                    aggregates[system].merge(aggregate)
+                else:
+                    aggregates[system] = aggregate.copy()
+        for pair, aggregate in self._rbo.items():
+            aggregate.merge(other._rbo[pair])
+        for query, (arrived, pending) in other._pending.items():
+            # The systems that arrived in `other` and are no longer pending were already compared with their pairs.
+            self._pending.setdefault(query, (set(), {}))[0].update(arrived)
+            for system, identifiers in pending.items():
+                self._update_rbo(system, query, list(identifiers))
+        return self
+
+    def to_dict(self):
+        """Returns the state of the evaluator as a dictionary of python objects, which can be serialized as JSON.
+
+        The fields are not included, and must be passed to `from_dict` along with the state.
+        """
+        return {
+            'k': self.k, 'rbo_pairs': [list(pair) for pair in self.rbo_pairs], 'identifier': self.identifier,
+            'p': self.p, 'sketch_size': self.sketch_size, 'systems': [_python(system) for system in self.systems],
+            'aggregates': {field_name: [[_python(system), aggregate.to_dict()]
+                                        for system, aggregate in aggregates.items()]
+                           for field_name, aggregates in self._aggregates.items()},
+            'rbo': [aggregate.to_dict() for aggregate in self._rbo.values()],
+            'pending': [[_python(query), [_python(system) for system in arrived],
+                         [[_python(system), [_python(identifier) for identifier in identifiers]]
+                          for system, identifiers in pending.items()]]
+                        for query, (arrived, pending) in self._pending.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, state, fields):
+        """Returns the evaluator whose state was returned by `to_dict`.
+
+        Parameters
+        ----------
+        state : dict
+            The state returned by `to_dict`.
+        fields : list of Field
+            The fields of the evaluator, with the same names and parameters.
+
+        Returns
+        -------
+        StreamingEvaluator
+        """
+        evaluator = cls(fields, k=state['k'], rbo_pairs=state['rbo_pairs'], identifier=state['identifier'],
+                        p=state['p'], sketch_size=state['sketch_size'])
+        evaluator.systems = list(state['systems'])
+        fields_by_name = {field.name: field for field in fields}
+        for field_name, aggregates in state['aggregates'].items():
+            field = fields_by_name[field_name]
+            aggregate_type = type(field.aggregate(evaluator.k, evaluator.sketch_size))
+            evaluator._aggregates[field_name] = {system: aggregate_type.from_dict(aggregate, field)
+                                                 for system, aggregate in aggregates}
+        evaluator._rbo = {pair: RBOAggregate.from_dict(aggregate)
+                          for pair, aggregate in zip(evaluator.rbo_pairs, state['rbo'])}
+        evaluator._pending = {query: (set(arrived), {system: list(identifiers) for system, identifiers in pending})
+                              for query, arrived, pending in state['pending']}
+        return evaluator
+
+    def snapshot(self, field_name):
+        """Returns the mean of each metric of a field over the ranked lists seen so far.
+
+        Parameters
+        ----------
+        field_name : str
+            The name of the field.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with index systems and column metrics.
+        """
+        aggregates = self._get_aggregates(field_name)
+        rows = {system: aggregate.means() for system, aggregate in aggregates.items()}
+        return pd.DataFrame.from_dict(rows, orient='index', dtype=float).reindex(list(aggregates))
+
+    def quantiles(self, field_name, metric, q=(0.5,)):
+        """Returns estimated quantiles of a metric over the ranked lists seen so far.
+
+        Parameters
+        ----------
+        field_name : str
+            The name of the field.
+        metric : str
+            The name of the metric.
+        q : list of float, default=(0.5,)
+            The quantiles, between 0 and 1 inclusive.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with index systems and column quantiles.
+        """
+        aggregates = self._get_aggregates(field_name)
+        rows = []
+        for aggregate in aggregates.values():
+            sketch = aggregate.sketches.get(metric)
+            rows.append(sketch.quantile(q) if sketch is not None else np.full(len(q), np.nan))
+        return pd.DataFrame(rows, index=list(aggregates), columns=list(q), dtype=float)
+
+    def counts(self):
+        """Returns the number of ranked lists seen so far for each system."""
+        aggregates = next(iter(self._aggregates.values()), {})
+        return pd.Series({system: aggregates[system].n_lists if system in aggregates else 0
+                          for system in self.systems}, dtype=int)
+
+    def rbo_snapshot(self):
+        """Returns the mean RBO of each pair of systems over the queries seen for both systems so far.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with MultiIndex (system, system) and columns [rbo_min, rbo_res, rbo_ext, count].
+            Queries where either system has no results are not counted.
+        """
+        rows = [aggregate.means() for aggregate in self._rbo.values()]
+        return pd.DataFrame(rows, index=pd.MultiIndex.from_tuples(self.rbo_pairs),
+                            columns=['rbo_min', 'rbo_res', 'rbo_ext', 'count'])
+
+    def _get_aggregates(self, field_name):
+        if field_name not in self._aggregates:
+            raise ValueError('Field is not in the evaluator.')
+        return self._aggregates[field_name]
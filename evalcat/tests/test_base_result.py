@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from evalcat.base_result import BaseResult
+from evalcat.columnar import ColumnarResult
+
+RESULTS = {
+    'system A': {'query 1': [{'id': 1}], 'query 2': [{'id': 2}, {'id': 3}]},
+    'system B': {'query 2': [{'id': 3}], 'query 1': []},
+}
+
+
+class TestBaseResult(unittest.TestCase):
+    def test_queries(self):
+        base_result = BaseResult(RESULTS)
+        self.assertEqual(base_result.queries, ['query 1', 'query 2'])
+        self.assertEqual(base_result.query_index, {'query 1': 0, 'query 2': 1})
+        # The ranked lists are shared with the input, and read in the order of the queries for every system.
+        self.assertIs(base_result['system A'], RESULTS['system A'])
+        np.testing.assert_array_equal(base_result.offsets, [0, 1, 3, 3, 4])
+        self.assertEqual(list(base_result.column('id')), [1, 2, 3, 3])
+
+        base_result = BaseResult(RESULTS, queries=['query 2', 'query 1'])
+        self.assertEqual(base_result.query_index, {'query 2': 0, 'query 1': 1})
+        np.testing.assert_array_equal(base_result.offsets, [0, 2, 3, 4, 4])
+
+        base_result.add_queries({'system A': {'query 3': []}, 'system B': {'query 3': [{'id': 4}]}})
+        self.assertEqual(base_result.query_index, {'query 2': 0, 'query 1': 1, 'query 3': 2})
+
+    def test_invalid_queries(self):
+        results = {**RESULTS, 'system C': {'query 1': [], 'query 3': [], 'query 4': []}}
+        with self.assertRaisesRegex(ValueError, r"system 'system C'.*1 missing \['query 2'\], "
+                                                r"2 unexpected \['query 3', 'query 4'\]"):
+            BaseResult(results)
+        with self.assertRaisesRegex(ValueError, r"\['query 1'\] are duplicated"):
+            BaseResult(RESULTS, queries=['query 1', 'query 2', 'query 1'])
+        with self.assertRaisesRegex(ValueError, r"\['query 2'\] are already"):
+            BaseResult(RESULTS).add_queries({'system A': {'query 2': []}, 'system B': {'query 2': []}})
+
+    def test_align(self):
+        results = {**RESULTS, 'system C': {'query 3': [{'id': 5}]}}
+        base_result = BaseResult(results, align=True)
+        self.assertEqual(base_result.queries, ['query 1', 'query 2', 'query 3'])
+        self.assertEqual(base_result['system A']['query 3'], [])
+        self.assertEqual(base_result['system C']['query 1'], [])
+        np.testing.assert_array_equal(base_result.offsets, [0, 1, 3, 3, 3, 4, 4, 4, 4, 5])
+        # The input is not modified.
+        self.assertNotIn('query 3', RESULTS['system A'])
+
+        base_result = BaseResult(results, queries=['query 3', 'query 1', 'query 2'], align=True)
+        self.assertEqual(base_result.queries, ['query 3', 'query 1', 'query 2'])
+        with self.assertRaisesRegex(ValueError, r"1 unexpected \['query 3'\]"):
+            BaseResult(results, queries=['query 1', 'query 2'], align=True)
+
+        columnar = ColumnarResult.from_results(results, fields=['id'], align=True)
+        np.testing.assert_array_equal(columnar.offsets, BaseResult(results, align=True).offsets)
@@ -0,0 +1,50 @@
+import json
+import os
+import tempfile
+import unittest
+
+from evalcat.benchmarks.bench_rbo import bench_rbo_batch, bench_rbo_depth
+from evalcat.benchmarks.bench_stages import STAGES, bench_stages, compare
+from evalcat.benchmarks.synthetic import synthetic_results
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_synthetic_results(self):
+        results = synthetic_results(n_systems=2, n_queries=5, depth=4, n_labels=3, none_rate=0, vary_depth=False)
+        self.assertEqual(list(results), ['system 0', 'system 1'])
+        self.assertEqual(list(results['system 0']), [f'query {query}' for query in range(5)])
+        items = [item for queries in results.values() for ranked_list in queries.values() for item in ranked_list]
+        self.assertEqual(len(items), 40)
+        self.assertLessEqual({item['label'] for item in items}, {'label 0', 'label 1', 'label 2'})
+        self.assertNotIn(None, [item['price'] for item in items])
+
+        # Systems return the same ranked lists when all items are shared, and distinct items when none are.
+        shared = synthetic_results(n_systems=2, n_queries=5, depth=4, overlap=1, vary_depth=False)
+        self.assertEqual(*[[[item['id'] for item in ranked_list] for ranked_list in queries.values()]
+                           for queries in shared.values()])
+        distinct = synthetic_results(n_systems=2, n_queries=5, depth=4, overlap=0)
+        ids = [{item['id'] for ranked_list in queries.values() for item in ranked_list}
+               for queries in distinct.values()]
+        self.assertFalse(ids[0] & ids[1])
+        self.assertEqual(synthetic_results(seed=1, n_queries=10), synthetic_results(seed=1, n_queries=10))
+
+    def test_bench_stages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'records.json')
+            scale = {'n_systems': 2, 'n_queries': 20, 'depth': 5}
+            records = bench_stages([scale], repeat=1, output=output, verbose=False)
+            self.assertEqual([record['stage'] for record in records], STAGES)
+            self.assertTrue(all(record['seconds'] >= 0 and record['peak_memory'] >= 0 for record in records))
+            with open(output) as f:
+                self.assertEqual(json.load(f)['records'], records)
+
+            comparison = compare(output, output, verbose=False)
+            self.assertEqual(len(comparison), len(STAGES))
+            self.assertTrue(all(record['ratio'] == 1 for record in comparison if record['baseline_seconds']))
+
+    def test_bench_rbo(self):
+        records = bench_rbo_depth(depths=[5, 20], number=1, quadratic_limit=5, verbose=False)
+        self.assertEqual([record['depth'] for record in records], [5, 20])
+        self.assertIsNone(records[1]['quadratic'])
+        records = bench_rbo_batch(n_queries=[3], depth=5, verbose=False)
+        self.assertEqual(records[0]['queries'], 3)
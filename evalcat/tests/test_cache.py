@@ -0,0 +1,175 @@
+import copy
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from evalcat.base_result import BaseResult
+from evalcat.cache import SummaryCache
+from evalcat.columnar import ColumnarResult
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.fields.relevance import RelevanceField
+from evalcat.result_list import ResultList
+from evalcat.tests.test_field import Result, random_results
+from evalcat.tests.test_result_list import MockField
+
+
+"""Mock functions for testing SummaryCache."""
+
+
+# MockField counting the ranked lists it computes.
+class CountingField(MockField):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def at_k(self, res, k=10):
+        self.calls += 1
+        return super().at_k(res, k)
+
+    def cache_key(self):
+        return 'CountingField'
+
+
+def value_results(results):
+    """Adds a `value` key to every item, for MockField."""
+    return {system: {query: [dict(item, value=item['numerical_field']) for item in query_row]
+                     for query, query_row in system_row.items()} for system, system_row in results.items()}
+
+
+"""Test Classes"""
+
+
+class TestSummaryCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        cache = SummaryCache(self.directory.name)
+        summary = pd.DataFrame({'mean': [1.0, 2.0]}, index=pd.MultiIndex.from_product([['system A'], ['q1', 'q2']]))
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', summary)
+        pd.testing.assert_frame_equal(cache.get('key'), summary)
+        self.assertGreater(cache.size(), 0)
+        cache.clear()
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.size(), 0)
+
+    def test_unreadable(self):
+        cache = SummaryCache(self.directory.name)
+        summary = pd.DataFrame({'mean': [1.0]})
+        cache.put('key', summary)
+        with open(cache._path('key'), 'r+b') as file:
+            file.truncate(10)
+        self.assertIsNone(cache.get('key'))
+        self.assertFalse(os.path.exists(cache._path('key')))
+
+        # A failed write leaves no temporary file behind.
+        with mock.patch.object(pd.DataFrame, 'to_pickle', side_effect=OSError):
+            with self.assertRaises(OSError):
+                cache.put('key', summary)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_lru_eviction(self):
+        summary = pd.DataFrame({'mean': range(100)}, dtype=float)
+        cache = SummaryCache(self.directory.name)
+        cache.put('size', summary)
+        cache.max_size = cache.size() * 2
+        cache.clear()
+
+        cache.put('a', summary)
+        cache.put('b', summary)
+        os.utime(cache._path('a'), ns=(0, 0))
+        os.utime(cache._path('b'), ns=(1, 1))
+        cache.get('a')
+        cache.put('c', summary)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_key(self):
+        fingerprint = BaseResult(random_results()).fingerprint('system 0')
+        key = SummaryCache.key(fingerprint, NumericalField('numerical_field'), 10)
+        self.assertEqual(key, SummaryCache.key(fingerprint, NumericalField('numerical_field'), 10))
+        self.assertNotEqual(key, SummaryCache.key(fingerprint, NumericalField('numerical_field'), [10]))
+        self.assertNotEqual(key, SummaryCache.key(fingerprint, NumericalField('numerical_field', [50]), 10))
+        self.assertNotEqual(key, SummaryCache.key(fingerprint, NumericalField('numerical_field', ignore_none=False),
+                                                  10))
+        self.assertNotEqual(key, SummaryCache.key(fingerprint, CategoricalField('numerical_field'), 10))
+        self.assertEqual(CategoricalField('field', labels=['a', 'b', 'c']).cache_key(),
+                         CategoricalField('field', labels=['c', 'b', 'a']).cache_key())
+
+    def test_relevance_key(self):
+        qrels = {'query 1': {'doc 1': 1, 'doc 2': 0}, 'query 2': {'doc 3': 2}}
+        field = RelevanceField('id', qrels)
+        key = field.cache_key()
+        self.assertEqual(key, RelevanceField('id', {'query 2': {'doc 3': 2},
+                                                    'query 1': {'doc 2': 0, 'doc 1': 1}}).cache_key())
+        self.assertNotEqual(key, RelevanceField('id', dict(qrels, **{'query 2': {'doc 3': 1}})).cache_key())
+        self.assertNotEqual(key, RelevanceField('id', qrels, relevance_level=2).cache_key())
+        # The qrels are only hashed again when they are replaced.
+        with mock.patch('evalcat.fields.relevance.hashlib.sha256', wraps=hashlib.sha256) as sha256:
+            self.assertEqual(field.cache_key(), key)
+            sha256.assert_not_called()
+            field.qrels = {'query 1': {'doc 1': 1}}
+            self.assertNotEqual(field.cache_key(), key)
+            sha256.assert_called_once()
+
+    def test_fingerprint(self):
+        results = random_results()
+        changed = copy.deepcopy(results)
+        changed['system 1']['query 3'].append(Result('a', 1))
+        for cls in [BaseResult, ColumnarResult.from_results]:
+            base_result, changed_result = cls(results), cls(changed)
+            self.assertEqual(base_result.fingerprint('system 0'), changed_result.fingerprint('system 0'))
+            self.assertNotEqual(base_result.fingerprint('system 1'), changed_result.fingerprint('system 1'))
+            self.assertNotEqual(base_result.fingerprint('system 0'), base_result.fingerprint('system 2'))
+
+    def test_result_list(self):
+        results = value_results(random_results(n_systems=3, n_queries=10))
+        n_lists = 3 * 10
+        fields = [CountingField(), NumericalField('numerical_field'), CategoricalField('categorical_field')]
+        expected = ResultList(results, fields, k=[3, 10]).summary
+
+        fields = [CountingField(), NumericalField('numerical_field'), CategoricalField('categorical_field')]
+        cached = ResultList(results, fields, k=[3, 10], cache=self.directory.name)
+        self.assertEqual(fields[0].calls, n_lists * 2)
+        for name, summary in expected.items():
+            pd.testing.assert_frame_equal(cached.summary[name], summary)
+
+        fields = [CountingField(), NumericalField('numerical_field'), CategoricalField('categorical_field')]
+        cached = ResultList(results, fields, k=[3, 10], cache=SummaryCache(self.directory.name))
+        self.assertEqual(fields[0].calls, 0)
+        for name, summary in expected.items():
+            pd.testing.assert_frame_equal(cached.summary[name], summary)
+
+        # Only the system whose results changed is computed again.
+        results['system 2']['query 0'].append({'categorical_field': 'a', 'numerical_field': 1, 'value': 1})
+        fields = [CountingField(), NumericalField('numerical_field')]
+        cached = ResultList(results, fields, k=[3, 10], cache=self.directory.name)
+        self.assertEqual(fields[0].calls, 10 * 2)
+        pd.testing.assert_frame_equal(cached.summary['numerical_field'],
+                                      ResultList(results, fields[1:], k=[3, 10]).summary['numerical_field'])
+
+    def test_renamed_system(self):
+        results = value_results(random_results(n_systems=1, n_queries=5))['system 0']
+        fields = [CountingField(), NumericalField('numerical_field')]
+        ResultList({'A': results}, fields, cache=self.directory.name)
+
+        # The summaries stored for A are read for B, and indexed by B.
+        for systems in [['B'], ['A', 'B']]:
+            fields = [CountingField(), NumericalField('numerical_field')]
+            cached = ResultList({system: results for system in systems}, fields, cache=self.directory.name)
+            self.assertEqual(fields[0].calls, 0)
+            expected = ResultList({system: results for system in systems}, fields).summary
+            for name, summary in expected.items():
+                pd.testing.assert_frame_equal(cached.summary[name], summary)
+        pd.testing.assert_frame_equal(cached.get_query_metric_df('numerical_field', 'B'),
+                                      cached.get_query_metric_df('numerical_field', 'A'))
@@ -0,0 +1,163 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from evalcat.base_result import BaseResult
+from evalcat.columnar import ColumnarResult
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.result_list import ResultList
+
+
+"""Mock functions for testing ColumnarResult."""
+
+
+# Defines a document (search result item) in our collection.
+class Result(dict):
+    def __init__(self, id_value, categorical_value, numerical_value):
+        super().__init__(id=id_value, categorical_field=categorical_value, numerical_field=numerical_value)
+
+
+# Input results.
+MOCK_RESULTS = {
+    'system A': {
+        'query 1': [Result(1, 'a', 5), Result(2, 'b', 2.5), Result(3, 'c', 1)],
+        'query 2': [Result(1, 'a', 1), Result(4, 'a', 3)],
+        'query 3': [Result(5, 'a', 5), Result(3, 'c', 2)],
+    }, 'system B': {
+        'query 1': [],
+        'query 2': [Result(2, None, 4), Result(1, 'a', 1)],
+        'query 3': [Result(3, 'b', 4), Result(1, None, None), Result(4, 'a', 2), Result(2, 'c', None)],
+    }
+}
+
+
+"""Test Classes"""
+
+
+class TestColumnarResult(unittest.TestCase):
+    def setUp(self):
+        self.columnar = ColumnarResult.from_results(MOCK_RESULTS)
+
+    def test_from_results(self):
+        self.assertEqual(self.columnar.systems, ['system A', 'system B'])
+        self.assertEqual(self.columnar.queries, ['query 1', 'query 2', 'query 3'])
+        np.testing.assert_array_equal(self.columnar.offsets, [0, 3, 5, 7, 7, 9, 13])
+        self.assertEqual(self.columnar.columns['id'].dtype, np.int64)
+        self.assertEqual(self.columnar.columns['numerical_field'].dtype, float)
+        self.assertIsInstance(self.columnar.columns['categorical_field'], pd.Categorical)
+        np.testing.assert_array_equal(self.columnar.offsets, BaseResult(MOCK_RESULTS).offsets)
+
+        only_id = ColumnarResult.from_results(MOCK_RESULTS, fields=['id'])
+        self.assertEqual(list(only_id.columns), ['id'])
+        with self.assertRaises(KeyError):
+            ColumnarResult.from_results(MOCK_RESULTS, fields=['wrong_field'])
+        with self.assertRaises(ValueError):
+            ColumnarResult(['system A'], ['query 1', 'query 2'], [0, 1], {})
+        with self.assertRaises(ValueError):
+            ColumnarResult(['system A'], ['query 1'], [0, 2], {'id': [1]})
+
+    def test_dict_access(self):
+        self.assertEqual(self.columnar.to_dict(), MOCK_RESULTS)
+        self.assertEqual(set(self.columnar.keys()), {'system A', 'system B'})
+        self.assertEqual(list(self.columnar['system B']), ['query 1', 'query 2', 'query 3'])
+        self.assertEqual(self.columnar['system B']['query 1'], [])
+        item = self.columnar['system B']['query 3'][1]
+        self.assertEqual(item['id'], 1)
+        self.assertIsNone(item['categorical_field'])
+        self.assertIsNone(item['numerical_field'])
+        with self.assertRaises(KeyError):
+            item['wrong_field']
+
+    def test_columns(self):
+        np.testing.assert_array_equal(self.columnar.numerical_column('numerical_field'),
+                                      BaseResult(MOCK_RESULTS).numerical_column('numerical_field'))
+        np.testing.assert_array_equal(self.columnar.numerical_column('id'), [1, 2, 3, 1, 4, 5, 3, 2, 1, 3, 1, 4, 2])
+        categories = self.columnar.categorical_column('categorical_field')
+        self.assertEqual(list(categories.categories), ['a', 'b', 'c'])
+        self.assertEqual(list(categories.codes), [0, 1, 2, 0, 0, 0, 2, -1, 0, 1, -1, 0, 2])
+
+    def test_result_list(self):
+        fields = [NumericalField('numerical_field'), CategoricalField('categorical_field')]
+        from_dict = ResultList(MOCK_RESULTS, fields)
+        from_columnar = ResultList(self.columnar, fields)
+        for field in ['numerical_field', 'categorical_field']:
+            pd.testing.assert_frame_equal(from_columnar.summary[field], from_dict.summary[field])
+        pd.testing.assert_frame_equal(from_columnar.rank_biased_overlap(), from_dict.rank_biased_overlap())
+
+    def test_save_open(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.columnar.save(directory)
+            self.assertEqual(set(os.listdir(directory)),
+                             {'metadata.json', 'offsets.npy', 'column_0.npy', 'column_1.npy', 'column_2.npy'})
+            opened = ColumnarResult.open(directory)
+            # Memory-mapped read-only, rather than read into memory.
+            self.assertFalse(opened.columns['numerical_field'].flags.writeable)
+            self.assertFalse(opened.columns['categorical_field'].codes.flags.writeable)
+            self.assertEqual(opened.to_dict(), MOCK_RESULTS)
+            self.assertEqual(list(opened.categorical_column('categorical_field').categories), ['a', 'b', 'c'])
+
+            fields = [NumericalField('numerical_field'), CategoricalField('categorical_field')]
+            expected = ResultList(MOCK_RESULTS, fields)
+            result_list = ResultList(opened, fields, chunk_size=2)
+            for field in ['numerical_field', 'categorical_field']:
+                pd.testing.assert_frame_equal(result_list.summary[field], expected.summary[field])
+            pd.testing.assert_frame_equal(result_list.rank_biased_overlap_matrix(),
+                                          expected.rank_biased_overlap_matrix())
+            pd.testing.assert_frame_equal(result_list.rank_biased_overlap(), expected.rank_biased_overlap())
+            # The integer identifiers are encoded one chunk at a time, without caching a column of all items.
+            self.assertNotIn(('id', 'categorical'), opened._columns)
+            del opened, result_list
+
+            in_memory = ColumnarResult.open(directory, mmap_mode=None)
+            self.assertTrue(in_memory.columns['id'].flags.writeable)
+            self.assertEqual(in_memory.to_dict(), MOCK_RESULTS)
+
+    def test_save_failure(self):
+        with tempfile.TemporaryDirectory() as parent:
+            directory = os.path.join(parent, 'results')
+            # NumPy scalars among the categories are saved as python objects.
+            categories = pd.Categorical.from_codes([0, 1, -1], categories=pd.Index([np.int64(3), 'x'], dtype=object))
+            ColumnarResult(['system A'], ['query 1'], [0, 3], {'value': categories}).save(directory)
+            self.assertEqual(list(ColumnarResult.open(directory).columns['value']), [3, 'x', np.nan])
+
+            # A failed save leaves the previous files, and no temporary directory.
+            with mock.patch('evalcat.columnar.np.save', side_effect=OSError):
+                with self.assertRaises(OSError):
+                    self.columnar.save(directory)
+            self.assertEqual(os.listdir(parent), ['results'])
+            self.assertEqual(list(ColumnarResult.open(directory).columns['value']), [3, 'x', np.nan])
+
+            self.columnar.save(directory)
+            self.assertEqual(os.listdir(parent), ['results'])
+            self.assertEqual(ColumnarResult.open(directory).to_dict(), MOCK_RESULTS)
+
+    def test_add_remove(self):
+        columnar = ColumnarResult.from_results({'system A': MOCK_RESULTS['system A']})
+        columnar.add_system('system B', MOCK_RESULTS['system B'])
+        self.assertEqual(columnar.to_dict(), MOCK_RESULTS)
+        self.assertEqual(list(columnar['system B']), ['query 1', 'query 2', 'query 3'])
+        # 'system A' has no missing values, so 'numerical_field' is only a float column once 'system B' is added.
+        self.assertEqual(columnar.columns['numerical_field'].dtype, float)
+        np.testing.assert_array_equal(columnar.offsets, self.columnar.offsets)
+
+        columnar = ColumnarResult.from_results({system: {'query 2': system_row['query 2']}
+                                                for system, system_row in MOCK_RESULTS.items()})
+        columnar.add_queries({system: {query: system_row[query] for query in ['query 3', 'query 1']}
+                              for system, system_row in MOCK_RESULTS.items()})
+        self.assertEqual(columnar.queries, ['query 2', 'query 3', 'query 1'])
+        self.assertEqual(columnar.to_dict(), MOCK_RESULTS)
+        self.assertEqual(columnar['system B']['query 3'][2], {'id': 4, 'categorical_field': 'a', 'numerical_field': 2})
+
+        columnar.add_system('system C', {'query 1': [{'id': 'x', 'categorical_field': 'd', 'numerical_field': 1}],
+                                         'query 2': [], 'query 3': []})
+        self.assertIsInstance(columnar.columns['id'], pd.Categorical)
+        self.assertEqual(list(columnar.columns['categorical_field'].categories), ['a', 'c', 'b', 'd'])
+        columnar.remove_system('system C')
+        self.assertEqual(columnar.to_dict(), MOCK_RESULTS)
+        with self.assertRaises(ValueError):
+            columnar.remove_system('system C')
@@ -1,10 +1,16 @@
+import random
 import unittest
 
+import numpy as np
 import pandas as pd
 
 from evalcat.base_result import BaseResult
+from evalcat.columnar import ColumnarResult
+from evalcat.fields.base import Field, segment_ranks, summary_index
 from evalcat.fields.categorical import CategoricalField
-from evalcat.fields.numerical import NumericalField
+from evalcat.fields.numerical import NumericalField, percentile, segment_percentiles
+from evalcat.fields.relevance import RelevanceField
+from evalcat.result_list import ResultList
 
 
 """Mock functions for testing ResultList."""
@@ -84,9 +90,131 @@ NUMERICAL_RESULTS_2 = {
 }
 
 
+def random_results(n_systems=3, n_queries=20, max_depth=15, none_rate=0.2, labels='abcdef', seed=0):
+    rng = random.Random(seed)
+
+    def value(values):
+        return None if rng.random() < none_rate else rng.choice(values)
+    return {
+        f'system {s}': {
+            f'query {q}': [Result(value(labels), value([1, 2.5, 3, 7, 10.25, 0]))
+                           for _ in range(rng.randint(0, max_depth))]
+            for q in range(n_queries)
+        } for s in range(n_systems)
+    }
+
+
+def at_k_frame(field, base_result, k):
+    """Computes the summary of a field by calling `at_k` on each search result list."""
+    field.process_base_result(base_result)
+    return pd.DataFrame([field.at_k(base_result[system][query], k=k)
+                         for system in base_result.systems for query in base_result.queries],
+                        index=pd.MultiIndex.from_product([base_result.systems, base_result.queries]), dtype=float)
+
+
+def assert_multi_k_matches(test_case, field, base_result, cutoffs):
+    """Checks that computing a list of cutoffs gives the same metrics as computing each cutoff separately."""
+    multi_k = field.compute_metrics(base_result, k=cutoffs)
+    test_case.assertEqual(multi_k.index.nlevels, 3)
+    test_case.assertEqual(len(multi_k), len(base_result.systems) * len(base_result.queries) * len(cutoffs))
+    for cutoff in cutoffs:
+        pd.testing.assert_frame_equal(multi_k.xs(cutoff, level=2), field.compute_metrics(base_result, k=cutoff))
+
+
+# Field counting the non-None values of a field, with a per-list `at_k` and a vectorized `at_k_batch`.
+class CountField(Field):
+    def at_k(self, result_list, k=None):
+        values = [item[self.name] for item in result_list[:k or None] if item[self.name] is not None]
+        return {'count': len(values), 'first': values[0] if values else None}
+
+
+class BatchCountField(CountField):
+    def batch_columns(self):
+        return {self.name: 'numerical'}
+
+    def at_k_batch(self, columns, offsets, k):
+        segments, ranks = segment_ranks(offsets)
+        valid = ~np.isnan(columns[self.name]) & ((ranks < k) if k else True)
+        counts = np.bincount(segments[valid], minlength=len(offsets) - 1)
+        first = np.full(len(offsets) - 1, np.nan)
+        first[segments[valid][::-1]] = columns[self.name][valid][::-1]
+        return np.column_stack([counts, first]), ['count', 'first']
+
+
 """Test Classes"""
 
 
+class TestField(unittest.TestCase):
+    def test_compute_metrics(self):
+        base_result = BaseResult(random_results())
+        summary = CountField('numerical_field').compute_metrics(base_result, k=3)
+        self.assertEqual(list(summary.dtypes), [np.float64, np.float64])
+        pd.testing.assert_frame_equal(summary, at_k_frame(CountField('numerical_field'), base_result, 3))
+
+        # Metrics that are not numbers are kept as objects.
+        class LabelField(CountField):
+            def at_k(self, result_list, k=None):
+                return {'count': len(result_list[:k]), 'label': result_list[0][self.name] if result_list else None}
+        summary = LabelField('categorical_field').compute_metrics(base_result, k=3)
+        # Numbers are float, whether or not other metrics are numbers.
+        self.assertEqual(summary['count'].dtype, np.float64)
+        labels = [ranked_list[0]['categorical_field'] if ranked_list else None
+                  for system in base_result.systems for ranked_list in base_result[system].values()]
+        self.assertEqual([label if not pd.isna(label) else None for label in summary['label']], labels)
+
+        # Strings that look like numbers are not converted.
+        class ZipCodeField(CountField):
+            def at_k(self, result_list, k=None):
+                return {'zip_code': '02139', 'count': len(result_list[:k])}
+        summary = ZipCodeField('categorical_field').compute_metrics(base_result, k=3)
+        self.assertTrue((summary['zip_code'] == '02139').all())
+        self.assertEqual(summary['count'].dtype, np.float64)
+
+        # Rows without some metrics are NaN for them, as for a DataFrame of the dicts of `at_k`.
+        class RaggedField(CountField):
+            def at_k(self, result_list, k=None):
+                metrics = {'count': len(result_list[:k])}
+                if len(result_list) % 2:
+                    metrics['odd'] = 1
+                return metrics if result_list else {}
+        for k in [3, [3, 5]]:
+            summary = RaggedField('categorical_field').compute_metrics(base_result, k=k)
+            expected = pd.DataFrame([RaggedField('categorical_field').at_k(base_result[system][query], k=cutoff)
+                                     for system in base_result.systems for query in base_result.queries
+                                     for cutoff in (k if isinstance(k, list) else [k])],
+                                    index=summary.index, dtype=float)
+            pd.testing.assert_frame_equal(summary, expected)
+
+    def test_at_k_batch(self):
+        base_result = BaseResult(random_results())
+        for k in [None, 1, 4]:
+            pd.testing.assert_frame_equal(BatchCountField('numerical_field').compute_metrics(base_result, k=k),
+                                          CountField('numerical_field').compute_metrics(base_result, k=k),
+                                          check_dtype=False)
+        assert_multi_k_matches(self, BatchCountField('numerical_field'), base_result, [1, 3, None])
+        self.assertEqual(len(BatchCountField('numerical_field').compute_metrics(BaseResult({}), k=10)), 0)
+
+        # A subclass overriding `at_k` is computed with it, unless it also defines `at_k_batch`.
+        class MaxField(NumericalField):
+            def at_k(self, result_list, k=None):
+                values = [item[self.name] for item in result_list[:k] if item[self.name] is not None]
+                return {'max': max(values, default=None)}
+        summary = MaxField('numerical_field').compute_metrics(base_result, k=4)
+        self.assertEqual(list(summary.columns), ['max'])
+        pd.testing.assert_frame_equal(summary, at_k_frame(MaxField('numerical_field'), base_result, 4))
+
+        values, labels = NumericalField('numerical_field').at_k_batch(
+            {'numerical_field': base_result.numerical_column('numerical_field')}, base_result.offsets, 5)
+        pd.testing.assert_frame_equal(pd.DataFrame(values, index=summary_index(base_result), columns=labels),
+                                      NumericalField('numerical_field').compute_metrics(base_result, k=5))
+        field = CategoricalField('categorical_field')
+        field.process_base_result(base_result)
+        values, labels = field.at_k_batch({'categorical_field': base_result.categorical_column('categorical_field')},
+                                          base_result.offsets, 5)
+        pd.testing.assert_frame_equal(pd.DataFrame(values, index=summary_index(base_result), columns=labels),
+                                      field.compute_metrics(base_result, k=5))
+
+
 class TestCategoricalField(unittest.TestCase):
     def test_get_labels(self):
         field = CategoricalField('categorical_field')
@@ -178,6 +306,35 @@ class TestCategoricalField(unittest.TestCase):
             )
         )
 
+    def test_compute_metrics_multi_k(self):
+        base_result = BaseResult(random_results())
+        assert_multi_k_matches(self, CategoricalField('categorical_field'), base_result, [1, 3, 5, 10, None])
+        assert_multi_k_matches(self, CategoricalField('categorical_field', ignore_none=False), base_result, [10, 2])
+
+    def test_compute_metrics_matches_at_k(self):
+        results = random_results()
+        # `at_k` cannot normalize a non-empty list where all labels are ignored.
+        for query_rows in results.values():
+            for query_row in query_rows.values():
+                if query_row:
+                    query_row[0]['categorical_field'] = 'a'
+        base_result = BaseResult(results)
+        for labels, ignore_none in [(None, True), (None, False), (['a', 'b', 'z'], True), (['a', 'b', None], False),
+                                    (['a', 'b'], False)]:
+            for k in [None, 1, 4, 100]:
+                field = CategoricalField('categorical_field', labels=labels, ignore_none=ignore_none)
+                pd.testing.assert_frame_equal(field.compute_metrics(base_result, k=k),
+                                              at_k_frame(field, base_result, k))
+
+    def test_other_labels(self):
+        # Labels that are not in `labels` are counted as None if `ignore_none` is False, even if None is not given.
+        field = CategoricalField('categorical_field', labels=['a', 'b'], ignore_none=False)
+        self.assertEqual(field.labels, {'a', 'b', None})
+        items = [{'categorical_field': label} for label in ['a', 'c', None, 'b']]
+        self.assertEqual(field.at_k(items), {'a': 0.25, 'b': 0.25, None: 0.5, 'unique_count': 3})
+        summary = field.compute_metrics(BaseResult({'system': {'query': items}}), k=10)
+        self.assertEqual(summary.loc[('system', 'query'), None], 0.5)
+
 
 class TestNumericalField(unittest.TestCase):
     def test_at_k(self):
@@ -246,3 +403,101 @@ class TestNumericalField(unittest.TestCase):
                 columns=['25-percentile', '50-percentile', '75-percentile', 'total', 'mean']
             ).sort_index(axis=1)
         )
+
+    def test_compute_metrics_matches_at_k(self):
+        base_result = BaseResult(random_results())
+        for ignore_none in [True, False]:
+            for k in [None, 1, 4, 100]:
+                field = NumericalField('numerical_field', percentiles=[0, 10, 33.3, 50, 100], ignore_none=ignore_none)
+                pd.testing.assert_frame_equal(field.compute_metrics(base_result, k=k),
+                                              at_k_frame(field, base_result, k))
+
+    def test_compute_metrics_multi_k(self):
+        base_result = BaseResult(random_results())
+        assert_multi_k_matches(self, NumericalField('numerical_field'), base_result, [1, 3, 5, 10, None])
+        assert_multi_k_matches(self, NumericalField('numerical_field', ignore_none=False), base_result, [10, 2])
+
+    def test_compute_metrics_subset(self):
+        base_result = BaseResult(random_results())
+        field = NumericalField('numerical_field')
+        full = field.compute_metrics(base_result, k=5)
+        for metrics in [['mean'], ['total', '25-percentile'], ['99-percentile', 'wrong_metric']]:
+            subset = field.compute_metrics(base_result, k=5, metrics=metrics)
+            pd.testing.assert_frame_equal(subset, full.loc[:, [metric for metric in full.columns if metric in metrics]])
+
+    def test_segment_percentiles(self):
+        arrays = [[1, 2, 3], [], [5.5], [0, 0, 1, 4, 9]]
+        output = segment_percentiles(np.array([v for arr in arrays for v in arr], dtype=float),
+                                     np.array([len(arr) for arr in arrays]), [1, 50, 99])
+        self.assertTrue(np.isnan(output[1]).all())
+        for row, arr in zip(output, arrays):
+            if arr:
+                np.testing.assert_array_equal(row, percentile(arr, [1, 50, 99]))
+
+
+class TestRelevanceField(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.results = {f'system {s}': {f'query {q}': [{'id': f'doc {rng.randint(0, 30)}'}
+                                                       for _ in range(rng.randint(0, 12))]
+                                        for q in range(15)} for s in range(3)}
+        self.qrels = {f'query {q}': {f'doc {d}': rng.choice([0, 0, 1, 2, 3]) for d in rng.sample(range(40), 10)}
+                      for q in range(13)}
+        # Query 13 has no relevant documents and query 14 has no judgments.
+        self.qrels['query 13'] = {'doc 1': 0}
+
+    def test_at_k(self):
+        field = RelevanceField('id', {'query 1': {'doc 1': 2, 'doc 2': 0, 'doc 3': 1, 'doc 4': 1}})
+        result_list = [{'id': 'doc 2'}, {'id': 'doc 1'}, {'id': 'doc 5'}, {'id': 'doc 3'}]
+        metrics = field.at_k(result_list, k=3, query='query 1')
+        self.assertAlmostEqual(metrics['ndcg'], (2 / np.log2(3)) / (2 + 1 / np.log2(3) + 1 / 2))
+        self.assertAlmostEqual(metrics['ap'], (1 / 2) / 3)
+        self.assertEqual(metrics['rr'], 1 / 2)
+        self.assertEqual(metrics['precision'], 1 / 3)
+        self.assertEqual(metrics['recall'], 1 / 3)
+        metrics = field.at_k(result_list, query='query 1')
+        self.assertAlmostEqual(metrics['ap'], (1 / 2 + 2 / 4) / 3)
+        self.assertEqual(metrics['precision'], 2 / 4)
+        self.assertEqual(field.at_k(result_list, k=3, query='query 2'),
+                         {metric: None for metric in RelevanceField.METRICS})
+        with self.assertRaises(ValueError):
+            field.at_k(result_list, k=3)
+        with self.assertRaises(ValueError):
+            RelevanceField('id', {}, gain='wrong_gain')
+
+    def test_compute_metrics_matches_at_k(self):
+        for field in [RelevanceField('id', self.qrels), RelevanceField('id', self.qrels, 2, gain='exponential')]:
+            for base_result in [BaseResult(self.results), ColumnarResult.from_results(self.results)]:
+                for k in [None, 1, 3, 10, 100]:
+                    expected = pd.DataFrame([field.at_k(base_result[system][query], k=k, query=query)
+                                             for system in base_result.systems for query in base_result.queries],
+                                            index=summary_index(base_result), dtype=float)
+                    pd.testing.assert_frame_equal(field.compute_metrics(base_result, k=k), expected)
+        summary = RelevanceField('id', self.qrels).compute_metrics(BaseResult(self.results), k=10)
+        self.assertTrue(summary.xs('query 13', level=1).isna().all().all())
+        self.assertTrue(summary.xs('query 14', level=1).isna().all().all())
+
+    def test_compute_metrics_multi_k(self):
+        base_result = BaseResult(self.results)
+        assert_multi_k_matches(self, RelevanceField('id', self.qrels), base_result, [1, 3, 5, 10, None])
+        assert_multi_k_matches(self, RelevanceField('id', self.qrels, gain='exponential'), base_result, [10, 2])
+
+    def test_empty_ranked_lists(self):
+        field = RelevanceField('id', {'query 1': {'doc 1': 1, 'doc 3': 2}, 'query 2': {'doc 2': 1}})
+        # The last ranked list is empty, and then all of them.
+        for results in [{'A': {'query 1': [{'id': 'doc 1'}], 'query 2': [{'id': 'doc 2'}]},
+                         'B': {'query 1': [{'id': 'doc 3'}, {'id': 'doc 1'}], 'query 2': []}},
+                        {'A': {'query 1': [], 'query 2': []}}]:
+            base_result = BaseResult(results)
+            for k in [None, 1, 10]:
+                expected = pd.DataFrame([field.at_k(base_result[system][query], k=k, query=query)
+                                         for system in base_result.systems for query in base_result.queries],
+                                        index=summary_index(base_result), dtype=float)
+                pd.testing.assert_frame_equal(field.compute_metrics(base_result, k=k), expected)
+            assert_multi_k_matches(self, field, base_result, [1, 10, None])
+
+    def test_result_list(self):
+        result_list = ResultList(self.results, [RelevanceField('id', self.qrels)], k=5)
+        summary = result_list.summary['id']
+        self.assertEqual(list(summary.columns), ['ndcg', 'ap', 'rr', 'precision', 'recall'])
+        self.assertTrue(((summary.dropna() >= 0) & (summary.dropna() <= 1)).all().all())
@@ -0,0 +1,159 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from evalcat.base_result import BaseResult
+from evalcat.columnar import ColumnarResult
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.io import _ColumnBuilder, read_jsonl, read_parquet, read_summary, write_summary
+from evalcat.result_list import ResultList
+from evalcat.tests.test_columnar import MOCK_RESULTS
+
+
+"""Mock functions for testing the readers."""
+
+
+def to_jsonl(results, order=None):
+    """Returns the lines of a JSON Lines file with one ranked list per line, in the order of `order` if given."""
+    keys = order or [(system, query) for system, system_row in results.items() for query in system_row]
+    return [json.dumps({'system': system, 'query': query, 'results': results[system][query]}) + '\n'
+            for system, query in keys]
+
+
+def assert_columnar_equal(columnar, expected):
+    assert columnar.systems == expected.systems and columnar.queries == expected.queries
+    np.testing.assert_array_equal(columnar.offsets, expected.offsets)
+    assert list(columnar.columns) == list(expected.columns)
+    for name, values in expected.columns.items():
+        if isinstance(values, pd.Categorical):
+            assert list(columnar.columns[name].categories) == list(values.categories)
+            np.testing.assert_array_equal(columnar.columns[name].codes, values.codes)
+        else:
+            np.testing.assert_array_equal(columnar.columns[name], values)
+            assert columnar.columns[name].dtype == values.dtype
+
+
+"""Test Classes"""
+
+
+class TestReadJsonl(unittest.TestCase):
+    def test_read_jsonl(self):
+        expected = ColumnarResult.from_results(MOCK_RESULTS)
+        assert_columnar_equal(read_jsonl(to_jsonl(MOCK_RESULTS)), expected)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.jsonl')
+            with open(path, 'w') as file:
+                file.writelines(to_jsonl(MOCK_RESULTS))
+                file.write('\n')
+            columnar = BaseResult.from_jsonl(path, fields=['id', NumericalField('numerical_field')])
+        assert_columnar_equal(columnar, ColumnarResult.from_results(MOCK_RESULTS, fields=['id', 'numerical_field']))
+        self.assertEqual(columnar.to_dict()['system B']['query 3'][1], {'id': 1, 'numerical_field': None})
+
+    def test_line_order(self):
+        order = [('system B', 'query 3'), ('system A', 'query 2'), ('system B', 'query 1'),
+                 ('system A', 'query 1'), ('system B', 'query 2'), ('system A', 'query 3')]
+        columnar = read_jsonl(io.StringIO(''.join(to_jsonl(MOCK_RESULTS, order))),
+                              queries=['query 1', 'query 2', 'query 3'])
+        self.assertEqual(columnar.systems, ['system B', 'system A'])
+        self.assertEqual(columnar.to_dict(), {system: MOCK_RESULTS[system] for system in columnar.systems})
+
+        fields = [NumericalField('numerical_field'), CategoricalField('categorical_field')]
+        summary = ResultList(columnar, fields).summary
+        expected = ResultList(MOCK_RESULTS, fields).summary
+        for field in fields:
+            pd.testing.assert_frame_equal(summary[field.name].sort_index(), expected[field.name].sort_index())
+
+    def test_invalid(self):
+        lines = to_jsonl(MOCK_RESULTS)
+        with self.assertRaises(ValueError):
+            read_jsonl(lines + lines[:1])
+        with self.assertRaisesRegex(ValueError, "system 'system B'.*1 missing"):
+            read_jsonl(lines[:-1])
+        self.assertEqual(read_jsonl([]).systems, [])
+
+
+@unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+class TestParquet(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results.parquet')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        BaseResult(MOCK_RESULTS).to_parquet(self.path)
+        columnar = BaseResult.from_parquet(self.path)
+        # Empty ranked lists have no rows, so they are read back as empty ranked lists.
+        assert_columnar_equal(columnar, ColumnarResult.from_results(MOCK_RESULTS))
+
+        columnar.to_parquet(self.path, fields=['categorical_field'], compression='zstd')
+        assert_columnar_equal(read_parquet(self.path),
+                              ColumnarResult.from_results(MOCK_RESULTS, fields=['categorical_field']))
+
+    def test_projection_and_filters(self):
+        BaseResult(MOCK_RESULTS).to_parquet(self.path)
+        columnar = read_parquet(self.path, fields=[NumericalField('numerical_field')], systems=['system B'],
+                                queries=['query 3', 'query 1'])
+        self.assertEqual(columnar.to_dict(), {'system B': {
+            'query 3': [{'numerical_field': value['numerical_field']} for value in MOCK_RESULTS['system B']['query 3']],
+            'query 1': [],
+        }})
+
+    def test_unsorted_rows(self):
+        table = pyarrow.table({
+            'query': ['query 2', 'query 1', 'query 2', 'query 1', 'query 1'],
+            'system': ['system A', 'system B', 'system A', 'system A', 'system A'],
+            'rank': [2, 1, 1, 2, 1],
+            'id': [4, 7, 3, None, 1],
+        })
+        pyarrow.parquet.write_table(table, self.path)
+        columnar = read_parquet(self.path)
+        self.assertEqual(columnar.systems, ['system A', 'system B'])
+        self.assertEqual(columnar.queries, ['query 2', 'query 1'])
+        self.assertEqual(columnar.to_dict(), {
+            'system A': {'query 2': [{'id': 3}, {'id': 4}], 'query 1': [{'id': 1}, {'id': None}]},
+            'system B': {'query 2': [], 'query 1': [{'id': 7}]},
+        })
+        self.assertEqual(columnar.columns['id'].dtype, float)
+
+    def test_summary(self):
+        fields = [NumericalField('numerical_field'), CategoricalField('categorical_field', ignore_none=False)]
+        for k in [3, [1, 3]]:
+            for summary in ResultList(MOCK_RESULTS, fields, k=k).summary.values():
+                write_summary(summary, self.path)
+                pd.testing.assert_frame_equal(read_summary(self.path), summary)
+
+
+class TestColumnBuilder(unittest.TestCase):
+    def test_kinds(self):
+        for values in [[1, 2, 3], [1, None, 2.5], [1, 'a', None, 2.0, float('nan')], [True, False], [None], [],
+                       [1, True, 'a', 1.0, False, 0], [True, 1, 'a', None, 0.0]]:
+            builder = _ColumnBuilder()
+            for value in values:
+                builder.append(value)
+            column = builder.finish()
+            expected = ColumnarResult.from_results({'system': {'query': [{'value': value} for value in values]}},
+                                                   fields=['value']).columns['value']
+            self.assertEqual(type(column), type(expected))
+            if isinstance(expected, pd.Categorical):
+                self.assertEqual([(type(value), value) for value in column.categories],
+                                 [(type(value), value) for value in expected.categories])
+                np.testing.assert_array_equal(column.codes, expected.codes)
+            else:
+                self.assertEqual(column.dtype, expected.dtype)
+                np.testing.assert_array_equal(column, expected)
+
@@ -0,0 +1,67 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from evalcat.base_result import BaseResult
+from evalcat.columnar import ColumnarResult
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.parallel import SharedResult, _chunks
+from evalcat.result_list import ResultList
+from evalcat.tests.test_field import random_results
+from evalcat.tests.test_result_list import MOCK_RESULTS, MockField
+
+
+def make_fields():
+    return [NumericalField('numerical_field'), CategoricalField('categorical_field')]
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.results = random_results(n_systems=3, n_queries=25)
+        self.expected = ResultList(self.results, make_fields(), k=[3, 10]).summary
+
+    def assert_summary_equal(self, summary):
+        self.assertEqual(summary.keys(), self.expected.keys())
+        for name, frame in summary.items():
+            pd.testing.assert_frame_equal(frame, self.expected[name])
+
+    def test_chunks(self):
+        base_result = BaseResult(self.results)
+        self.assertEqual(_chunks(base_result, 2), [(['system 0', 'system 1'], None), (['system 2'], None)])
+        chunks = _chunks(base_result, 8)
+        self.assertEqual(len(chunks), 9)
+        self.assertEqual([query for system, queries in chunks[:3] for query in queries], base_result.queries)
+
+    def test_thread(self):
+        self.assert_summary_equal(ResultList(self.results, make_fields(), k=[3, 10], n_jobs=4,
+                                             executor='thread').summary)
+
+    def test_no_queries(self):
+        results = {'system 0': {}, 'system 1': {}}
+        expected = ResultList(results, make_fields()).summary
+        for executor in ['thread', 'process']:
+            summary = ResultList(results, make_fields(), n_jobs=2, executor=executor).summary
+            for name, frame in summary.items():
+                pd.testing.assert_frame_equal(frame, expected[name])
+
+    def test_process(self):
+        self.assert_summary_equal(ResultList(self.results, make_fields(), k=[3, 10], n_jobs=2).summary)
+        columnar = ColumnarResult.from_results(self.results)
+        self.assert_summary_equal(ResultList(columnar, make_fields(), k=[3, 10], n_jobs=2).summary)
+
+    def test_executor(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            summary = ResultList(MOCK_RESULTS, [MockField()], executor=executor).summary
+        pd.testing.assert_frame_equal(summary['mock'], ResultList(MOCK_RESULTS, [MockField()]).summary['mock'])
+        with self.assertRaises(ValueError):
+            ResultList(MOCK_RESULTS, [MockField()], n_jobs=2, executor='cluster')
+
+    def test_shared_result(self):
+        columnar = ColumnarResult.from_results(self.results)
+        with SharedResult(columnar) as shared:
+            attached, blocks = SharedResult.attach(shared.spec)
+            self.assertEqual(attached.to_dict(), columnar.to_dict())
+            for block in blocks:
+                block.close()
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from evalcat.profiling import Profiler, stage
+
+
+class TestProfiler(unittest.TestCase):
+    def test_inactive(self):
+        with stage('outside'):
+            pass
+        profiler = Profiler()
+        with stage('outside'):
+            pass
+        self.assertEqual(profiler.records, [])
+        self.assertEqual(len(profiler.report()), 0)
+
+    def test_report(self):
+        records = []
+        profiler = Profiler(callbacks=[records.append])
+        with profiler.activate():
+            for system in ['A', 'B']:
+                with stage('metrics', 'field', system, calls=5):
+                    pass
+            with stage('dataframe', 'field'):
+                pass
+        self.assertEqual(records, profiler.records)
+        self.assertEqual([record['system'] for record in records], [None, None, None])
+
+        report = profiler.report()
+        self.assertEqual(list(report.index), [('field', 'metrics'), ('field', 'dataframe')])
+        self.assertEqual(list(report['calls']), [10, 1])
+        self.assertAlmostEqual(report.loc[('field', 'metrics'), 'seconds'],
+                               records[0]['seconds'] + records[1]['seconds'])
+
+        profiler.reset()
+        self.assertEqual(len(profiler.report()), 0)
+
+    def test_memory(self):
+        profiler = Profiler(memory=True)
+        with profiler.activate():
+            with stage('outer'):
+                with stage('inner'):
+                    inner = np.ones(1 << 20)
+                del inner
+                outer = np.ones(1 << 18)
+        del outer
+        inner, outer = profiler.records
+        self.assertGreaterEqual(inner['peak_memory'], 8 << 20)
+        # The peak of a stage includes the peaks of the stages it contains.
+        self.assertGreaterEqual(outer['peak_memory'], inner['peak_memory'])
+        self.assertLess(outer['peak_memory'], (8 << 20) + (4 << 20))
@@ -0,0 +1,99 @@
+import math
+import random
+import unittest
+
+import numpy as np
+
+from evalcat.rbo import cumulative_overlap, first_ranks, overlap, rbo, rbo_ext, rbo_from_first_ranks, rbo_min, rbo_res
+
+
+"""Reference implementation: the original RBO, recomputing the overlap at every depth."""
+
+
+def reference_overlap(S, T, d):
+    return len(set(S[:d]) & set(T[:d]))
+
+
+def reference_rbo_min(S, T, p):
+    k = min(len(S), len(T))
+    xk = reference_overlap(S, T, k)
+    sum1 = sum((reference_overlap(S, T, d) - xk) * p ** d / d for d in range(1, k + 1))
+    return (1 - p) / p * (sum1 - xk * math.log(1 - p))
+
+
+def reference_rbo_res(S, T, p):
+    if len(S) > len(T):
+        L, S = S, T
+    else:
+        L, S = T, S
+    l, s = len(L), len(S)
+    xl = reference_overlap(L, S, l)
+    f = l + s - xl
+    sum1 = sum(p ** d / d for d in range(s + 1, f + 1))
+    sum2 = sum(p ** d / d for d in range(l + 1, f + 1))
+    sum3 = sum(p ** d / d for d in range(1, f + 1))
+    return p ** s + p ** l - p ** f - ((1 - p) / p * (s * sum1 + l * sum2 + xl * (math.log(1 / (1 - p)) - sum3)))
+
+
+def reference_rbo_ext(S, T, p):
+    if len(S) > len(T):
+        L, S = S, T
+    else:
+        L, S = T, S
+    l, s = len(L), len(S)
+    xl = reference_overlap(L, S, l)
+    xs = reference_overlap(L, S, s)
+    sum1 = sum(reference_overlap(L, S, d) / d * p ** d for d in range(1, l + 1))
+    sum2 = sum(xs * (d - s) / (s * d) * p ** d for d in range(s + 1, l + 1))
+    return (1 - p) / p * (sum1 + sum2) + ((xl - xs) / l + xs / s) * p ** l
+
+
+def reference_rbo(S, T, p):
+    return reference_rbo_min(S, T, p), reference_rbo_res(S, T, p), reference_rbo_ext(S, T, p)
+
+
+"""Test Classes"""
+
+
+class TestRBO(unittest.TestCase):
+    def test_cumulative_overlap(self):
+        S, T = [1, 2, 3, 4], [3, 2, 5]
+        self.assertEqual(cumulative_overlap(S, T), [overlap(S, T, d) for d in range(1, 5)])
+        # Duplicated items only count once, as with sets.
+        S, T = [1, 1, 2, 2], [2, 1, 1, 3]
+        self.assertEqual(cumulative_overlap(S, T), [overlap(S, T, d) for d in range(1, 5)])
+        self.assertEqual(cumulative_overlap(S, T, 2), [0, 1])
+        self.assertEqual(cumulative_overlap([], []), [])
+
+    def test_matches_quadratic_reference(self):
+        rng = random.Random(42)
+        for _ in range(50):
+            S = [rng.randrange(30) for _ in range(rng.randint(1, 25))]
+            T = [rng.randrange(30) for _ in range(rng.randint(1, 25))]
+            for p in [0.5, 0.9, 0.98]:
+                expected = reference_rbo(S, T, p)
+                for value, reference in zip(rbo(S, T, p), expected):
+                    self.assertAlmostEqual(value, reference, places=12)
+                self.assertAlmostEqual(rbo_min(S, T, p), expected[0], places=12)
+                self.assertAlmostEqual(rbo_res(S, T, p), expected[1], places=12)
+                self.assertAlmostEqual(rbo_ext(S, T, p), expected[2], places=12)
+
+    def test_rbo_min_depth(self):
+        S, T = [1, 2, 3, 4], [2, 1, 4, 3]
+        self.assertAlmostEqual(rbo_min(S, T, 0.9, k=2), rbo_min(S[:2], T[:2], 0.9), places=12)
+
+    def test_rbo_from_first_ranks(self):
+        rng = random.Random(7)
+        S = [[rng.randrange(40) for _ in range(rng.randint(0, 30))] for _ in range(200)]
+        T = [[rng.randrange(40) for _ in range(rng.randint(0, 30))] for _ in range(200)]
+        S[0], T[1] = [], []
+        lengths_s, lengths_t = np.array([len(s) for s in S]), np.array([len(t) for t in T])
+        codes_s, codes_t = np.concatenate(S).astype(np.int64), np.concatenate(T).astype(np.int64)
+        rbos = rbo_from_first_ranks(first_ranks(codes_s, lengths_s, 40), first_ranks(codes_t, lengths_t, 40),
+                                    lengths_s, lengths_t, 40, 0.9)
+        self.assertEqual(rbos.shape, (200, 3))
+        for row, s, t in zip(rbos, S, T):
+            if not s or not t:
+                self.assertTrue(np.isnan(row).all())
+            else:
+                np.testing.assert_allclose(row, rbo(s, t, 0.9), rtol=1e-10, atol=1e-12)
@@ -1,9 +1,15 @@
 import unittest
+from unittest import mock
 
 import pandas as pd
 
-from evalcat.result_list import ResultList
+from evalcat.base_result import BaseResult
+from evalcat.profiling import Profiler
+from evalcat.result_list import LazySummary, ResultList
 from evalcat.fields.base import Field
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.tests.test_field import random_results
 
 
 """Mock functions for testing ResultList."""
@@ -90,7 +96,7 @@ class TestResultList(unittest.TestCase):
                metric: [
                    val[metric] for val in TEST_RESULTS[system].values()
                ] for metric in ['metric_sum', 'metric_product']
-            }, index=TEST_RESULTS[system].keys())
+            }, index=TEST_RESULTS[system].keys(), dtype=float)
             """Example output for system A
             >>> test_result
             |        |metric_sum|metric_product|
@@ -113,7 +119,7 @@ class TestResultList(unittest.TestCase):
                 metric: [
                     val[query][metric] for val in TEST_RESULTS.values()
                 ] for metric in ['metric_sum', 'metric_product']
-            }, index=TEST_RESULTS.keys())
+            }, index=TEST_RESULTS.keys(), dtype=float)
             """Example output for query 1
             >>> test_result
             |        |metric_sum|metric_product|
@@ -135,7 +141,7 @@ class TestResultList(unittest.TestCase):
                 query: [
                     val[query][metric] for val in TEST_RESULTS.values()
                 ] for query in ['query 1', 'query 2', 'query 3']
-            }, index=TEST_RESULTS.keys())
+            }, index=TEST_RESULTS.keys(), dtype=float)
             """Example output for metric_sum
             >>> test_result
             |        |query 1|query 2|query 3|
@@ -151,6 +157,263 @@ class TestResultList(unittest.TestCase):
             with self.assertRaises(ValueError):
                 self.result_list.get_system_query_df(field_name='mock', metric='wrong_metric')
 
+    def test_lazy(self):
+        result_list = ResultList(MOCK_RESULTS, [MockField(), NumericalField('value')], lazy=True)
+        eager = ResultList(MOCK_RESULTS, [MockField(), NumericalField('value')])
+        self.assertIsInstance(result_list.summary, LazySummary)
+        self.assertEqual(set(result_list.summary), {'mock', 'value'})
+        self.assertFalse(result_list.summary.is_computed('value'))
+        self.assertIsNone(result_list.summary.partial('value'))
+
+        # Only the requested metric is computed.
+        pd.testing.assert_frame_equal(result_list.get_system_query_df('value', metric='mean'),
+                                      eager.get_system_query_df('value', metric='mean'))
+        pd.testing.assert_frame_equal(result_list.get_system_query_df('value', metric='50-percentile'),
+                                      eager.get_system_query_df('value', metric='50-percentile'))
+        self.assertFalse(result_list.summary.is_computed('value'))
+        self.assertEqual(list(result_list.summary.get_metrics('value', ['mean', '50-percentile']).columns),
+                         ['mean', '50-percentile'])
+        self.assertEqual(list(result_list.summary.partial('value').columns), ['mean', '50-percentile'])
+        with self.assertRaises(ValueError):
+            result_list.get_system_query_df('value', metric='wrong_metric')
+        # Metrics that the field does not compute are only looked for once.
+        with mock.patch.object(result_list, '_compute_summary', wraps=result_list._compute_summary) as compute:
+            with self.assertRaises(ValueError):
+                result_list.get_system_query_df('value', metric='wrong_metric')
+            compute.assert_not_called()
+
+        # Views over all metrics compute the whole field once.
+        pd.testing.assert_frame_equal(result_list.get_query_metric_df('value', system='system A'),
+                                      eager.get_query_metric_df('value', system='system A'))
+        self.assertTrue(result_list.summary.is_computed('value'))
+        self.assertIs(result_list.summary['value'], result_list.summary['value'])
+        self.assertIs(result_list.summary.partial('value'), result_list.summary['value'])
+        pd.testing.assert_frame_equal(result_list.summary['mock'], eager.summary['mock'])
+        with self.assertRaises(ValueError):
+            result_list.get_query_metric_df('wrong_field', system='system A')
+
+    def test_add_remove(self):
+        results = random_results(n_systems=4, n_queries=12, labels='abc')
+        for system_row in results.values():
+            for query_row in system_row.values():
+                for item in query_row:
+                    item['explicit_field'] = item['categorical_field']
+        # The last system has a label that the other systems do not have.
+        for query_row in results['system 3'].values():
+            query_row.append({'categorical_field': 'z', 'numerical_field': 4, 'explicit_field': 'z'})
+
+        def make_fields():
+            return [NumericalField('numerical_field'), CategoricalField('categorical_field'),
+                    CategoricalField('explicit_field', labels=['a', 'b'], ignore_none=False)]
+
+        def check(result_list, systems, queries):
+            expected = ResultList({system: {query: results[system][query] for query in queries}
+                                   for system in systems}, make_fields(), k=[2, 5]).summary
+            self.assertEqual(result_list.base_result.systems, systems)
+            self.assertEqual(result_list.base_result.queries, queries)
+            for name, summary in expected.items():
+                pd.testing.assert_frame_equal(result_list.summary[name], summary, check_like=True)
+
+        systems = ['system 0', 'system 1', 'system 2']
+        old_queries = [f'query {q}' for q in range(8)]
+        new_queries = [f'query {q}' for q in range(8, 12)]
+        for lazy in [False, True]:
+            result_list = ResultList({system: {query: results[system][query] for query in old_queries}
+                                      for system in systems}, make_fields(), k=[2, 5], lazy=lazy)
+            result_list.summary['categorical_field']
+            result_list.add_system('system 3', {query: results['system 3'][query] for query in old_queries})
+            self.assertIn('z', result_list.summary['categorical_field'].columns)
+            self.assertNotIn('z', result_list.summary['explicit_field'].columns)
+            check(result_list, systems + ['system 3'], old_queries)
+
+            result_list.add_queries({system: {query: results[system][query] for query in new_queries}
+                                     for system in systems + ['system 3']})
+            check(result_list, systems + ['system 3'], old_queries + new_queries)
+
+            result_list.remove_system('system 1')
+            check(result_list, ['system 0', 'system 2', 'system 3'], old_queries + new_queries)
+
+            # The labels only found in a removed system are removed too.
+            result_list.remove_system('system 3')
+            self.assertNotIn('z', result_list.summary['categorical_field'].columns)
+            check(result_list, ['system 0', 'system 2'], old_queries + new_queries)
+
+        # The list of queries given to BaseResult is not modified when queries are added.
+        queries = list(old_queries)
+        base_result = BaseResult({system: {query: results[system][query] for query in old_queries}
+                                  for system in systems}, queries=queries)
+        base_result.add_queries({system: {query: results[system][query] for query in new_queries}
+                                 for system in systems})
+        self.assertEqual(queries, old_queries)
+        self.assertEqual(base_result.queries, old_queries + new_queries)
+
+        with self.assertRaises(ValueError):
+            result_list.add_system('system 0', results['system 0'])
+        with self.assertRaises(ValueError):
+            result_list.add_system('system 1', {'query 0': []})
+        with self.assertRaises(ValueError):
+            result_list.add_queries({'system 0': {'query 20': []}})
+        with self.assertRaises(ValueError):
+            result_list.add_queries({system: {'query 0': []} for system in result_list.base_result.systems})
+        with self.assertRaises(ValueError):
+            result_list.remove_system('system 1')
+
+    def test_chunk_size(self):
+        results = random_results(n_systems=4, n_queries=30)
+        fields = [NumericalField('numerical_field'), CategoricalField('categorical_field')]
+        expected = ResultList(results, fields, k=[3, 10])
+        for chunk_size in [1, 25, 10000]:
+            result_list = ResultList(results, fields, k=[3, 10], chunk_size=chunk_size)
+            for field in fields:
+                pd.testing.assert_frame_equal(result_list.summary[field.name], expected.summary[field.name])
+            pd.testing.assert_frame_equal(result_list.rank_biased_overlap('categorical_field'),
+                                          expected.rank_biased_overlap('categorical_field'))
+            pd.testing.assert_frame_equal(result_list.rank_biased_overlap_matrix('categorical_field', aggregate=False),
+                                          expected.rank_biased_overlap_matrix('categorical_field', aggregate=False))
+
+    def test_multi_k(self):
+        result_list = ResultList(MOCK_RESULTS, [MockField()], k=[1, 2])
+        summary = result_list.summary['mock']
+        self.assertEqual(summary.index.nlevels, 3)
+        self.assertEqual(summary.loc[('system B', 'query 1', 1), 'metric_sum'], 8)
+        self.assertEqual(summary.loc[('system B', 'query 3', 2), 'metric_product'], 4)
+        single_k = ResultList(MOCK_RESULTS, [MockField()], k=2).summary['mock']
+        pd.testing.assert_frame_equal(summary.xs(2, level=2), single_k)
+
+        self.assertEqual(result_list.get_query_metric_df('mock', system='system A').shape, (6, 2))
+        system_metric = result_list.get_system_metric_df('mock', query='query 1')
+        self.assertEqual(system_metric.loc[('system A', 1), 'metric_sum'], 5)
+        system_query = result_list.get_system_query_df('mock', metric='metric_sum')
+        self.assertEqual(system_query.loc[('system A', 2), 'query 1'], 7)
+        with self.assertRaises(ValueError):
+            ResultList(MOCK_RESULTS, [MockField()], k=[])
+
+    def test_get_system_aggregate_df(self):
+        result_df = self.result_list.get_system_aggregate_df('mock')
+        pd.testing.assert_frame_equal(result_df, self.result_list.summary['mock'].groupby(level=0).mean())
+        self.assertEqual(result_df.loc['system A', 'metric_sum'], (8 + 4 + 7) / 3)
+        result_df = self.result_list.get_system_aggregate_df('mock', metrics=['metric_sum'], aggregate='max')
+        self.assertEqual(list(result_df.columns), ['metric_sum'])
+        self.assertEqual(result_df.loc['system B', 'metric_sum'], 11)
+        with self.assertRaises(ValueError):
+            self.result_list.get_system_aggregate_df('mock', metrics=['wrong_metric'])
+
+        multi_k = ResultList(MOCK_RESULTS, [MockField()], k=[1, 2]).get_system_aggregate_df('mock')
+        self.assertEqual(list(multi_k.index), [('system A', 1), ('system A', 2), ('system B', 1), ('system B', 2)])
+
+    def test_view_cache(self):
+        results = random_results(n_systems=3, n_queries=10)
+        result_list = ResultList(results, [NumericalField('numerical_field')], k=[2, 5])
+        summary = result_list.summary['numerical_field']
+        for system in result_list.base_result.systems:
+            pd.testing.assert_frame_equal(result_list.get_query_metric_df('numerical_field', system),
+                                          summary.loc[system])
+        for query in result_list.base_result.queries:
+            pd.testing.assert_frame_equal(result_list.get_system_metric_df('numerical_field', query),
+                                          summary.xs(query, level=1))
+        pd.testing.assert_frame_equal(result_list.get_system_query_df('numerical_field', 'mean'),
+                                      summary['mean'].unstack(1))
+
+        # Modifying a returned view does not modify the cached view.
+        view = result_list.get_system_metric_df('numerical_field', 'query 3')
+        view.iloc[0, 0] = -1.0
+        self.assertNotEqual(result_list.get_system_metric_df('numerical_field', 'query 3').iloc[0, 0], -1.0)
+
+        # The cached views are discarded when the search results or the summary change.
+        result_list.add_system('system 3', results['system 0'])
+        pd.testing.assert_frame_equal(result_list.get_query_metric_df('numerical_field', 'system 3'),
+                                      result_list.get_query_metric_df('numerical_field', 'system 0'))
+        self.assertIn('system 3', result_list.get_system_query_df('numerical_field', 'mean').index)
+        result_list.remove_system('system 3')
+        self.assertNotIn('system 3', result_list.get_system_metric_df('numerical_field', 'query 3').index)
+        result_list.summary = {'numerical_field': result_list.summary['numerical_field'] * 2}
+        pd.testing.assert_frame_equal(result_list.get_system_query_df('numerical_field', 'mean'),
+                                      summary['mean'].unstack(1) * 2)
+        # A summary modified in place is refreshed by replacing it with its modified copy.
+        modified = result_list.summary['numerical_field'].copy()
+        modified.loc[:, 'mean'] = 0.0
+        result_list.summary['numerical_field'] = modified
+        self.assertTrue((result_list.get_system_query_df('numerical_field', 'mean') == 0).all().all())
+
+    def test_get_long_df(self):
+        long = self.result_list.get_long_df()
+        self.assertEqual(list(long.columns), ['field', 'system', 'query', 'metric', 'value'])
+        self.assertEqual(len(long), 12)
+        for row in long.itertuples():
+            self.assertEqual(row.value, TEST_RESULTS[row.system][row.query][row.metric])
+
+        long = self.result_list.get_long_df(metrics='metric_sum', systems='system B', queries=['query 3', 'query 1'])
+        self.assertEqual(list(long['query']), ['query 3', 'query 1'])
+        self.assertEqual(list(long['value']), [8, 11])
+        with self.assertRaises(ValueError):
+            self.result_list.get_long_df(systems='wrong_system')
+        with self.assertRaises(ValueError):
+            self.result_list.get_long_df(queries=['query 1', 'wrong_query'])
+        with self.assertRaises(ValueError):
+            self.result_list.get_long_df('wrong_field')
+
+        # Lazy fields only compute the requested metrics, and cutoffs are a column.
+        result_list = ResultList(MOCK_RESULTS, [MockField(), NumericalField('value')], k=[1, 2], lazy=True)
+        long = result_list.get_long_df(metrics=['mean', 'metric_sum'], queries='query 2')
+        self.assertFalse(result_list.summary.is_computed('value'))
+        self.assertEqual(list(long.columns), ['field', 'system', 'query', 'k', 'metric', 'value'])
+        self.assertEqual(list(long['metric'].cat.categories), ['metric_sum', 'mean'])
+        self.assertEqual(len(long), 8)
+        expected = result_list.summary['value'].loc[('system B', 'query 2', 2), 'mean']
+        row = long[(long['field'] == 'value') & (long['system'] == 'system B') & (long['k'] == 2)]
+        self.assertEqual(row['value'].item(), expected)
+
+    def test_compare_systems(self):
+        results = random_results(n_systems=3, n_queries=100)
+        result_list = ResultList(results, [NumericalField('numerical_field')], k=[5, 10])
+        summary = result_list.summary['numerical_field'].xs(5, level=2)['mean']
+        for test, columns in [('bootstrap', ['ci_low', 'ci_high']), ('permutation', []), ('t-test', ['statistic'])]:
+            comparison = result_list.compare_systems('numerical_field', 'mean', test=test, seed=0, n_samples=500,
+                                                     k=5)
+            self.assertEqual(list(comparison.index), [('system 0', 'system 1'), ('system 0', 'system 2'),
+                                                      ('system 1', 'system 2')])
+            self.assertEqual(list(comparison.columns),
+                             ['mean_a', 'mean_b', 'difference', 'n_queries', 'p_value'] + columns)
+            self.assertTrue(((comparison['p_value'] >= 0) & (comparison['p_value'] <= 1)).all())
+
+        comparison = result_list.compare_systems('numerical_field', 'mean', baseline='system 2', test='t-test', k=5)
+        self.assertEqual(list(comparison.index), [('system 2', 'system 0'), ('system 2', 'system 1')])
+        defined = summary.loc['system 2'].notna() & summary.loc['system 0'].notna()
+        a, b = summary.loc['system 2'][defined], summary.loc['system 0'][defined]
+        row = comparison.loc[('system 2', 'system 0')]
+        self.assertEqual(row['n_queries'], defined.sum())
+        self.assertAlmostEqual(row['mean_a'], a.mean())
+        self.assertAlmostEqual(row['difference'], b.mean() - a.mean())
+
+        with self.assertRaises(ValueError):
+            result_list.compare_systems('numerical_field', 'mean')
+        with self.assertRaises(ValueError):
+            result_list.compare_systems('numerical_field', 'mean', k=5, test='wrong_test')
+        with self.assertRaises(ValueError):
+            result_list.compare_systems('numerical_field', 'mean', k=5, systems=['wrong_system'])
+        with self.assertRaises(ValueError):
+            result_list.compare_systems('numerical_field', 'wrong_metric', k=5)
+
+    def test_profile(self):
+        with self.assertRaises(RuntimeError):
+            self.result_list.get_profile_df()
+
+        fields = [MockField(), NumericalField('value')]
+        result_list = ResultList(MOCK_RESULTS, fields, profiler=Profiler(per_system=True))
+        result_list.rank_biased_overlap('value')
+        profile = result_list.get_profile_df()
+        self.assertEqual(profile.index.names, ['field', 'stage', 'system'])
+        self.assertEqual(profile.loc[('mock', 'metrics', 'system A'), 'calls'], 3)
+        self.assertEqual(profile.loc[('mock', 'metrics', 'system B'), 'calls'], 3)
+        self.assertEqual(
+            [stage for field, stage, _ in profile.index if field == 'value'],
+            ['process_base_result', 'metrics', 'dataframe', 'compute_metrics'],
+        )
+        self.assertIn((None, 'ingest', None), profile.index)
+        self.assertIn((None, 'rank_biased_overlap', None), profile.index)
+        self.assertTrue((profile['seconds'] >= 0).all())
+        self.assertTrue(profile['peak_memory'].isna().all())
+
     def test_rank_bias_overlap(self):
         # Both systems returns identical result lists.
         reslist1 = ResultList({
@@ -205,6 +468,10 @@ class TestResultList(unittest.TestCase):
                           ],
                          index=[f'query {i}' for i in range(1, 7)], columns=['rbo_min', 'rbo_res', 'rbo_ext']),
         )
+        pd.testing.assert_frame_equal(
+            reslist2.rank_biased_overlap(identifier='value', batch=False),
+            reslist2.rank_biased_overlap(identifier='value', batch=True),
+        )
         # Malformed queries
         with self.assertRaises(KeyError):
             reslist2.rank_biased_overlap(identifier='id')
@@ -214,3 +481,45 @@ class TestResultList(unittest.TestCase):
             reslist2.rank_biased_overlap(identifier='id', systems=['system A'])
         with self.assertRaises(ValueError):
             reslist2.rank_biased_overlap(identifier='id', systems=['system A', 'System C'])
+
+    def test_rank_biased_overlap_matrix(self):
+        reslist = ResultList({
+            'system A': {
+                'query 1': [Result(1), Result(2), Result(3)],
+                'query 2': [Result(1), Result(2), Result(3)],
+                'query 3': [],
+            },
+            'system B': {
+                'query 1': [Result(3), Result(2), Result(1)],
+                'query 2': [Result(1), Result(2)],
+                'query 3': [Result(1)],
+            },
+            'system C': {
+                'query 1': [Result(2), Result(5)],
+                'query 2': [Result(4)],
+                'query 3': [Result(1), Result(2)],
+            }
+        })
+        systems = ['system A', 'system B', 'system C']
+        per_query = reslist.rank_biased_overlap_matrix(identifier='value', value='rbo_min', aggregate=False)
+        self.assertEqual(list(per_query.columns), systems)
+        for first in systems:
+            for second in systems:
+                expected = reslist.rank_biased_overlap(identifier='value', systems=[first, second])['rbo_min']
+                pd.testing.assert_series_equal(per_query.xs(second, level=1)[first], expected, check_names=False)
+
+        matrix = reslist.rank_biased_overlap_matrix(identifier='value', systems=['system A', 'system C'])
+        self.assertEqual(list(matrix.index), ['system A', 'system C'])
+        expected = reslist.rank_biased_overlap(identifier='value', systems=['system A', 'system C'])['rbo_ext']
+        self.assertAlmostEqual(matrix.loc['system A', 'system C'], expected.mean())
+        self.assertAlmostEqual(matrix.loc['system C', 'system A'], expected.mean())
+        self.assertAlmostEqual(matrix.loc['system C', 'system C'], 1.0)
+
+        pd.testing.assert_frame_equal(
+            reslist.rank_biased_overlap_matrix(identifier='value', n_jobs=2),
+            reslist.rank_biased_overlap_matrix(identifier='value'),
+        )
+        with self.assertRaises(ValueError):
+            reslist.rank_biased_overlap_matrix(identifier='value', value='rbo')
+        with self.assertRaises(ValueError):
+            reslist.rank_biased_overlap_matrix(identifier='value', systems=['system A', 'system D'])
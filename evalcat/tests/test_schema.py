@@ -0,0 +1,70 @@
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from evalcat.base_result import BaseResult
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.result_list import ResultList
+from evalcat.schema import ItemSchema
+from evalcat.tests.test_field import random_results
+
+
+class TestItemSchema(unittest.TestCase):
+    def setUp(self):
+        self.schema = ItemSchema({'id': str, 'price': float, 'rank': int, 'category': object})
+
+    def test_item(self):
+        item = self.schema.item('53', 1.0, category='fruit')
+        self.assertEqual(item['price'], 1.0)
+        self.assertEqual(item.category, 'fruit')
+        self.assertEqual(item, {'id': '53', 'price': 1.0, 'rank': None, 'category': 'fruit'})
+        self.assertFalse(hasattr(item, '__dict__'))
+        with self.assertRaises(KeyError):
+            item['keys']
+        with self.assertRaises(AttributeError):
+            item.price = 2.0
+        with self.assertRaises(ValueError):
+            self.schema.item('53', size=1)
+        with self.assertRaises(ValueError):
+            ItemSchema(['not an identifier'])
+        self.assertEqual(pickle.loads(pickle.dumps(item)), item)
+
+    def test_pack(self):
+        items = [{'id': '53', 'price': 1.0, 'rank': 1, 'category': 'fruit'},
+                 {'id': '17', 'price': None, 'rank': 2, 'category': None}]
+        packed = self.schema.pack(items)
+        self.assertEqual(packed, items)
+        self.assertEqual(self.schema.pack([self.schema.item(**item) for item in items]), items)
+        self.assertEqual(self.schema.pack([tuple(item.values()) for item in items]), items)
+        self.assertEqual(packed.column('price').dtype, np.float64)
+        self.assertEqual(packed.column('rank').dtype, np.int64)
+        self.assertEqual(packed.column('id'), ('53', '17'))
+        self.assertIsNone(packed[1]['price'])
+        self.assertEqual(packed[-1].rank, 2)
+        self.assertEqual(packed[:1], items[:1])
+        self.assertEqual(len(self.schema.pack([])), 0)
+        with self.assertRaises(IndexError):
+            packed[2]
+        with self.assertRaises(ValueError):
+            self.schema.pack([{'id': '1', 'rank': None}])
+        self.assertEqual(pickle.loads(pickle.dumps(packed)), items)
+
+    def test_base_result(self):
+        results = random_results()
+        schema = ItemSchema({'categorical_field': object, 'numerical_field': float})
+        packed = schema.pack_results(results)
+        base_result, packed_result = BaseResult(results), BaseResult(packed)
+        np.testing.assert_array_equal(packed_result.offsets, base_result.offsets)
+        np.testing.assert_array_equal(packed_result.numerical_column('numerical_field'),
+                                      base_result.numerical_column('numerical_field'))
+        for name in schema.fields:
+            self.assertEqual(list(packed_result.column(name)), list(base_result.column(name)))
+
+        fields = [NumericalField('numerical_field'), CategoricalField('categorical_field')]
+        expected = ResultList(results, fields).summary
+        summary = ResultList(packed, fields).summary
+        for field in fields:
+            pd.testing.assert_frame_equal(summary[field.name], expected[field.name])
@@ -0,0 +1,96 @@
+import copy
+import json
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from evalcat.base_result import BaseResult
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.result_list import ResultList
+from evalcat.sharding import evaluate_shard, evaluate_sharded, merge, shard_queries
+from evalcat.streaming import StreamingEvaluator
+from evalcat.tests.test_field import random_results
+from evalcat.tests.test_streaming import events, identified_results
+
+
+"""Mock functions for testing sharding."""
+
+
+def make_fields():
+    return [NumericalField('numerical_field', ignore_none=False), CategoricalField('categorical_field'),
+            CategoricalField('categorical_field', labels=['a', 'b'], ignore_none=False)]
+
+
+PAIRS = [('system 0', 'system 1'), ('system 2', 'system 0')]
+
+
+"""Test Classes"""
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.results = identified_results(random_results(n_systems=3, n_queries=40))
+
+    def assert_matches_result_list(self, evaluator, fields):
+        result_list = ResultList(self.results, fields, k=5)
+        for field in fields:
+            expected = result_list.summary[field.name].groupby(level=0, sort=False).mean()
+            snapshot = evaluator.snapshot(field.name)
+            pd.testing.assert_frame_equal(snapshot, expected, check_names=False, check_like=True)
+        for pair in PAIRS:
+            expected = result_list.rank_biased_overlap(systems=pair).dropna()
+            np.testing.assert_allclose(evaluator.rbo_snapshot().loc[pair, ['rbo_min', 'rbo_res', 'rbo_ext']],
+                                       expected.mean().values)
+
+    def test_update_base_result(self):
+        # The last field has the same name as the second, so each field is checked on its own.
+        for fields in [make_fields()[:2], make_fields()[2:]]:
+            evaluator = StreamingEvaluator(fields, k=5, rbo_pairs=PAIRS)
+            evaluator.update_base_result(BaseResult(self.results))
+            self.assert_matches_result_list(evaluator, fields)
+            self.assertEqual(list(evaluator.counts()), [40, 40, 40])
+
+        # The labels of each update are discovered by a copy, so the fields do not keep them.
+        fields = make_fields()[:2]
+        evaluator = StreamingEvaluator(fields, k=5, rbo_pairs=PAIRS)
+        with mock.patch('evalcat.streaming.copy.deepcopy', wraps=copy.deepcopy) as deepcopy:
+            for shard in shard_queries(BaseResult(self.results), 3):
+                evaluator.update_base_result(shard)
+        deepcopy.assert_not_called()
+        self.assertIsNone(fields[1].labels)
+        self.assert_matches_result_list(evaluator, fields)
+
+    def test_merge(self):
+        fields = make_fields()[:2]
+        shards = shard_queries(BaseResult(self.results), 3)
+        self.assertEqual(sum(len(shard.queries) for shard in shards), 40)
+        states = [evaluate_shard(shard, fields, k=5, rbo_pairs=PAIRS) for shard in shards]
+        # States are plain python objects, which can be sent as JSON.
+        states = [json.loads(json.dumps(state)) for state in states]
+        merged = merge(states, fields)
+        self.assert_matches_result_list(merged, fields)
+        self.assertEqual(list(merged.counts()), [40, 40, 40])
+        with self.assertRaises(ValueError):
+            merge([], fields)
+
+    def test_merge_streams(self):
+        # Shards that only see some systems of a query keep them pending until they are merged.
+        fields = make_fields()[:2]
+        streams = [StreamingEvaluator(fields, k=5, rbo_pairs=PAIRS) for _ in range(2)]
+        for idx, (system, query, items) in enumerate(events(self.results)):
+            streams[idx % 2].update(system, query, items)
+        self.assertTrue(streams[0]._pending)
+        merged = StreamingEvaluator.from_dict(streams[0].to_dict(), fields).merge(streams[1])
+        self.assertEqual(merged._pending, {})
+        self.assert_matches_result_list(merged, fields)
+        with self.assertRaises(ValueError):
+            merged.merge(StreamingEvaluator(fields, k=10, rbo_pairs=PAIRS))
+
+    def test_evaluate_sharded(self):
+        fields = make_fields()[:2]
+        evaluator = evaluate_sharded(self.results, fields, k=5, n_shards=4, n_jobs=2, rbo_pairs=PAIRS)
+        self.assertIsNone(fields[1].labels)
+        self.assert_matches_result_list(evaluator, fields)
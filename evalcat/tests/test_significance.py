@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from evalcat import significance
+from evalcat.significance import _betainc, paired_bootstrap, paired_t_test, permutation_test
+
+
+class TestSignificance(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.null = rng.normal(0, 1, size=500)
+        self.shifted = rng.normal(0.5, 1, size=500)
+
+    def test_betainc(self):
+        self.assertAlmostEqual(_betainc(2, 3, 0.4), 0.5248)
+        self.assertAlmostEqual(_betainc(0.5, 0.5, 0.5), 0.5)
+        self.assertEqual(_betainc(2, 3, 0), 0)
+        self.assertEqual(_betainc(2, 3, 1), 1)
+
+    def test_paired_t_test(self):
+        # t = 2 with 10 degrees of freedom.
+        differences = np.array([1.0] * 6 + [-1.0] * 5)
+        differences += 2 * differences.std(ddof=1) / np.sqrt(11) - differences.mean()
+        statistic, p_value = paired_t_test(differences)
+        self.assertAlmostEqual(statistic, 2)
+        self.assertAlmostEqual(p_value, 0.073388, places=6)
+        self.assertTrue(np.isnan(paired_t_test([1.0])[1]))
+        self.assertTrue(np.isnan(paired_t_test([0.0, 0.0])[1]))
+        self.assertEqual(paired_t_test([1.0, 1.0]), (np.inf, 0.0))
+
+    def test_paired_bootstrap(self):
+        p_value, ci_low, ci_high = paired_bootstrap(self.shifted, n_samples=2000, seed=0)
+        self.assertLess(p_value, 0.01)
+        self.assertLess(ci_low, self.shifted.mean())
+        self.assertGreater(ci_high, self.shifted.mean())
+        self.assertGreater(paired_bootstrap(self.null, n_samples=2000, seed=0)[0], 0.05)
+        self.assertEqual(paired_bootstrap(self.null, n_samples=2000, seed=0),
+                         paired_bootstrap(self.null, n_samples=2000, seed=0))
+        self.assertTrue(np.isnan(paired_bootstrap([])[0]))
+
+    def test_permutation_test(self):
+        self.assertLess(permutation_test(self.shifted, n_samples=2000, seed=0), 0.01)
+        self.assertGreater(permutation_test(self.null, n_samples=2000, seed=0), 0.05)
+        # Only the 2 assignments with equal signs are as extreme as the observed one, out of 2^3.
+        self.assertAlmostEqual(permutation_test([1.0, 1.0, 1.0], n_samples=20000, seed=0), 0.25, delta=0.01)
+        self.assertTrue(np.isnan(permutation_test([])))
+
+    def test_chunks_and_threads(self):
+        expected = paired_bootstrap(self.null, n_samples=300, seed=1), permutation_test(self.null, 300, seed=1)
+        with mock.patch.object(significance, 'RESAMPLING_CHUNK_SIZE', 500 * 7):
+            self.assertEqual((paired_bootstrap(self.null, n_samples=300, seed=1, n_jobs=3),
+                              permutation_test(self.null, 300, seed=1, n_jobs=3)),
+                             (paired_bootstrap(self.null, n_samples=300, seed=1),
+                              permutation_test(self.null, 300, seed=1)))
+            self.assertNotEqual(paired_bootstrap(self.null, n_samples=300, seed=1), expected[0])
@@ -0,0 +1,162 @@
+import random
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from evalcat.fields.categorical import CategoricalField
+from evalcat.fields.numerical import NumericalField
+from evalcat.fields.relevance import RelevanceField
+from evalcat.result_list import ResultList
+from evalcat.sketch import KLLSketch
+from evalcat.streaming import StreamingEvaluator
+from evalcat.tests.test_field import random_results
+
+
+"""Mock functions for testing StreamingEvaluator."""
+
+
+def events(results):
+    """Yields the ranked lists of `results` as (system, query, items), interleaving the systems."""
+    queries = list(next(iter(results.values())))
+    for query in queries:
+        for system, system_row in results.items():
+            yield system, query, system_row[query]
+
+
+def identified_results(results, n_ids=30, seed=0):
+    """Adds a unique `id` key to the items of each ranked list, for RBO."""
+    rng = random.Random(seed)
+    return {system: {query: [dict(item, id=item_id) for item, item_id in zip(query_row, rng.sample(range(n_ids),
+                                                                                                     len(query_row)))]
+                     for query, query_row in system_row.items()} for system, system_row in results.items()}
+
+
+"""Test Classes"""
+
+
+class TestStreamingEvaluator(unittest.TestCase):
+    def assert_matches_summary(self, results, fields, k):
+        evaluator = StreamingEvaluator(fields(), k=k)
+        for system, query, items in events(results):
+            evaluator.update(system, query, items)
+        result_list = ResultList(results, fields(), k=k)
+        for name, summary in result_list.summary.items():
+            expected = summary.groupby(level=0, sort=False).mean()
+            pd.testing.assert_frame_equal(evaluator.snapshot(name), expected[evaluator.snapshot(name).columns],
+                                          check_names=False)
+            self.assertEqual(set(evaluator.snapshot(name).columns), set(expected.columns))
+
+    def test_snapshot(self):
+        results = random_results(n_systems=3, n_queries=30)
+        for k in [3, 10, None]:
+            for ignore_none in [True, False]:
+                self.assert_matches_summary(results, lambda: [
+                    NumericalField('numerical_field', ignore_none=ignore_none),
+                    CategoricalField('categorical_field', ignore_none=ignore_none),
+                ], k)
+                self.assert_matches_summary(results, lambda: [
+                    CategoricalField('categorical_field', labels=['a', 'b', None], ignore_none=ignore_none),
+                ], k)
+
+    def test_relevance_field(self):
+        results = identified_results(random_results(n_systems=2, n_queries=20))
+        qrels = {query: {item_id: item_id % 3 for item_id in range(0, 30, 2)} for query in results['system 0']}
+        self.assert_matches_summary(results, lambda: [RelevanceField('id', qrels)], k=5)
+        with self.assertRaises(ValueError):
+            RelevanceField('id', qrels).aggregate(k=5).update(results['system 0']['query 0'])
+
+    def test_snapshot_at_any_time(self):
+        results = random_results(n_systems=2, n_queries=10)
+        evaluator = StreamingEvaluator([NumericalField('numerical_field')], k=5)
+        self.assertTrue(evaluator.snapshot('numerical_field').empty)
+        for n_events, (system, query, items) in enumerate(events(results), start=1):
+            evaluator.update(system, query, items)
+            self.assertEqual(evaluator.counts().sum(), n_events)
+        self.assertEqual(list(evaluator.counts()), [10, 10])
+        self.assertEqual(list(evaluator.snapshot('numerical_field').index), ['system 0', 'system 1'])
+        with self.assertRaises(ValueError):
+            evaluator.snapshot('categorical_field')
+
+    def test_quantiles(self):
+        results = random_results(n_systems=2, n_queries=50)
+        evaluator = StreamingEvaluator([NumericalField('numerical_field')], k=10)
+        for system, query, items in events(results):
+            evaluator.update(system, query, items)
+        summary = ResultList(results, [NumericalField('numerical_field')], k=10).summary['numerical_field']
+        quantiles = evaluator.quantiles('numerical_field', 'mean', q=[0, 0.5, 1])
+        for system in results:
+            means = summary.loc[system, 'mean'].dropna()
+            # Fewer values than the size of the sketch are kept exactly.
+            self.assertEqual(quantiles.loc[system, 0], means.min())
+            self.assertEqual(quantiles.loc[system, 1], means.max())
+            self.assertIn(quantiles.loc[system, 0.5], list(means))
+        self.assertTrue(evaluator.quantiles('numerical_field', 'missing').isna().all().all())
+
+    def test_rbo(self):
+        results = identified_results(random_results(n_systems=3, n_queries=20))
+        pairs = [('system 0', 'system 1'), ('system 2', 'system 0')]
+        evaluator = StreamingEvaluator([NumericalField('numerical_field')], rbo_pairs=pairs)
+        for system, query, items in events(results):
+            evaluator.update(system, query, items)
+        self.assertEqual(evaluator._pending, {})
+        snapshot = evaluator.rbo_snapshot()
+        result_list = ResultList(results, [NumericalField('numerical_field')])
+        for pair in pairs:
+            expected = result_list.rank_biased_overlap(systems=pair).dropna()
+            np.testing.assert_allclose(snapshot.loc[pair, ['rbo_min', 'rbo_res', 'rbo_ext']],
+                                       expected.mean().values)
+            self.assertEqual(snapshot.loc[pair, 'count'], len(expected))
+
+    def test_rbo_pending(self):
+        evaluator = StreamingEvaluator([NumericalField('value')], rbo_pairs=[('A', 'B')])
+        evaluator.update('A', 'q1', [{'id': 1, 'value': 1}, {'id': 2, 'value': 2}])
+        self.assertEqual(list(evaluator._pending), ['q1'])
+        self.assertEqual(evaluator.rbo_snapshot().loc[('A', 'B'), 'count'], 0)
+        evaluator.update('B', 'q1', [{'id': 2, 'value': 1}, {'id': 1, 'value': 2}])
+        self.assertEqual(evaluator._pending, {})
+        self.assertEqual(evaluator.rbo_snapshot().loc[('A', 'B'), 'count'], 1)
+
+
+class TestKLLSketch(unittest.TestCase):
+    def test_quantile(self):
+        values = np.random.default_rng(0).normal(size=100000)
+        sketch = KLLSketch(200, seed=0)
+        for value in values:
+            sketch.update(value)
+        self.assertEqual(sketch.count, len(values))
+        self.assertLess(len(sketch), 1000)
+        q = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+        ranks = np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values)
+        np.testing.assert_allclose(ranks, q, atol=0.02)
+        self.assertEqual(sketch.quantile(0), values.min())
+        self.assertEqual(sketch.quantile(1), values.max())
+        self.assertTrue(np.isnan(KLLSketch().quantile(0.5)))
+
+    def test_merge(self):
+        values = np.random.default_rng(0).uniform(size=20000)
+        sketches = [KLLSketch(100, seed=0), KLLSketch(100, seed=1)]
+        for sketch, part in zip(sketches, np.array_split(values, 2)):
+            for value in part:
+                sketch.update(value)
+        merged = sketches[0].merge(sketches[1])
+        self.assertEqual(merged.count, len(values))
+        np.testing.assert_allclose(merged.quantile([0.1, 0.5, 0.9]), [0.1, 0.5, 0.9], atol=0.04)
+
+    def test_weight(self):
+        sketch = KLLSketch()
+        sketch.update(1.0, 3)
+        sketch.update(2.0)
+        self.assertEqual(sketch.count, 4)
+        self.assertEqual(sketch.quantile(0.5), 1.0)
+        self.assertEqual(sketch.quantile(0.8), 2.0)
+
+    def test_to_dict(self):
+        sketch = KLLSketch(50, seed=0)
+        for value in range(1000):
+            sketch.update(value)
+        restored = KLLSketch.from_dict(sketch.to_dict())
+        self.assertEqual(restored.count, sketch.count)
+        self.assertEqual(len(restored), len(sketch))
+        np.testing.assert_array_equal(restored.quantile([0, 0.3, 1]), sketch.quantile([0, 0.3, 1]))
+        self.assertTrue(np.isnan(KLLSketch.from_dict(KLLSketch().to_dict()).min))
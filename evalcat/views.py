@@ -0,0 +1,164 @@
+"""
+Indexes and caches of the DataFrame views of the summaries of a ResultList.
+
+The summary of a field is laid out in the order of `summary_index`, i.e. the row of system i, query j and cutoff c is
+`(i * n_queries + j) * n_cutoffs + c`. SummaryViews maps the systems and queries to their positions with dicts, so
+that the rows of a system or a query are taken by position instead of searching the index, and caches every view
+until the summary it was taken from is replaced. The same layout is used to select values of several fields in a
+long format, by computing their positions rather than filtering the rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from evalcat.fields.base import summary_index
+
+
+def _copy_on_write():
+    """Returns whether pandas copies the data shared by DataFrames when one of them is modified."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except KeyError:
+        return False
+
+
+class SummaryViews:
+    """
+    SummaryViews takes and caches the views of summary DataFrames of a BaseResult.
+
+    The views are cached per field, and discarded when they are requested from a different summary DataFrame than
+    the one they were taken from. Summaries are compared by identity, so views taken from a summary that is then
+    modified in place are not discarded, and the summary must be replaced instead. A copy of the cached view is
+    returned, so that it can be modified by the caller, which only copies the data if pandas does not copy it on
+    write.
+
+    Parameters
+    ----------
+    base_result : BaseResult
+        The search results the summaries were computed for. SummaryViews must be rebuilt when they change.
+    cutoffs : list of int, optional
+        The cutoffs of the summaries, if they have an index level `k`.
+
+    Attributes
+    ----------
+    system_index : dict
+        Maps each system to its position in `base_result.systems`.
+    query_index : dict
+        Maps each query to its position in `base_result.queries`.
+    """
+
+    def __init__(self, base_result, cutoffs=None):
+        self.systems = list(base_result.systems)
+        self.queries = list(base_result.queries)
+        self.cutoffs = cutoffs
+        self.system_index = {system: idx for idx, system in enumerate(self.systems)}
+        self.query_index = dict(base_result.query_index)
+        self._base_result = base_result
+        self._n_cutoffs = 1 if cutoffs is None else len(cutoffs)
+        self._fields = {}
+        self._deep_copy = not _copy_on_write()
+        self._dtypes = None
+
+    def _field(self, field_name, summary):
+        """Returns the cache of a field, holding the summary laid out in the order of `summary_index`."""
+        cache = self._fields.get(field_name)
+        if cache is None or cache['summary'] is not summary:
+            index = summary_index(self._base_result, self.cutoffs)
+            layout = summary if summary.index.equals(index) else summary.reindex(index)
+            cache = self._fields[field_name] = {'summary': summary, 'layout': layout, 'metrics': list(layout.columns),
+                                                'views': {}}
+        return cache
+
+    def _view(self, field_name, summary, key, build):
+        cache = self._field(field_name, summary)
+        if key not in cache['views']:
+            cache['views'][key] = build(cache['layout'])
+        return cache['views'][key].copy(deep=self._deep_copy)
+
+    def system_view(self, field_name, summary, system):
+        """Returns the rows of a system, with index queries, or (query, k) if the summary has cutoffs."""
+        def build(layout):
+            size = len(self.queries) * self._n_cutoffs
+            start = self.system_index[system] * size
+            return layout.iloc[start:start + size].droplevel(0)
+        return self._view(field_name, summary, ('system', system), build)
+
+    def query_view(self, field_name, summary, query):
+        """Returns the rows of a query, with index systems, or (system, k) if the summary has cutoffs."""
+        def build(layout):
+            return layout.iloc[self._positions(queries=[query])].droplevel(1)
+        return self._view(field_name, summary, ('query', query), build)
+
+    def metric_view(self, field_name, summary, metric):
+        """Returns the values of a metric, with index systems, or (system, k), and column queries."""
+        return self._view(field_name, summary, ('metric', metric), lambda layout: layout.loc[:, metric].unstack(1))
+
+    def _positions(self, systems=None, queries=None):
+        """Returns the rows of the layout of the given systems and queries, or of all of them, in layout order."""
+        system_positions = self._lookup(systems, self.system_index, 'System')
+        query_positions = self._lookup(queries, self.query_index, 'Query')
+        rows = system_positions[:, None] * len(self.queries) + query_positions
+        return (rows.reshape(-1, 1) * self._n_cutoffs + np.arange(self._n_cutoffs)).ravel()
+
+    @staticmethod
+    def _lookup(keys, index, name):
+        if keys is None:
+            return np.arange(len(index))
+        try:
+            return np.array([index[key] for key in keys], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f'{name} {e.args[0]!r} not in result_list.') from None
+
+    def long_frame(self, summaries, metrics=None, systems=None, queries=None):
+        """Returns the values of several summaries in a long format, one row per value.
+
+        Parameters
+        ----------
+        summaries : dict
+            Maps each field name to its summary DataFrame.
+        metrics, systems, queries : list, optional
+            If provided, only the values of these metrics, systems and queries are returned. Metrics that a field
+            does not compute are left out for this field.
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with columns [field, system, query, metric, value], and k after query if the summaries have
+            cutoffs, in the order of the fields and of `summary_index`. All columns but k and value are categorical.
+        """
+        rows = self._positions(systems, queries)
+        if self._dtypes is None:
+            self._dtypes = (pd.CategoricalDtype(pd.Index(self.systems, dtype=object)),
+                            pd.CategoricalDtype(pd.Index(self.queries, dtype=object)))
+        system_dtype, query_dtype = self._dtypes
+        field_codes, metric_codes, row_codes, values = [], [], [], []
+        metric_categories = {}
+        for field_code, (field_name, summary) in enumerate(summaries.items()):
+            cache = self._field(field_name, summary)
+            if 'values' not in cache:
+                cache['values'] = cache['layout'].to_numpy().ravel()
+            field_metrics = cache['metrics']
+            columns = [idx for idx, metric in enumerate(field_metrics) if metrics is None or metric in metrics]
+            positions = (rows[:, None] * len(field_metrics) + np.array(columns, dtype=np.int64)).ravel()
+            codes = [metric_categories.setdefault(field_metrics[idx], len(metric_categories)) for idx in columns]
+            field_codes.append(np.full(len(positions), field_code))
+            metric_codes.append(np.tile(np.array(codes, dtype=np.int64), len(rows)))
+            row_codes.append(np.repeat(rows, len(columns)))
+            values.append(cache['values'][positions])
+
+        rows = np.concatenate(row_codes) if row_codes else np.array([], dtype=np.int64)
+        per_system = len(self.queries) * self._n_cutoffs
+        columns = {
+            'field': pd.Categorical.from_codes(np.concatenate(field_codes) if field_codes else rows,
+                                               categories=pd.Index(list(summaries), dtype=object)),
+            'system': pd.Categorical.from_codes(rows // per_system, dtype=system_dtype),
+            'query': pd.Categorical.from_codes(rows % per_system // self._n_cutoffs, dtype=query_dtype),
+        }
+        if self.cutoffs is not None:
+            columns['k'] = np.asarray(self.cutoffs)[rows % self._n_cutoffs]
+        columns['metric'] = pd.Categorical.from_codes(np.concatenate(metric_codes) if metric_codes else rows,
+                                                      categories=pd.Index(list(metric_categories), dtype=object))
+        columns['value'] = np.concatenate(values) if values else np.array([], dtype=float)
+        return pd.DataFrame(columns)
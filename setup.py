@@ -16,6 +16,9 @@ setuptools.setup(
         "numpy",
         "pandas >= 1.0.1"
     ],
+    extras_require={
+        "parquet": ["pyarrow"]
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License"